@@ -0,0 +1,1370 @@
+from __future__ import annotations
+
+# Benchmarks et tests de charge hors écran (outil de développement : absent de l'exécutable).
+# python bench.py [NOM ...] : chaque benchmark tourne sur une fenêtre neuve dans un dossier temporaire
+# et affiche une ligne JSON ; ceux qui vérifient un résultat font échouer le code de sortie.
+import argparse
+import gc
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PySide6.QtCore import QCoreApplication, QEvent, QMimeData, QPoint, QPointF, QRegularExpression, QTimer, Qt
+from PySide6.QtGui import (
+    QColor,
+    QFont,
+    QGuiApplication,
+    QImage,
+    QKeyEvent,
+    QMouseEvent,
+    QTextCharFormat,
+    QTextCursor,
+    QTextDocument,
+    QTextImageFormat,
+    QWheelEvent,
+)
+from PySide6.QtWidgets import QApplication, QWidget
+
+from main import (
+    NOTES_DB_NAME,
+    THEMES,
+    BatchFormat,
+    FontPickerDialog,
+    ImageBlobStore,
+    NoteTab,
+    SessionRecorder,
+    SessionReplayer,
+    SqliteNoteStore,
+    StickyNoteWindow,
+    live_qobject_counts,
+    note_digest,
+    process_rss_bytes,
+    resource_path,
+)
+
+BENCHMARKS: dict[str, Callable[[StickyNoteWindow], dict]] = {}
+
+
+def benchmark(name: str) -> Callable:
+    def register(func: Callable[[StickyNoteWindow], dict]) -> Callable[[StickyNoteWindow], dict]:
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def run_benchmarks(names: list[str]) -> int:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        print(f"Benchmarks inconnus : {', '.join(unknown)} (disponibles : {', '.join(sorted(BENCHMARKS))})", file=sys.stderr)
+        return 2
+    # un benchmark qui vérifie aussi un résultat le signale par "failures" : code de sortie 1
+    failed = False
+    for name in names or sorted(BENCHMARKS):
+        with tempfile.TemporaryDirectory() as tmp:
+            window = StickyNoteWindow(data_dir=Path(tmp))
+            window.show()
+            app.processEvents()
+            result = BENCHMARKS[name](window)
+            window.close()
+            window.deleteLater()
+            app.processEvents()
+        print(json.dumps({"benchmark": name, **result}), flush=True)
+        failed = failed or bool(result.get("failures"))
+    return 1 if failed else 0
+
+
+def fill_benchmark_note(window: StickyNoteWindow, paragraphs: int) -> None:
+    # note "réaliste" : dégradés de apply_color_scheme et polices par run de apply_font_family_to_cursor
+    families = ["Défaut", *sorted(window.font_families)] or ["Défaut"]
+    line = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor."
+    window.editor.setPlainText("\n".join(f"{i:05d} {line}" for i in range(paragraphs)))
+    doc = window.editor.document()
+    modes = ["solid", "horizontal", "vertical"]
+    block = doc.begin()
+    while block.isValid():
+        n = block.blockNumber()
+        cursor = QTextCursor(block)
+        cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+        window.editor.setTextCursor(cursor)
+        window.current_color_mode = modes[n % len(modes)]
+        window.apply_color_scheme()
+        cursor.setPosition(block.position() + 6)
+        cursor.setPosition(block.position() + 17, QTextCursor.KeepAnchor)
+        window.editor.setTextCursor(cursor)
+        window.apply_font_family_to_cursor(families[n % len(families)])
+        block = block.next()
+    window.editor.moveCursor(QTextCursor.Start)
+
+
+@benchmark("serializer")
+def bench_serializer(window: StickyNoteWindow) -> dict:
+    app = QApplication.instance()
+    fill_benchmark_note(window, 2000)
+    doc = window.editor.document()
+    chars = doc.characterCount()
+
+    # médiane de plusieurs sauvegardes : une seule mesure varie du simple au double
+    html_times, compact_times = [], []
+    for _ in range(7):
+        start = time.perf_counter()
+        html = window.editor.toHtml()
+        html_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        compact = window.serializer.serialize(doc)
+        compact_times.append(time.perf_counter() - start)
+    assert compact is not None
+    html_save = sorted(html_times)[len(html_times) // 2]
+    compact_save = sorted(compact_times)[len(compact_times) // 2]
+
+    start = time.perf_counter()
+    window.editor.setHtml(html)
+    app.processEvents()
+    html_load = time.perf_counter() - start
+    start = time.perf_counter()
+    window.serializer.deserialize(doc, compact)
+    app.processEvents()
+    compact_load = time.perf_counter() - start
+
+    html_bytes = len(html.encode("utf-8"))
+    compact_bytes = len(compact.encode("utf-8"))
+    mb = 1024 * 1024
+    return {
+        "blocks": doc.blockCount(),
+        "chars": chars,
+        "html_bytes": html_bytes,
+        "compact_bytes": compact_bytes,
+        "size_ratio": round(compact_bytes / html_bytes, 3),
+        "html_save_ms": round(html_save * 1000, 1),
+        "compact_save_ms": round(compact_save * 1000, 1),
+        # débit sur les octets réellement produits par chaque format
+        "html_save_mb_s": round(html_bytes / mb / html_save, 2),
+        "compact_save_mb_s": round(compact_bytes / mb / compact_save, 2),
+        "html_load_ms": round(html_load * 1000, 1),
+        "compact_load_ms": round(compact_load * 1000, 1),
+        "round_trip_equal": window.editor.toHtml() == html,
+    }
+
+
+@benchmark("pin_toggle")
+def bench_pin_toggle(window: StickyNoteWindow) -> dict:
+    app = QApplication.instance()
+    fill_benchmark_note(window, 200)
+    results = {}
+    for label, in_place in (("in_place", True), ("recreated", False)):
+        timings = []
+        for i in range(20):
+            start = time.perf_counter()
+            window.window_state.set_stays_on_top(i % 2 == 0, allow_in_place=in_place)
+            app.processEvents()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[f"{label}_median_ms"] = round(timings[len(timings) // 2], 2)
+        results[f"{label}_max_ms"] = round(timings[-1], 2)
+    results["platform"] = QGuiApplication.platformName()
+    return results
+
+
+@benchmark("stats")
+def bench_stats(window: StickyNoteWindow) -> dict:
+    doc = window.editor.document()
+    line = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor."
+    window.editor.setPlainText("\n".join(f"{i:05d} {line}" for i in range(20000)))
+    cursor = QTextCursor(doc.findBlockByNumber(10000))
+    stats = window.note_stats
+    keystroke = []
+    incremental = []
+    full = []
+    for ch in "incrémental " * 20:
+        start = time.perf_counter()
+        cursor.insertText(ch)
+        keystroke.append((time.perf_counter() - start) * 1000)
+        incremental.append(stats.block_index.last_update_ms)
+        # ce que coûterait un recomptage complet à chaque frappe
+        start = time.perf_counter()
+        text = doc.toPlainText()
+        words = len(text.split())
+        full.append((time.perf_counter() - start) * 1000)
+    keystroke.sort()
+    incremental.sort()
+    full.sort()
+    return {
+        "blocks": doc.blockCount(),
+        "keystroke_ms": round(keystroke[len(keystroke) // 2], 3),
+        "stats_update_ms": round(incremental[len(incremental) // 2], 3),
+        "full_recount_ms": round(full[len(full) // 2], 3),
+        "words_match": words == stats.words,
+        "chars_match": len(text) == stats.characters,
+        "rebuilds": stats.block_index.rebuilds,
+        "failures": (words != stats.words) + (len(text) != stats.characters),
+    }
+
+
+@benchmark("outline")
+def bench_outline(window: StickyNoteWindow) -> dict:
+    app = QApplication.instance()
+    doc = window.editor.document()
+    outline = window.outline
+    html = "".join(
+        f"<p><b>Section {i}</b></p>" if i % 10 == 0 else f"<p>Paragraphe {i} : lorem ipsum dolor sit amet.</p>" for i in range(50000)
+    )
+    start = time.perf_counter()
+    window.editor.setHtml(html)
+    load_ms = (time.perf_counter() - start) * 1000
+    window.toggle_outline()
+    app.processEvents()
+    cursor = QTextCursor(doc.findBlockByNumber(25001))
+    splices = []
+    for ch in "plan\n" * 20:
+        cursor.insertText(ch)
+        splices.append(outline.block_index.last_update_ms)
+    # titre créé puis retiré en milieu de note : insertion/suppression d'une ligne du plan
+    cursor.select(QTextCursor.BlockUnderCursor)
+    bold = QTextCharFormat()
+    bold.setFontWeight(QFont.Bold)
+    cursor.mergeCharFormat(bold)
+    rows_after_bold = outline.rowCount()
+    doc.undo()
+    # le premier saut lointain paie la mise en page restante du document
+    start = time.perf_counter()
+    window.jump_to_heading(outline.index_of(outline.rowCount() - 1))
+    app.processEvents()
+    first_jump_ms = (time.perf_counter() - start) * 1000
+    jumps = []
+    for row in (4000, 100, 2500, 10):
+        start = time.perf_counter()
+        window.jump_to_heading(outline.index_of(row))
+        app.processEvents()
+        jumps.append((time.perf_counter() - start) * 1000)
+    splices.sort()
+    jumps.sort()
+    return {
+        "blocks": doc.blockCount(),
+        "headings": outline.rowCount(),
+        "heading_added_by_bold": rows_after_bold - outline.rowCount(),
+        "load_with_index_ms": round(load_ms, 1),
+        "splice_median_ms": round(splices[len(splices) // 2], 3),
+        "first_jump_ms": round(first_jump_ms, 1),
+        "jump_median_ms": round(jumps[len(jumps) // 2], 2),
+    }
+
+
+PERSISTENCE_PHRASES = ("mot ", "une phrase plus longue. ", "\n", "\nTitre\n", "é", "  ", "liste :\n- a\n- b\n")
+
+
+def random_edit(window: StickyNoteWindow, rnd: random.Random) -> None:
+    doc = window.editor.document()
+    end = doc.characterCount() - 1
+    start = rnd.randint(0, end)
+    cursor = QTextCursor(doc)
+    cursor.setPosition(start)
+    cursor.setPosition(min(end, start + rnd.choice((0, 1, 8, 60))), QTextCursor.KeepAnchor)
+    op = rnd.random()
+    if op < 0.45:
+        cursor.insertText(rnd.choice(PERSISTENCE_PHRASES))
+    elif op < 0.6:
+        cursor.removeSelectedText()
+    elif op < 0.8:
+        fmt = QTextCharFormat()
+        choice = rnd.randrange(4)
+        if choice == 0:
+            fmt.setFontWeight(rnd.choice((QFont.Normal, QFont.Bold)))
+        elif choice == 1:
+            fmt.setFontItalic(rnd.random() < 0.5)
+        elif choice == 2:
+            fmt.setFontPointSize(rnd.choice((11, 13, 20)))
+        else:
+            fmt.setForeground(QColor(rnd.choice(("#2f2a1f", "#c0392b", "#2980b9"))))
+        cursor.mergeCharFormat(fmt)
+    elif op < 0.9:
+        doc.undo()
+    else:
+        doc.redo()
+
+
+def run_crash_child(data_dir: Path, seed: int) -> int:
+    # processus sacrifié de bench_persistence : édite et sauvegarde en boucle jusqu'à être tué ;
+    # chaque ligne annonce l'état visé avant l'écriture puis confirme après
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication(sys.argv[:1])
+    window = StickyNoteWindow(data_dir=data_dir)
+    rnd = random.Random(seed)
+    if window.editor.document().characterCount() < 10000:
+        fill_benchmark_note(window, 400)
+        window.save_notes()
+    print(f"saved {note_digest(window)}", flush=True)
+    while True:
+        for _ in range(rnd.randint(1, 10)):
+            random_edit(window, rnd)
+        digest = note_digest(window)
+        print(f"saving {digest}", flush=True)
+        window.save_notes()
+        print(f"saved {digest}", flush=True)
+        margins = (rnd.randint(0, 80), rnd.randint(0, 80), rnd.randint(0, 80), rnd.randint(0, 80))
+        print(f"margins {json.dumps(list(margins))}", flush=True)
+        window.save_margins_for_theme("Notes", margins)
+        print("margins-saved", flush=True)
+        app.processEvents()
+
+
+@benchmark("persistence")
+def bench_persistence(window: StickyNoteWindow) -> dict:
+    rnd = random.Random(39)
+    doc = window.editor.document()
+    fill_benchmark_note(window, 300)
+
+    # 1. session d'édition aléatoire : chaque sauvegarde est relue comme au démarrage
+    save_ms = []
+    saved_bytes = 0
+    mismatches = 0
+    for _ in range(150):
+        for _ in range(rnd.randint(1, 20)):
+            random_edit(window, rnd)
+        start = time.perf_counter()
+        window.save_notes()
+        save_ms.append((time.perf_counter() - start) * 1000)
+        saved_bytes += window.last_save_bytes
+        compact = window.notes_compact_path.read_text(encoding="utf-8")
+        reloaded = QTextDocument()
+        if (
+            not window.serializer.deserialize(reloaded, compact)
+            or window.serializer.serialize(reloaded) != compact
+            or reloaded.toPlainText() != doc.toPlainText()
+            or window.notes_path.read_text(encoding="utf-8") != doc.toPlainText()
+        ):
+            mismatches += 1
+
+    # 2. sauvegardes de configuration concurrentes (threads)
+    themes = ("Notes", "Calpin")
+    written_margins = {theme: {tuple(window.get_margins_for_theme(theme))} for theme in themes}
+
+    def hammer(seed: int) -> None:
+        local = random.Random(seed)
+        for _ in range(100):
+            kind = local.randrange(4)
+            if kind == 0:
+                theme = local.choice(themes)
+                margins = tuple(local.randint(0, 80) for _ in range(4))
+                written_margins[theme].add(margins)
+                window.save_margins_for_theme(theme, margins)
+            elif kind == 1:
+                window.save_theme_config(local.choice(list(THEMES)))
+            elif kind == 2:
+                window.save_opacity_config()
+            else:
+                window.save_font_config()
+
+    config_errors = 0
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(hammer, seed) for seed in range(8)]:
+            try:
+                future.result()
+            except Exception:
+                config_errors += 1
+    for path in window.data_dir.glob("*.json"):
+        try:
+            json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            config_errors += 1
+    layout = window.load_layout_config()
+    config_errors += sum(tuple(layout[theme]) not in written_margins[theme] for theme in themes)
+    config_errors += window.load_theme_config()["theme"] not in THEMES
+
+    # 3. processus tué à un instant arbitraire pendant ses sauvegardes, puis rechargement
+    window.notes_compact_path.unlink(missing_ok=True)
+    crash_dir = window.data_dir.joinpath("crash")
+    crash_dir.mkdir()
+    command = [sys.executable, str(Path(__file__).resolve())]
+    runs = killed_in_save = killed_in_margins = consistent = 0
+    # .tmp laissés par le processus tué : tolérés seulement si le redémarrage les retire
+    tmp_after_kill = tmp_after_restart = 0
+    disk_margins = tuple(window.get_margins_for_theme("Notes"))
+    for run in range(16):
+        child = subprocess.Popen([*command, "--crash-child", str(crash_dir), str(run)], stdout=subprocess.PIPE, text=True)
+        lines = [child.stdout.readline().rstrip("\n")]
+        if run % 2:
+            # une exécution sur deux vise save_margins_for_theme : tué dès l'annonce de l'écriture
+            announced, target = 0, rnd.randint(1, 4)
+            while announced < target and lines[-1]:
+                lines.append(child.stdout.readline().rstrip("\n"))
+                announced += lines[-1].startswith("margins ")
+        else:
+            time.sleep(rnd.uniform(0.05, 0.8))
+        child.kill()
+        child.wait()
+        lines = [line for line in lines + child.stdout.read().splitlines() if line]
+        child.stdout.close()
+        runs += 1
+        saved = [line.split()[1] for line in lines if line.startswith("saved ")]
+        margins = [tuple(json.loads(line[len("margins ") :])) for line in lines if line.startswith("margins ")]
+        pending = lines[-1] if lines else ""
+        expected = set(saved[-1:])
+        if pending.startswith("saving "):
+            killed_in_save += 1
+            expected.add(pending.split()[1])
+        killed_in_margins += pending.startswith("margins ")
+        tmp_after_kill += len(list(crash_dir.glob("*.tmp")))
+        check = StickyNoteWindow(data_dir=crash_dir)
+        tmp_after_restart += len(list(crash_dir.glob("*.tmp")))
+        ok = not expected or note_digest(check) in expected
+        if margins:
+            # la dernière valeur annoncée, ou la précédente (éventuellement celle d'une exécution
+            # antérieure) si l'écriture a été interrompue
+            accepted = {margins[-1], margins[-2] if len(margins) > 1 else disk_margins}
+            ok = ok and tuple(check.get_margins_for_theme("Notes")) in accepted
+        disk_margins = tuple(check.get_margins_for_theme("Notes"))
+        consistent += ok
+        check.autosave.timer.stop()
+        check.close()
+        check.deleteLater()
+        QApplication.instance().processEvents()
+
+    save_ms.sort()
+    return {
+        "edit_saves": len(save_ms),
+        "edit_mismatches": mismatches,
+        "save_mb_s": round(saved_bytes / (1024 * 1024) / (sum(save_ms) / 1000), 2),
+        "save_median_ms": round(save_ms[len(save_ms) // 2], 2),
+        "save_max_ms": round(save_ms[-1], 2),
+        "config_writes": 8 * 100,
+        "config_errors": config_errors,
+        "crash_runs": runs,
+        "killed_during_note_save": killed_in_save,
+        "killed_during_margins_save": killed_in_margins,
+        "consistent_restores": consistent,
+        "tmp_files_after_kill": tmp_after_kill,
+        "orphan_tmp_files": tmp_after_restart,
+        "failures": mismatches + config_errors + (runs - consistent) + tmp_after_restart,
+    }
+
+
+def run_sync_child(data_dir: Path) -> int:
+    # instance de bench_sync : chaque ligne reçue est une liste [paragraphe, texte] à appliquer ;
+    # elle sauve (poussée vers le dossier partagé), laisse la synchro tirer les modifications de
+    # l'autre instance, puis affiche la note obtenue
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication(sys.argv[:1])
+    window = StickyNoteWindow(data_dir=data_dir)
+    print(json.dumps({"text": window.editor.toPlainText()}), flush=True)
+    for line in sys.stdin:
+        doc = window.editor.document()
+        for number, text in json.loads(line):
+            cursor = QTextCursor(doc.findBlockByNumber(number))
+            cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+            cursor.insertText(text)
+        window.save_notes()
+        dirty = window.autosave.is_dirty()
+        deadline = time.monotonic() + 3.0
+        while time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        state = {"text": window.editor.toPlainText(), "conflicts": window.note_sync.conflicts, "dirty_after_save": dirty}
+        print(json.dumps({**state, "dirty": window.autosave.is_dirty()}), flush=True)
+    window.autosave.timer.stop()
+    return 0
+
+
+@benchmark("sync")
+def bench_sync(window: StickyNoteWindow) -> dict:
+    # deux processus sur le même dossier partagé modifient en même temps des paragraphes voisins,
+    # puis le même paragraphe de la même façon : chacun doit finir avec la note attendue, sans conflit.
+    # Au dernier tour le verrou du manifeste est tenu pendant la sauvegarde (qui ne l'attend pas) :
+    # la note doit rester à sauver puis partir quand le verrou se libère.
+    shared = window.data_dir.joinpath("shared")
+    shared.mkdir()
+    shared.joinpath("sync.json").write_text(json.dumps({"enabled": True}), encoding="utf-8")
+    shared.joinpath("notes.txt").write_text("\n".join("abcdef"), encoding="utf-8")
+    command = [sys.executable, str(Path(__file__).resolve())]
+    children = []
+    for _ in range(2):
+        children.append(subprocess.Popen([*command, "--sync-child", str(shared)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True))
+        children[-1].stdout.readline()  # la première instance crée le manifeste avant que la seconde démarre
+    rounds = (
+        ([[2, "C"]], [[3, "D"]], "a b C D e f", False),
+        ([[0, "X"]], [[0, "X"]], "X b C D e f", False),
+        ([[5, "F"]], [], "X b C D e F", True),
+    )
+    lock_path = shared.joinpath("sync", "manifest.lock")
+    results = {"rounds": len(rounds), "mismatches": 0, "conflicts": 0, "saved_while_locked": 0, "dirty_at_end": 0}
+    for edits_a, edits_b, expected, locked in rounds:
+        if locked:
+            lock_path.write_text("bench", encoding="utf-8")
+        start = time.perf_counter()
+        for child, edits in zip(children, (edits_a, edits_b)):
+            child.stdin.write(json.dumps(edits) + "\n")
+            child.stdin.flush()
+        if locked:
+            time.sleep(0.5)
+            lock_path.unlink()
+        states = [json.loads(child.stdout.readline()) for child in children]
+        if locked:
+            results["saved_while_locked"] += not states[0]["dirty_after_save"]
+        results["dirty_at_end"] += sum(state["dirty"] for state in states)
+        results["mismatches"] += sum(state["text"] != expected.replace(" ", "\n") for state in states)
+        results["conflicts"] = max(state["conflicts"] for state in states)
+        results.setdefault("round_ms", []).append(round((time.perf_counter() - start) * 1000))
+    for child in children:
+        child.stdin.close()
+        child.wait(timeout=30)
+        child.stdout.close()
+    manifest = json.loads(shared.joinpath("sync", "manifest.json").read_text(encoding="utf-8"))
+    results["manifest_blocks"] = len(manifest["blocks"])
+    results["duplicated_blocks"] = len(manifest["blocks"]) - len(set(manifest["blocks"]))
+    results["failures"] = results["mismatches"] + results["saved_while_locked"] + results["dirty_at_end"] + results["duplicated_blocks"]
+    return results
+
+
+@benchmark("plain_mode")
+def bench_plain_mode(window: StickyNoteWindow) -> dict:
+    app = QApplication.instance()
+    line = "2024-05-01 12:00:00 INFO worker-3 requête traitée en 12 ms (statut 200, 1532 octets)"
+    text = "\n".join(f"{i:06d} {line}" for i in range(48000))
+    results = {"chars": len(text)}
+    for label, plain in (("rich", False), ("plain", True)):
+        if plain:
+            window.set_plain_mode(True, confirm=False)
+        editor = window.editor
+        start = time.perf_counter()
+        editor.setPlainText(text)
+        app.processEvents()
+        results[f"{label}_load_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        cursor = QTextCursor(editor.document().findBlockByNumber(24000))
+        editor.setTextCursor(cursor)
+        editor.ensureCursorVisible()
+        app.processEvents()
+        keystroke = []
+        for ch in "saisie au milieu ":
+            start = time.perf_counter()
+            editor.textCursor().insertText(ch)
+            app.processEvents()
+            keystroke.append((time.perf_counter() - start) * 1000)
+        keystroke.sort()
+        results[f"{label}_keystroke_ms"] = round(keystroke[len(keystroke) // 2], 2)
+
+        bar = editor.verticalScrollBar()
+        scroll = []
+        for step in range(1, 21):
+            start = time.perf_counter()
+            bar.setValue(bar.maximum() * step // 20)
+            editor.viewport().repaint()
+            scroll.append((time.perf_counter() - start) * 1000)
+        scroll.sort()
+        results[f"{label}_scroll_median_ms"] = round(scroll[len(scroll) // 2], 2)
+        results[f"{label}_scroll_max_ms"] = round(scroll[-1], 2)
+
+        start = time.perf_counter()
+        window.save_notes()
+        results[f"{label}_save_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        results[f"{label}_save_bytes"] = window.last_save_bytes
+    results["plain_files"] = sorted(p.name for p in window.data_dir.glob("notes.*"))
+    return results
+
+
+# croissance RSS tolérée sous budget, en multiple de budget_mb
+TABS_RSS_FACTOR = 3
+
+
+@benchmark("tabs")
+def bench_tabs(window: StickyNoteWindow) -> dict:
+    # 100 onglets de ~60 Ko sous un budget de 16 Mo : bascules vers un onglet résident ou évincé
+    # (réhydratation depuis le disque), puis mémoire réelle (RSS) si tout restait chargé. Dans un
+    # processus neuf : le RSS du processus des benchmarks garde le pic des benchmarks précédents
+    output = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--tabs-child", str(window.data_dir.joinpath("tabs-child"))],
+        capture_output=True,
+        text=True,
+    ).stdout
+    results = json.loads(output.strip().splitlines()[-1])
+    if results["rss_growth_mb"] is not None:
+        # le budget vise les documents ; marge pour la mise en page, l'allocateur et les caches de Qt
+        results["rss_bound_mb"] = TABS_RSS_FACTOR * results["budget_mb"]
+        results["failures"] = int(results["rss_growth_mb"] > results["rss_bound_mb"])
+    return results
+
+
+def run_tabs_child(data_dir: Path) -> int:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication(sys.argv[:1])
+    window = StickyNoteWindow(data_dir=data_dir)
+    window.show()
+    app.processEvents()
+    rnd = random.Random(42)
+
+    def settle() -> None:
+        # évictions faites à l'inactivité (IdleScheduler), puis hors de exec() : les documents évincés
+        # (deleteLater) sont libérés comme au retour dans la boucle
+        window.idle.run_pending()
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+        app.processEvents()
+
+    window.tabs_config["budget_mb"] = 16
+    rss_start = process_rss_bytes()
+    for number in range(100):
+        window.new_tab()
+        lines = [f"Onglet {number}"] + [
+            " ".join(rnd.choice(PERSISTENCE_PHRASES) for _ in range(3)) for _ in range(400)
+        ]
+        window.editor.setPlainText("\n".join(lines))
+        window.save_notes()
+        settle()
+    resident, evicted = [], []
+    for _ in range(300):
+        tab = rnd.choice(window.tabs)
+        was_loaded = tab.document is not None
+        window.activate_tab(tab)
+        settle()
+        (resident if was_loaded else evicted).append(window.last_tab_switch_ms)
+    resident.sort()
+    evicted.sort()
+    results = {
+        "tabs": len(window.tabs),
+        "budget_mb": window.tabs_config["budget_mb"],
+        "loaded_tabs": len(window.loaded_tabs),
+        "loaded_estimate_mb": round(sum(tab.estimated_bytes() for tab in window.loaded_tabs.values()) / (1024 * 1024), 1),
+        "rss_growth_mb": round((process_rss_bytes() - rss_start) / (1024 * 1024), 1) if rss_start else None,
+        "evictions": window.tab_evictions,
+        "switch_resident_median_ms": round(resident[len(resident) // 2], 2),
+        "switch_resident_max_ms": round(resident[-1], 2),
+        "switch_evicted_median_ms": round(evicted[len(evicted) // 2], 2),
+        "switch_evicted_max_ms": round(evicted[-1], 2),
+    }
+
+    # sans budget : tous les documents en mémoire, pour calibrer l'estimation
+    window.tabs_config["budget_mb"] = 4096
+    rss_before = process_rss_bytes()
+    for tab in window.tabs:
+        window.activate_tab(tab)
+    settle()
+    if rss_before:
+        results["all_loaded_rss_growth_mb"] = round((process_rss_bytes() - rss_before) / (1024 * 1024), 1)
+    results["all_loaded_estimate_mb"] = round(
+        sum(tab.estimated_bytes() for tab in window.loaded_tabs.values()) / (1024 * 1024), 1
+    )
+    print(json.dumps(results), flush=True)
+    window.autosave.timer.stop()
+    return 0
+
+
+@benchmark("batch_format")
+def bench_batch_format(window: StickyNoteWindow) -> dict:
+    # 20k paragraphes mis en forme (gras, tailles, couleurs, images) : sélection complète + mergeCharFormat
+    # d'un bloc vs BatchFormat par tranches (un bloc d'édition, une remise en page)
+    app = QApplication.instance()
+    editor = window.editor
+    doc = editor.document()
+    image = window.blob_store.put_image(QImage(16, 16, QImage.Format_RGB32))
+    bold = QTextCharFormat()
+    bold.setFontWeight(QFont.Bold)
+    big = QTextCharFormat()
+    big.setFontPointSize(18)
+    big.setForeground(QColor("#884422"))
+    plain = QTextCharFormat()
+    cursor = QTextCursor(doc)
+    cursor.beginEditBlock()
+    for i in range(20000):
+        if i:
+            cursor.insertBlock()
+        cursor.insertText(f"Paragraphe {i} ", big if i % 50 == 0 else bold)
+        cursor.insertText("du texte ordinaire, puis un passage ", plain)
+        cursor.insertText("en gras", bold)
+        if i % 1000 == 0:
+            image_format = QTextImageFormat()
+            image_format.setName(f"{ImageBlobStore.SCHEME}:{image}")
+            cursor.insertImage(image_format)
+    cursor.endEditBlock()
+    app.processEvents()
+    changes = []
+    doc.contentsChange.connect(lambda *args: changes.append(args))
+
+    def run_job(label: str, fmt: QTextCharFormat, replace: bool = False) -> dict:
+        changes.clear()
+        before = doc.toHtml()
+        start = time.perf_counter()
+        editor.bulk_job = BatchFormat(editor, label, fmt, replace)
+        job = editor.bulk_job
+        job.start()
+        while editor.bulk_job is not None:
+            app.processEvents()
+        total_ms = (time.perf_counter() - start) * 1000
+        steps = sorted(job.step_times_ms)
+        contents_changes = len(changes)
+        # une seule annulation ramène la note d'avant, puis on refait pour la suite
+        after = doc.toHtml()
+        doc.undo()
+        single_undo = doc.toHtml() == before
+        doc.redo()
+        app.processEvents()
+        return {
+            "total_ms": round(total_ms, 1),
+            "chunks": len(steps),
+            "step_median_ms": round(steps[len(steps) // 2], 1),
+            "step_max_ms": round(steps[-1], 1),
+            "contents_changes": contents_changes,
+            "single_undo": single_undo and doc.toHtml() == after,
+        }
+
+    results: dict = {"blocks": doc.blockCount()}
+    color = window.color_scheme_format()
+    start = time.perf_counter()
+    cursor = QTextCursor(doc)
+    cursor.select(QTextCursor.Document)
+    cursor.mergeCharFormat(color)
+    app.processEvents()
+    results["select_all_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    doc.undo()
+    app.processEvents()
+    results["color"] = run_job("Couleur", color)
+    results["strip"] = run_job("Effacement", window.note_base_format(), replace=True)
+    images = bold_runs = 0
+    block = doc.begin()
+    while block.isValid():
+        it = block.begin()
+        while not it.atEnd():
+            fmt = it.fragment().charFormat()
+            images += fmt.isImageFormat()
+            bold_runs += fmt.fontWeight() > QFont.Normal
+            it += 1
+        block = block.next()
+    results["images_kept"] = images
+    results["bold_runs_left"] = bold_runs
+    return results
+
+
+@benchmark("find")
+def bench_find(window: StickyNoteWindow) -> dict:
+    # 1 million de lignes (texte brut) : recherche dans le thread (gel max de la boucle d'événements
+    # pendant le parcours) vs boucle QTextDocument.find, puis "Tout remplacer" en un bloc d'édition
+    app = QApplication.instance()
+    window.set_plain_mode(True, confirm=False)
+    editor = window.editor
+    doc = editor.document()
+    lines = 1_000_000
+    editor.setPlainText("\n".join(f"{i:07d} worker-{i % 16} requête {'ERROR' if i % 97 == 0 else 'ok'} en {i % 500} ms" for i in range(lines)))
+    app.processEvents()
+    panel = window.find_panel
+    panel.show()
+    results: dict = {"lines": doc.blockCount(), "chars": doc.characterCount()}
+
+    # boucle d'événements "occupée" pendant la recherche : plus grand écart entre deux ticks de 5 ms
+    gaps: list[float] = []
+    last = [time.perf_counter()]
+
+    def tick() -> None:
+        now = time.perf_counter()
+        gaps.append((now - last[0]) * 1000)
+        last[0] = now
+
+    ticker = QTimer()
+    ticker.setInterval(5)
+    ticker.timeout.connect(tick)
+    panel.regex_box.setChecked(True)
+    panel.find_field.setText(r"worker-1[0-5] requête ERROR")
+    panel.restart_timer.stop()
+    start = time.perf_counter()
+    panel.restart()
+    restart_ms = (time.perf_counter() - start) * 1000
+    last[0] = time.perf_counter()
+    ticker.start()
+    while panel.search.running:
+        app.processEvents()
+    ticker.stop()
+    search = panel.search
+    results.update(
+        matches=len(search.starts),
+        snapshot_ms=round(search.snapshot_ms, 1),
+        start_blocking_ms=round(restart_ms, 1),
+        first_batch_ms=round(search.first_batch_ms, 1),
+        search_ms=round(search.search_ms, 1),
+        loop_max_gap_ms=round(max(gaps, default=0.0), 1),
+    )
+    panel.find_step(1)
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        app.processEvents()
+    results["highlighted"] = len(editor.extraSelections())
+
+    # boucle naïve sur le document, arrêtée après 2 s
+    expression = QRegularExpression(r"worker-1[0-5] requête ERROR")
+    cursor = QTextCursor(doc)
+    found = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 2.0:
+        cursor = doc.find(expression, cursor)
+        if cursor.isNull():
+            break
+        found += 1
+    elapsed = time.perf_counter() - start
+    results["naive_find_matches"] = found
+    results["naive_find_s"] = round(elapsed, 2)
+    results["naive_find_complete"] = cursor.isNull()
+
+    # frappe du motif lettre par lettre puis édition de la note, panneau ouvert : la copie texte
+    # du document est réutilisée (seule la zone modifiée est relue), pas refaite à chaque pause
+    typed = "worker-3 requête ok en 4"
+    typing_ms = []
+    panel.regex_box.setChecked(False)
+    for length in range(1, len(typed) + 1):
+        panel.find_field.setText(typed[:length])
+        panel.restart_timer.stop()
+        start = time.perf_counter()
+        panel.restart()
+        typing_ms.append((time.perf_counter() - start) * 1000)
+    cursor = QTextCursor(doc.findBlockByNumber(lines // 2))
+    cursor.insertText("worker-3 requête ok en 4 ")
+    start = time.perf_counter()
+    panel.restart()
+    results["typing_start_max_ms"] = round(max(typing_ms), 1)
+    results["edit_start_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    while panel.search.running:
+        app.processEvents()
+    results["edit_snapshot_ms"] = round(panel.search.snapshot_ms, 2)
+
+    # occurrences sur plusieurs lignes, donc à cheval sur les frontières de tranche (~1 Mo)
+    panel.regex_box.setChecked(True)
+    panel.find_field.setText(r"ms\n\d{7} worker-\d+ requête ERROR")
+    panel.restart_timer.stop()
+    panel.restart()
+    while panel.search.running:
+        app.processEvents()
+    expected = [(m.start(), m.end()) for m in panel.pattern.finditer(doc.toPlainText())]
+    results["multiline_matches"] = len(panel.search.starts)
+    results["failures"] = int(list(zip(panel.search.starts, panel.search.ends)) != expected)
+
+    # "Tout remplacer" : toutes les lignes ERROR (~10 000), un seul bloc d'édition
+    panel.find_field.setText(r"requête (ERROR)")
+    panel.replace_field.setText(r"requête \1!")
+    panel.restart_timer.stop()
+    panel.restart()
+    while panel.search.running:
+        app.processEvents()
+    before = doc.toPlainText()
+    start = time.perf_counter()
+    panel.replace_all()
+    while not editor.bulk_job:
+        app.processEvents()
+    job = editor.bulk_job
+    while editor.bulk_job is not None:
+        app.processEvents()
+    results["replace_all_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    steps = sorted(job.step_times_ms)
+    results["replace_step_max_ms"] = round(steps[-1], 1)
+    after = doc.toPlainText()
+    results["replaced"] = after.count("ERROR!")
+    doc.undo()
+    results["single_undo"] = doc.toPlainText() == before
+    return results
+
+
+@benchmark("leaks")
+def bench_leaks(window: StickyNoteWindow) -> dict:
+    # QObject vivants par classe avant / après 30 cycles des actions qui créent des objets (dialogues,
+    # mode texte brut, onglets, recherche, mise en forme par lots) : une classe qui grandit fuit
+    app = QApplication.instance()
+    window.editor.setPlainText("\n".join(f"ligne {i} avec un mot à chercher" for i in range(2000)))
+
+    def settle() -> None:
+        # hors de exec() : les objets en deleteLater sont libérés comme au retour dans la boucle
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+        app.processEvents()
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    def run_modal(open_dialog: Callable[[], None]) -> None:
+        QTimer.singleShot(0, lambda: QApplication.activeModalWidget().reject())
+        open_dialog()
+
+    def wait_job() -> None:
+        while window.editor.bulk_job is not None:
+            app.processEvents()
+
+    def cycle() -> None:
+        run_modal(window.open_size_dialog)
+        run_modal(window.open_resize_dialog)
+        run_modal(window.open_opacity_dialog)
+        run_modal(window.open_font_picker)
+        window.set_plain_mode(True, confirm=False)
+        window.set_plain_mode(False, confirm=False)
+        tab = window.new_tab()
+        window.close_tab(tab)
+        window.find_panel.open_panel()
+        window.find_panel.find_field.setText("mot")
+        window.find_panel.restart()
+        while window.find_panel.search.running:
+            app.processEvents()
+        window.find_panel.close_panel()
+        window.apply_color_to_note()
+        wait_job()
+        window.save_notes()
+        settle()
+
+    # premier passage : dialogues et caches construits une fois pour toutes
+    cycle()
+    before = live_qobject_counts()
+    start = time.perf_counter()
+    cycles = 30
+    for _ in range(cycles):
+        cycle()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    after = live_qobject_counts()
+    grown = {name: after.get(name, 0) - before.get(name, 0) for name in sorted(set(before) | set(after))}
+    return {
+        "cycles": cycles,
+        "cycle_ms": round(elapsed_ms / cycles, 1),
+        "qobjects_before": sum(before.values()),
+        "qobjects_after": sum(after.values()),
+        "dialogs_after": after.get("QDialog", 0) + sum(after.get(name, 0) for name in ("SizeDialog", "ResizeDialog", "OpacityDialog", "FontPickerDialog")),
+        "leaked": {name: delta for name, delta in grown.items() if delta > 0},
+    }
+
+
+@benchmark("storage")
+def bench_storage(window: StickyNoteWindow) -> dict:
+    # même session (ajout dans un paragraphe au hasard puis sauvegarde) avec les fichiers puis avec
+    # notes.db ; chargement complet et lectures d'un autre processus (un bloc au hasard) pour chacun
+    fill_benchmark_note(window, 2000)
+    doc = window.editor.document()
+    results: dict = {"blocks": doc.blockCount()}
+
+    def session(label: str, seed: int) -> None:
+        rnd = random.Random(seed)
+        save_ms, saved_bytes = [], 0
+        for _ in range(100):
+            cursor = QTextCursor(doc.findBlockByNumber(rnd.randrange(doc.blockCount())))
+            cursor.movePosition(QTextCursor.EndOfBlock)
+            cursor.insertText(" " + rnd.choice(PERSISTENCE_PHRASES))
+            if rnd.random() < 0.2:
+                cursor.insertBlock()
+            window.save_notes()
+            save_ms.append(window.last_save_ms)
+            saved_bytes += window.last_save_bytes
+        save_ms.sort()
+        results[f"{label}_save_median_ms"] = round(save_ms[len(save_ms) // 2], 2)
+        results[f"{label}_save_p95_ms"] = round(save_ms[int(len(save_ms) * 0.95)], 2)
+        results[f"{label}_bytes_per_save"] = saved_bytes // len(save_ms)
+
+    def reads(label: str, load: Callable[[QTextDocument], None], block_text: Callable[[int], str]) -> None:
+        start = time.perf_counter()
+        reloaded = QTextDocument()
+        load(reloaded)
+        results[f"{label}_load_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        results[f"{label}_reload_equal"] = reloaded.toPlainText() == doc.toPlainText()
+        rnd = random.Random(7)
+        numbers = [rnd.randrange(doc.blockCount()) for _ in range(50)]
+        start = time.perf_counter()
+        mismatches = sum(block_text(n) != doc.findBlockByNumber(n).text() for n in numbers)
+        results[f"{label}_random_block_read_ms"] = round((time.perf_counter() - start) * 1000 / len(numbers), 3)
+        results[f"{label}_random_block_mismatches"] = mismatches
+
+    window.save_notes()
+    results["files_full_save_ms"] = round(window.last_save_ms, 1)
+    session("files", 11)
+    reads(
+        "files",
+        lambda target: window.serializer.deserialize(target, window.notes_compact_path.read_text(encoding="utf-8")),
+        lambda n: window.notes_path.read_text(encoding="utf-8").split("\n")[n],
+    )
+
+    start = time.perf_counter()
+    window.set_storage_backend(True)
+    # migration = écriture complète de la note dans notes.db
+    results["migration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    session("sqlite", 11)
+    rows_written = window.store.last_rows_written
+    other = SqliteNoteStore(window.notes_db_path, window.serializer)
+    reader = sqlite3.connect(f"{window.notes_db_path.resolve().as_uri()}?mode=ro", uri=True)
+    reads(
+        "sqlite",
+        lambda target: other.load(NoteTab.MAIN_ID, target, False),
+        lambda n: reader.execute(
+            "SELECT text FROM blocks WHERE note = ? ORDER BY position LIMIT 1 OFFSET ?", (NoteTab.MAIN_ID, n)
+        ).fetchone()[0],
+    )
+    reader.close()
+    other.close()
+    results["sqlite_last_rows_written"] = rows_written
+    results["db_bytes"] = sum(path.stat().st_size for path in window.data_dir.glob(f"{NOTES_DB_NAME}*"))
+    return results
+
+
+# dépassement toléré d'une tranche de fond, en multiple de son budget
+IDLE_SLICE_FACTOR = 3
+# tâches dont la tranche se termine par une remise en page du document
+IDLE_RELAYOUT_TASKS = {"surlignage"}
+
+
+@benchmark("idle")
+def bench_idle(window: StickyNoteWindow) -> dict:
+    # travail de fond en attente (bloc de code de 30k lignes à colorer, 3000 images orphelines,
+    # onglets au-delà du budget) pendant 1,5 s de frappe (une touche / 30 ms) puis à l'arrêt ;
+    # "eager" = mêmes tâches sans attendre l'inactivité (IDLE_AFTER_MS = 0)
+    app = QApplication.instance()
+    scheduler = window.idle
+    window.tabs_config["budget_mb"] = 1
+    for number in range(8):
+        window.new_tab()
+        window.editor.setPlainText("\n".join(f"onglet {number} ligne {i}" + " texte" * 10 for i in range(3000)))
+    window.activate_tab(window.main_tab)
+    # sauvegardes de la note de 30k lignes hors mesure (activate_tab remplace la politique de sauvegarde)
+    window.autosave.suspend()
+    code = "\n".join(f"    value_{i} = compute({i}, 'x')  # commentaire" for i in range(30000))
+
+    def queue_work() -> None:
+        window.editor.setPlainText("Titre\n" + "\n".join(f"ligne {i}" for i in range(200)) + f"\n```\n{code}\n```\n")
+        window.blob_store.blobs_dir.mkdir(parents=True, exist_ok=True)
+        for i in range(3000):
+            window.blob_store.blobs_dir.joinpath(f"{i:064x}.png").write_bytes(b"x")
+        scheduler.start_job("images", window.blob_garbage_job(""))
+        scheduler.request("onglets")
+
+    def session(label: str) -> dict:
+        queue_work()
+        # mise en page initiale du texte remplacé : hors mesure, l'utilisateur est toujours "actif"
+        warm_until = time.perf_counter() + 0.5
+        while time.perf_counter() < warm_until:
+            scheduler.note_input()
+            app.processEvents()
+        runs_before = sum(task.runs for task in scheduler.tasks.values())
+        cursor = QTextCursor(window.editor.document())
+        lateness = []
+        start = time.perf_counter()
+        for tick in range(50):
+            due = start + tick * 0.030
+            while time.perf_counter() < due:
+                app.processEvents()
+            lateness.append((time.perf_counter() - due) * 1000)
+            cursor.setPosition(3)
+            cursor.insertText("a")
+        typing_runs = sum(task.runs for task in scheduler.tasks.values()) - runs_before
+        last_key = time.perf_counter()
+        gaps = []
+        previous = last_key
+        while scheduler.pending_names() and time.perf_counter() - last_key < 60:
+            app.processEvents()
+            now = time.perf_counter()
+            gaps.append((now - previous) * 1000)
+            previous = now
+        lateness.sort()
+        gaps.sort()
+        return {
+            f"{label}_key_lateness_median_ms": round(lateness[len(lateness) // 2], 2),
+            f"{label}_key_lateness_max_ms": round(lateness[-1], 2),
+            f"{label}_slices_while_typing": typing_runs,
+            f"{label}_done_after_last_key_ms": round((time.perf_counter() - last_key) * 1000, 1),
+            f"{label}_idle_loop_max_gap_ms": round(gaps[-1], 2) if gaps else 0.0,
+            f"{label}_pending_left": scheduler.pending_names(),
+        }
+
+    # ramasse-miettes coupé pendant la mesure (comme timeit) : ses passages tombent dans la tranche
+    # qui alloue, quel que soit son découpage
+    gc.disable()
+    try:
+        results = session("idle")
+    finally:
+        gc.enable()
+    results["tasks"] = scheduler.metrics()
+    # une tranche de surlignage se termine par une remise en page : Qt y repositionne tous les blocs
+    # qui suivent, quelle que soit la taille de la tranche (une frappe au même endroit la paie aussi).
+    # Au-delà de la plus lente de ces remises en page, une tranche ne dépasse pas son budget de beaucoup
+    results["relayout_max_ms"] = round(window.code_highlighter.relayout_max_ms, 2)
+    results["slice_bounds_ms"] = {
+        name: round(IDLE_SLICE_FACTOR * task["budget_ms"] + (results["relayout_max_ms"] if name in IDLE_RELAYOUT_TASKS else 0.0), 2)
+        for name, task in results["tasks"].items()
+    }
+    results["failures"] = sum(task["max_slice_ms"] > results["slice_bounds_ms"][name] for name, task in results["tasks"].items())
+    results["deferred_blocks"] = window.code_highlighter.deferred_blocks
+    results["blobs_collected"] = window.blob_store.collected
+    results["tab_evictions"] = window.tab_evictions
+    results["pauses"] = scheduler.pauses
+    scheduler.IDLE_AFTER_MS = 0
+    results.update(session("eager"))
+    return results
+
+
+@benchmark("replay")
+def bench_replay(window: StickyNoteWindow) -> dict:
+    # session scriptée (frappe, raccourci, annulation, molette, sélection à la souris, glisser de la
+    # fenêtre, thème) enregistrée par SessionRecorder, puis rejouée dans une fenêtre neuve
+    app = QApplication.instance()
+    window.editor.setPlainText("\n".join(f"ligne {i} " + "texte " * 12 for i in range(400)))
+    window.activateWindow()
+    window.editor.setFocus()
+    app.processEvents()
+    stamp = 0
+
+    def send(target: QWidget, event) -> None:
+        nonlocal stamp
+        stamp += 1
+        event.setTimestamp(stamp)
+        QApplication.sendEvent(target, event)
+        # une saisie toutes les 10 ms environ
+        due = time.perf_counter() + 0.010
+        while time.perf_counter() < due:
+            app.processEvents()
+
+    def type_text(text: str) -> None:
+        for char in text:
+            if char == "\n":
+                send(window.editor, QKeyEvent(QEvent.KeyPress, Qt.Key_Return, Qt.NoModifier, "\r"))
+            else:
+                send(window.editor, QKeyEvent(QEvent.KeyPress, ord(char.upper()) if char.isascii() else 0, Qt.NoModifier, char))
+
+    def mouse(target: QWidget, kind: QEvent.Type, pos: QPoint, buttons) -> None:
+        button = Qt.NoButton if kind == QEvent.MouseMove else Qt.LeftButton
+        send(target, QMouseEvent(kind, QPointF(pos), QPointF(target.mapToGlobal(pos)), button, buttons, Qt.NoModifier))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp, "session.jsonl.gz")
+        recorder = SessionRecorder(window, path)
+        recorder.start()
+        for phrase in PERSISTENCE_PHRASES:
+            type_text(phrase)
+        send(window.editor, QKeyEvent(QEvent.KeyPress, Qt.Key_B, Qt.ControlModifier, ""))
+        type_text("texte en gras ")
+        send(window.editor, QKeyEvent(QEvent.KeyPress, Qt.Key_Z, Qt.ControlModifier, ""))
+        viewport = window.editor.viewport()
+        for _ in range(10):
+            send(viewport, QWheelEvent(QPointF(40, 40), QPointF(viewport.mapToGlobal(QPoint(40, 40))), QPoint(), QPoint(0, -120), Qt.NoButton, Qt.NoModifier, Qt.NoScrollPhase, False))
+        mouse(viewport, QEvent.MouseButtonPress, QPoint(20, 30), Qt.LeftButton)
+        for x in range(20, 200, 20):
+            mouse(viewport, QEvent.MouseMove, QPoint(x, 30 + x // 4), Qt.LeftButton)
+        mouse(viewport, QEvent.MouseButtonRelease, QPoint(200, 80), Qt.NoButton)
+        type_text("remplacé ")
+        handle = QPoint(5, 5)
+        mouse(window.drag_button, QEvent.MouseButtonPress, handle, Qt.LeftButton)
+        for step in range(1, 6):
+            mouse(window.drag_button, QEvent.MouseMove, handle + QPoint(step * 10, step * 4), Qt.LeftButton)
+        mouse(window.drag_button, QEvent.MouseButtonRelease, handle + QPoint(50, 20), Qt.NoButton)
+        window.theme_combo.setCurrentText(next(name for name in THEMES if name != window.theme_combo.currentText()))
+        type_text("fin\n")
+        recorder.stop()
+        results = {"recorded_events": recorder.events, "session_bytes": path.stat().st_size}
+        replayer = SessionReplayer(path)
+        for speed in ("max", "real"):
+            with tempfile.TemporaryDirectory() as other:
+                replay_window = StickyNoteWindow(data_dir=Path(other))
+                replay_window.show()
+                app.processEvents()
+                outcome = replayer.run(replay_window, speed)
+                replay_window.close()
+                replay_window.deleteLater()
+                QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+            results[speed] = {key: outcome[key] for key in ("duration_ms", "latency", "by_kind", "missing_actions", "digest_matches")}
+            if "lateness" in outcome:
+                results[speed]["lateness"] = outcome["lateness"]
+        results["failures"] = sum(results[speed]["digest_matches"] is False for speed in ("max", "real"))
+    return results
+
+
+@benchmark("gradient_scroll")
+def bench_gradient_scroll(window: StickyNoteWindow) -> dict:
+    # 3000 paragraphes colorés par apply_color_scheme (uni, puis dégradé vertical), parcourus
+    # par pas de 40 px vers le bas puis vers le haut ; "uncached" = GradientBlockCache désactivé
+    app = QApplication.instance()
+    editor = window.editor
+    window.resize(900, 1200)
+    window.current_colors = ["#c0392b", "#2c3e90"]
+    line = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor."
+    results: dict = {}
+    for label, mode, cached in (("solid", "solid", True), ("gradient_uncached", "vertical", False), ("gradient", "vertical", True)):
+        editor.gradient_cache_enabled = cached
+        editor.setPlainText("\n".join(f"{i:05d} {line}" for i in range(3000)))
+        cursor = QTextCursor(editor.document())
+        cursor.select(QTextCursor.Document)
+        editor.setTextCursor(cursor)
+        window.current_color_mode = mode
+        window.apply_color_scheme()
+        editor.moveCursor(QTextCursor.Start)
+        bar = editor.verticalScrollBar()
+        bar.setValue(0)
+        app.processEvents()
+        frames = []
+        values = list(range(0, min(bar.maximum(), 8000), 40))
+        for value in values + values[::-1]:
+            start = time.perf_counter()
+            bar.setValue(value)
+            editor.viewport().repaint()
+            frames.append((time.perf_counter() - start) * 1000)
+        frames.sort()
+        results[f"{label}_frame_median_ms"] = round(frames[len(frames) // 2], 3)
+        results[f"{label}_frame_p95_ms"] = round(frames[int(len(frames) * 0.95)], 3)
+        results[f"{label}_frame_max_ms"] = round(frames[-1], 3)
+        cache = editor.document().gradient_cache
+        if cache is not None and cached:
+            results[f"{label}_renders"] = cache.renders
+            results[f"{label}_hits"] = cache.hits
+            results[f"{label}_cached_kb"] = round(cache.cached_bytes / 1024)
+    results["frames_per_run"] = len(frames)
+    results["viewport"] = [editor.viewport().width(), editor.viewport().height()]
+    return results
+
+
+@benchmark("paste")
+def bench_paste(window: StickyNoteWindow) -> dict:
+    app = QApplication.instance()
+    editor = window.editor
+    doc = editor.document()
+    log = "".join(f"2024-05-01 12:00:{i % 60:02d} INFO worker[{i % 8}] request id={i} done in {i % 97} ms\r\n" for i in range(70000))
+    mime = QMimeData()
+    mime.setText(log)
+    saves = window.autosave.save_count
+    start = time.perf_counter()
+    editor.insertFromMimeData(mime)
+    job = editor.bulk_job
+    while editor.bulk_job is not None:
+        app.processEvents()
+    chunked_s = time.perf_counter() - start
+    steps = sorted(job.step_times_ms)
+    deadline = time.perf_counter() + 1
+    while time.perf_counter() < deadline:
+        app.processEvents()
+    saves_after = window.autosave.save_count - saves
+    blocks = doc.blockCount()
+    doc.undo()
+    undone = doc.isEmpty()
+    # même contenu inséré d'un bloc, comme le collage par défaut
+    cursor = editor.textCursor()
+    start = time.perf_counter()
+    cursor.insertText(log.replace("\r\n", "\n"))
+    app.processEvents()
+    blocking_s = time.perf_counter() - start
+    return {
+        "payload_mb": round(len(log) / (1024 * 1024), 1),
+        "blocks": blocks,
+        "chunked_total_s": round(chunked_s, 2),
+        "chunks": len(steps),
+        "step_median_ms": round(steps[len(steps) // 2], 1),
+        "step_max_ms": round(steps[-1], 1),
+        "blocking_insert_s": round(blocking_s, 2),
+        "saves_after_paste": saves_after,
+        "single_undo": undone,
+    }
+
+
+@benchmark("startup")
+def bench_startup(window: StickyNoteWindow) -> dict:
+    # construction d'une seconde fenêtre sur le même dossier (lectures en série) ;
+    # "cold" : fichiers de données et ressources retirés du cache de pages avant chaque fenêtre
+    # (POSIX_FADV_DONTNEED, Linux), comme au premier lancement après le démarrage de la machine
+    app = QApplication.instance()
+    fill_benchmark_note(window, 2000)
+    window.save_notes()
+    cold_files = [path for path in window.data_dir.iterdir() if path.is_file()]
+    for sub in ("", "app image", "nav", "fonts"):
+        root = Path(resource_path(sub)) if sub else Path(resource_path())
+        if root.is_dir():
+            cold_files += [path for path in (root.rglob("*") if sub else root.iterdir()) if path.is_file()]
+    labels = ["warm"]
+    if hasattr(os, "posix_fadvise"):
+        labels.append("cold")
+    # modes alternés : chaque fenêtre réenregistre les polices, les suivantes sont un peu plus lentes
+    timings: dict[str, list[float]] = {label: [] for label in labels}
+    for i in range(10 * len(labels)):
+        label = labels[i % len(labels)]
+        if label == "cold":
+            evict_page_cache(cold_files)
+        start = time.perf_counter()
+        other = StickyNoteWindow(data_dir=window.data_dir)
+        timings[label].append((time.perf_counter() - start) * 1000)
+        other.close()
+        other.deleteLater()
+        app.processEvents()
+    results: dict = {}
+    for label, values in timings.items():
+        values.sort()
+        results[f"{label}_median_ms"] = round(values[len(values) // 2], 1)
+    results["cold_files"] = len(cold_files) if "cold" in timings else 0
+    return results
+
+
+def evict_page_cache(paths: list[Path]) -> None:
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+@benchmark("font_picker")
+def bench_font_picker(window: StickyNoteWindow) -> dict:
+    # bibliothèque simulée : copies des polices embarquées dans un dossier utilisateur
+    app = QApplication.instance()
+    library = window.data_dir.joinpath("library")
+    sources = sorted(window.fonts_dir.rglob("*.ttf"))
+    for i in range(2000):
+        src = sources[i % len(sources)]
+        dest = library.joinpath(f"{i // 100:02d}", f"{i:04d}-{src.name}")
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.write_bytes(src.read_bytes())
+    index = window.font_index
+    files, cold_parsed, cold_ms = index.scan_files([library], {})
+    files, warm_parsed, warm_ms = index.scan_files([library], files)
+    # plusieurs milliers de familles distinctes pour la liste et le menu
+    index.set_files({f"{n}.ttf": {"size": 0, "mtime": 0, "families": [f"Famille {n:05d}"]} for n in range(5000)})
+    for n in range(0, 5000, 50):
+        window.update_font_menu_checks(f"Famille {n:05d}")
+    start = time.perf_counter()
+    for n in range(0, 5000, 50):
+        window.update_font_menu_checks(f"Famille {n:05d}")
+    check_us = (time.perf_counter() - start) / 100 * 1e6
+    window.font_picker = FontPickerDialog(window)
+    window.font_picker.show()
+    start = time.perf_counter()
+    window.font_picker.refresh()
+    app.processEvents()
+    refresh_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    window.font_picker.search.setText("49")
+    app.processEvents()
+    filter_ms = (time.perf_counter() - start) * 1000
+    window.font_picker.hide()
+    return {
+        "font_files": len(files),
+        "cold_scan_ms": round(cold_ms, 1),
+        "cold_parsed": cold_parsed,
+        "warm_scan_ms": round(warm_ms, 1),
+        "warm_parsed": warm_parsed,
+        "menu_actions": len(window.font_actions),
+        "menu_check_us": round(check_us, 1),
+        "picker_rows": window.font_picker.model.rowCount(),
+        "picker_refresh_ms": round(refresh_ms, 1),
+        "picker_filter_ms": round(filter_ms, 1),
+        "previews_rendered": window.font_picker.delegate.misses,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="bench.py", description="Benchmarks hors écran de BlocNoteEpinglé.")
+    parser.add_argument("names", nargs="*", metavar="NOM", help="benchmarks à lancer (défaut : tous)")
+    # processus enfants lancés par les benchmarks persistence, sync et tabs
+    parser.add_argument("--crash-child", nargs=2, metavar=("DOSSIER", "GRAINE"), help=argparse.SUPPRESS)
+    parser.add_argument("--sync-child", metavar="DOSSIER", help=argparse.SUPPRESS)
+    parser.add_argument("--tabs-child", metavar="DOSSIER", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.crash_child:
+        return run_crash_child(Path(args.crash_child[0]), int(args.crash_child[1]))
+    if args.sync_child:
+        return run_sync_child(Path(args.sync_child))
+    if args.tabs_child:
+        return run_tabs_child(Path(args.tabs_child))
+    return run_benchmarks(args.names)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,38 +1,507 @@
 from __future__ import annotations
 
-import ctypes
+# seulement ce dont la ligne de commande a besoin : le reste est importé après son aiguillage
+import argparse
 import json
+import os
+import re
 import sys
-from ctypes import wintypes
-from pathlib import Path
+import threading
+import time
+from pathlib import Path, PurePath
 
 
 def resource_path(*parts: str) -> Path:
     base = Path(getattr(sys, "_MEIPASS", Path(__file__).parent))
     return base.joinpath(*parts)
+
+
+# --- Ligne de commande sans interface : définie avant les imports Qt pour démarrer vite ---
+
+CLI_COMMANDS = ("cat", "append", "search", "export", "stats")
+READING_WORDS_PER_MINUTE = 200
+# seuil du passage automatique en mode texte brut (quand l'option est activée)
+AUTO_PLAIN_MODE_CHARS = 4 * 1024 * 1024
+# identifiants QTextFormat (le format compact notes.json les stocke tels quels)
+FMT_FONT_WEIGHT = "8195"
+FMT_FONT_ITALIC = "8196"
+FMT_FONT_UNDERLINE = "8197"
+FMT_UNDERLINE_STYLE = "8227"
+FMT_STRIKE_OUT = "8199"
+# stockage optionnel en base SQLite (voir SqliteNoteStore), choisi dans storage.json
+STORAGE_CONFIG_NAME = "storage.json"
+NOTES_DB_NAME = "notes.db"
+
+
+def default_data_dir() -> Path:
+    # même dossier que QStandardPaths.AppDataLocation (pas d'organisation) : Qt nomme l'application
+    # d'après l'exécutable sans extension sous Windows, d'après argv[0] tel quel ailleurs
+    if sys.platform.startswith("win"):
+        app_name = Path(sys.executable).stem
+    else:
+        app_name = Path(sys.executable if getattr(sys, "frozen", False) else sys.argv[0]).name
+    if sys.platform.startswith("win"):
+        base = Path(os.environ.get("APPDATA", Path.home().joinpath("AppData", "Roaming")))
+    elif sys.platform == "darwin":
+        base = Path.home().joinpath("Library", "Application Support")
+    else:
+        base = Path(os.environ.get("XDG_DATA_HOME") or Path.home().joinpath(".local", "share"))
+    return base.joinpath(app_name)
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    # fichier temporaire propre à l'écrivain, synchronisé puis renommé : un lecteur (ou un
+    # redémarrage après plantage) voit l'ancienne version complète ou la nouvelle, jamais un mélange
+    tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    for attempt in range(5):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            # Windows : la cible est ouverte ailleurs sans partage en suppression
+            if attempt == 4:
+                tmp.unlink(missing_ok=True)
+                raise
+            time.sleep(0.01 * (attempt + 1))
+
+
+def process_running(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if sys.platform.startswith("win"):
+        import ctypes
+
+        # PROCESS_QUERY_LIMITED_INFORMATION ; os.kill(pid, 0) terminerait le processus sous Windows
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return kernel32.GetLastError() == 5  # ERROR_ACCESS_DENIED : il existe
+        try:
+            code = ctypes.c_ulong()
+            return not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)) or code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def remove_stale_temp_files(directory: Path, max_age: float = 60.0, local: bool = False) -> int:
+    # restes d'atomic_write interrompus (processus tué entre l'écriture et le renommage). Dossier
+    # local : le pid inscrit dans le nom suffit, un fichier dont l'écrivain est mort part tout de
+    # suite ; dossier partagé (synchro), le pid peut être celui d'une autre machine, seul l'âge compte
+    now = time.time()
+    return sum(remove_stale_temp_file(tmp, now, max_age, local) for tmp in directory.glob("*.tmp"))
+
+
+def remove_stale_temp_file(tmp: Path, now: float, max_age: float = 60.0, local: bool = False) -> bool:
+    pid = tmp.name.rsplit(".", 2)[-2].split("-")[0]
+    try:
+        if (local and pid.isdigit() and not process_running(int(pid))) or now - tmp.stat().st_mtime > max_age:
+            tmp.unlink()
+            return True
+    except OSError:
+        pass
+    return False
+
+
+class NotesFileLock:
+    # verrou inter-processus sur notes.lock : l'interface l'a pendant ses écritures et la fusion
+    # de inbox.txt, la ligne de commande pendant ses lectures / ajouts. timeout=0 : une seule
+    # tentative (thread de l'interface, qui réessaie par minuterie au lieu d'attendre)
+    SHUTDOWN_TIMEOUT = 5.0
+    def __init__(self, path: Path, timeout: float = 5.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._file = None
+
+    def __enter__(self) -> NotesFileLock:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a+b")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._lock(self._file.fileno())
+                return self
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._file.close()
+                    raise TimeoutError(f"{self.path} est verrouillé")
+                time.sleep(0.02)
+
+    def __exit__(self, *exc) -> None:
+        try:
+            self._unlock(self._file.fileno())
+        finally:
+            self._file.close()
+
+    @staticmethod
+    def _lock(fd: int) -> None:
+        if sys.platform.startswith("win"):
+            import msvcrt
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    @staticmethod
+    def _unlock(fd: int) -> None:
+        if sys.platform.startswith("win"):
+            import msvcrt
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def storage_backend(data_dir: Path) -> str:
+    # storage.json reste un fichier : il dit où sont rangés la note et les autres réglages
+    try:
+        data = json.loads(data_dir.joinpath(STORAGE_CONFIG_NAME).read_text(encoding="utf-8"))
+        return "sqlite" if data.get("backend") == "sqlite" else "files"
+    except (OSError, ValueError, AttributeError):
+        return "files"
+
+
+def open_notes_db(data_dir: Path) -> sqlite3.Connection | None:
+    path = data_dir.joinpath(NOTES_DB_NAME)
+    if storage_backend(data_dir) != "sqlite" or not path.exists():
+        return None
+    import sqlite3  # ~10 ms : seulement quand la note est vraiment en base
+
+    try:
+        return sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return None
+
+
+def read_data_config(data_dir: Path, name: str, db: sqlite3.Connection | None = None) -> object:
+    # réglage de l'interface : table settings de notes.db (stockage SQLite), sinon fichier JSON
+    if db is not None:
+        import sqlite3  # déjà chargé par open_notes_db
+
+        try:
+            row = db.execute("SELECT value FROM settings WHERE key = ?", (name,)).fetchone()
+            if row is not None:
+                return json.loads(row[0])
+        except (ValueError, sqlite3.Error):
+            return None
+    try:
+        return json.loads(data_dir.joinpath(name).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def sync_active(data_dir: Path, db: sqlite3.Connection | None = None) -> bool:
+    # sync.json garde le choix de l'utilisateur ; la synchro est en pause tant que la note
+    # principale est en texte brut (editor_mode.json), notes.txt fait alors foi
+    sync = read_data_config(data_dir, "sync.json", db)
+    mode = read_data_config(data_dir, "editor_mode.json", db)
+    return isinstance(sync, dict) and bool(sync.get("enabled")) and not (isinstance(mode, dict) and mode.get("plain"))
+
+
+def read_db_blocks(db: sqlite3.Connection, note_id: str) -> list[list] | None:
+    # une ligne par bloc : texte découpé en runs (longueurs dans runs) + formats partagés (table formats)
+    import sqlite3  # déjà chargé par open_notes_db
+
+    try:
+        if db.execute("SELECT 1 FROM notes WHERE id = ?", (note_id,)).fetchone() is None:
+            return None
+        rows = db.execute(
+            "SELECT b.text, b.runs, f.data FROM blocks b LEFT JOIN formats f ON f.id = b.format "
+            "WHERE b.note = ? ORDER BY b.position",
+            (note_id,),
+        ).fetchall()
+    except sqlite3.Error:
+        return None
+    layouts: dict[str, list] = {}
+    blocks = []
+    for text, runs, data in rows:
+        if data is None:
+            blocks.append([[text, {}]])
+            continue
+        if data not in layouts:
+            layouts[data] = json.loads(data)["f"]
+        lengths = [int(n) for n in runs.split(",")] if runs else [len(text)]
+        block, start = [], 0
+        for length, props in zip(lengths, layouts[data]):
+            block.append([text[start : start + length], props])
+            start += length
+        blocks.append(block)
+    return blocks
+
+
+def read_note_blocks(data_dir: Path, formatted: bool = False) -> list[list]:
+    # -> blocs [[texte, props], ...] depuis le dossier partagé (mode synchro), sinon notes.db, sinon
+    # notes.txt (runs sans format, plus rapide) puis notes.json ; avec formatted, notes.json passe avant notes.txt
+    db = open_notes_db(data_dir)
+    try:
+        if sync_active(data_dir, db):
+            manifest = json.loads(data_dir.joinpath("sync", "manifest.json").read_text(encoding="utf-8"))
+            blocks = []
+            for digest in manifest["blocks"]:
+                record = json.loads(data_dir.joinpath("sync", "blocks", f"{digest}.json").read_text(encoding="utf-8"))
+                fragments = record["f"]
+                blocks.append([[fragments[i], fragments[i + 1]] for i in range(0, len(fragments), 2)])
+            return blocks
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    if db is not None:
+        blocks = read_db_blocks(db, "main")
+        db.close()
+        if blocks is not None:
+            return blocks
+    for name in ("notes.json", "notes.txt") if formatted else ("notes.txt", "notes.json"):
+        path = data_dir.joinpath(name)
+        if name == "notes.txt" and path.exists():
+            return [[[line, {}]] for line in path.read_text(encoding="utf-8").split("\n")]
+        if name == "notes.json":
+            try:
+                payload = json.loads(path.read_text(encoding="utf-8"))
+                return [[[entry[i], payload["c"][entry[i + 1]]] for i in range(3, len(entry), 2)] for entry in payload["b"]]
+            except (OSError, ValueError, KeyError, TypeError, IndexError):
+                pass
+    return []
+
+
+def read_note_text(data_dir: Path, include_inbox: bool = True) -> str:
+    lines = ["".join(text for text, _ in block).replace("\ufffc", "") for block in read_note_blocks(data_dir)]
+    text = "\n".join(lines)
+    inbox = data_dir.joinpath("inbox.txt")
+    if include_inbox and inbox.exists():
+        pending = inbox.read_text(encoding="utf-8").rstrip("\n")
+        text = f"{text}\n{pending}" if text else pending
+    return text
+
+
+def notes_html_is_current(data_dir: Path) -> bool:
+    # notes.html n'est tenu à jour qu'en stockage fichiers hors synchro, et ignore inbox.txt
+    if storage_backend(data_dir) != "files" or data_dir.joinpath("inbox.txt").exists():
+        return False
+    return data_dir.joinpath("notes.html").exists() and not sync_active(data_dir)
+
+
+def export_note(data_dir: Path, fmt: str) -> str:
+    if fmt == "txt":
+        return read_note_text(data_dir) + "\n"
+    if fmt == "html" and notes_html_is_current(data_dir):
+        return data_dir.joinpath("notes.html").read_text(encoding="utf-8")
+    import html as html_lib
+
+    out = []
+    for block in read_note_blocks(data_dir, formatted=True):
+        parts = []
+        for text, props in block:
+            text = text.replace("\ufffc", "")
+            if not text:
+                continue
+            bold = props.get(FMT_FONT_WEIGHT, 400) > 500
+            italic = props.get(FMT_FONT_ITALIC, False)
+            underline = props.get(FMT_UNDERLINE_STYLE, 0) or props.get(FMT_FONT_UNDERLINE, False)
+            strike = props.get(FMT_STRIKE_OUT, False)
+            if fmt == "md":
+                core = text.strip()
+                if core:
+                    wrap = ("**" if bold else "") + ("*" if italic else "") + ("~~" if strike else "")
+                    text = text.replace(core, f"{wrap}{core}{wrap[::-1]}", 1)
+                parts.append(text)
+            else:
+                text = html_lib.escape(text)
+                for flag, tag in ((bold, "b"), (italic, "i"), (underline, "u"), (strike, "s")):
+                    if flag:
+                        text = f"<{tag}>{text}</{tag}>"
+                parts.append(text)
+        line = "".join(parts)
+        out.append(line if fmt == "md" else f"<p>{line or '<br>'}</p>")
+    inbox = data_dir.joinpath("inbox.txt")
+    if inbox.exists():
+        for line in inbox.read_text(encoding="utf-8").rstrip("\n").split("\n"):
+            out.append(line if fmt == "md" else f"<p>{html_lib.escape(line) or '<br>'}</p>")
+    if fmt == "md":
+        return "\n\n".join(out) + "\n"
+    return '<!DOCTYPE html>\n<html><head><meta charset="utf-8"></head><body>\n' + "\n".join(out) + "\n</body></html>\n"
+
+
+def run_cli(argv: list[str]) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--data-dir", type=Path, default=None, help="dossier de données (défaut : AppData)")
+    parser = argparse.ArgumentParser(prog="BlocNoteEpinglé", description="Opérations sur la note sans lancer l'interface.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("cat", parents=[common], help="affiche la note (y compris les ajouts en attente)")
+    append = sub.add_parser("append", parents=[common], help="ajoute du texte en fin de note ('-' = entrée standard)")
+    append.add_argument("text", nargs="+")
+    search = sub.add_parser("search", parents=[common], help="lignes de la note correspondant au motif")
+    search.add_argument("pattern")
+    search.add_argument("-i", "--ignore-case", action="store_true")
+    search.add_argument("-F", "--fixed-strings", action="store_true", help="motif littéral (pas une regex)")
+    export = sub.add_parser("export", parents=[common], help="exporte la note")
+    export.add_argument("--format", choices=("txt", "md", "html"), default="txt")
+    export.add_argument("output", nargs="?", help="fichier de sortie (défaut : sortie standard)")
+    sub.add_parser("stats", parents=[common], help="statistiques de la note")
+    args = parser.parse_args(argv)
+    data_dir = args.data_dir or default_data_dir()
+    lock = NotesFileLock(data_dir.joinpath("notes.lock"))
+
+    if args.command == "append":
+        text = sys.stdin.read() if args.text == ["-"] else " ".join(args.text)
+        # l'interface fusionne inbox.txt au prochain chargement (ou tout de suite si elle tourne)
+        with lock, open(data_dir.joinpath("inbox.txt"), "a", encoding="utf-8") as inbox:
+            inbox.write(text.rstrip("\n") + "\n")
+        return 0
+
+    with lock:
+        if args.command == "cat":
+            sys.stdout.write(read_note_text(data_dir) + "\n")
+        elif args.command == "search":
+            flags = re.IGNORECASE if args.ignore_case else 0
+            pattern = re.compile(re.escape(args.pattern) if args.fixed_strings else args.pattern, flags)
+            found = False
+            for number, line in enumerate(read_note_text(data_dir).split("\n"), start=1):
+                if pattern.search(line):
+                    found = True
+                    sys.stdout.write(f"{number}:{line}\n")
+            return 0 if found else 1
+        elif args.command == "export":
+            content = export_note(data_dir, args.format)
+            if args.output:
+                Path(args.output).write_text(content, encoding="utf-8")
+            else:
+                sys.stdout.write(content)
+        elif args.command == "stats":
+            text = read_note_text(data_dir)
+            words = len(text.split())
+            files = {
+                name: data_dir.joinpath(name).stat().st_size
+                for name in ("notes.json", "notes.html", "notes.txt", NOTES_DB_NAME, "inbox.txt")
+                if data_dir.joinpath(name).exists()
+            }
+            stats = {
+                "data_dir": str(data_dir),
+                "characters": len(text),
+                "words": words,
+                "lines": text.count("\n") + 1 if text else 0,
+                "reading_minutes": round(words / READING_WORDS_PER_MINUTE, 1),
+                "files_bytes": files,
+            }
+            sys.stdout.write(json.dumps(stats, ensure_ascii=False, indent=2) + "\n")
+    return 0
+
+
+def cli_arguments(argv: list[str]) -> list[str] | None:
+    # -> arguments pour run_cli si une sous-commande est demandée (un --data-dir global peut la
+    # précéder : il est reporté après elle), None pour lancer l'interface
+    rest, options = list(argv), []
+    while rest and (rest[0] == "--data-dir" or rest[0].startswith("--data-dir=")):
+        taken = 1 if "=" in rest[0] else 2
+        options, rest = options + rest[:taken], rest[taken:]
+    if rest and rest[0] in CLI_COMMANDS:
+        return [rest[0], *options, *rest[1:]]
+    return None
+
+
+if __name__ == "__main__" and cli_arguments(sys.argv[1:]) is not None:
+    raise SystemExit(run_cli(cli_arguments(sys.argv[1:])))
+
+import ast
+import base64
+import ctypes
+import gzip
+import hashlib
+import math
+import shutil
+import socket
+import sqlite3
+import struct
+import tempfile
+import tracemalloc
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from ctypes import wintypes
+from difflib import SequenceMatcher
+
 try:
     import winreg  # type: ignore[attr-defined]
 except Exception:  # pragma: no cover - non-Windows
     winreg = None
 
-from PySide6.QtCore import QObject, QPoint, QRect, QSize, QTimer, Qt, QStandardPaths
+from PySide6.QtCore import (
+    QAbstractListModel,
+    QBuffer,
+    QByteArray,
+    QDataStream,
+    QEvent,
+    QFileSystemWatcher,
+    QIODevice,
+    QModelIndex,
+    QObject,
+    QPoint,
+    QPointF,
+    QRect,
+    QRectF,
+    QSize,
+    QSortFilterProxyModel,
+    QStringListModel,
+    QTimer,
+    Qt,
+    QStandardPaths,
+    QUrl,
+    Signal,
+)
 from PySide6.QtGui import (
+    QAbstractTextDocumentLayout,
     QAction,
     QBrush,
     QColor,
     QFont,
     QFontDatabase,
     QGradient,
+    QGuiApplication,
     QIcon,
+    QImage,
+    QKeyEvent,
     QLinearGradient,
+    QMouseEvent,
+    QPaintEvent,
     QPainter,
+    QPalette,
     QPen,
+    QPixmap,
+    QPixmapCache,
     QCursor,
+    QSyntaxHighlighter,
     QTextCharFormat,
+    QTextBlock,
     QTextCursor,
+    QTextBlockFormat,
+    QTextDocument,
+    QTextFormat,
+    QTextImageFormat,
+    QTextLayout,
+    QTextLength,
+    QTextListFormat,
+    QWheelEvent,
 )
 from PySide6.QtWidgets import (
+    QAbstractButton,
     QApplication,
+    QCheckBox,
     QComboBox,
     QColorDialog,
     QDialog,
@@ -40,11 +509,22 @@ from PySide6.QtWidgets import (
     QFileDialog,
     QHBoxLayout,
     QLabel,
+    QLineEdit,
+    QListView,
     QMenu,
+    QMessageBox,
+    QProgressDialog,
     QPushButton,
+    QScrollBar,
+    QSizePolicy,
     QSlider,
+    QSplitter,
     QStyle,
+    QStyledItemDelegate,
     QSystemTrayIcon,
+    QTabBar,
+    QPlainTextDocumentLayout,
+    QPlainTextEdit,
     QTextEdit,
     QVBoxLayout,
     QWidget,
@@ -64,59 +544,59 @@ class MSG(ctypes.Structure):
 THEMES = {
     "Papier": """
         #StickyRoot { background-color: #f7f1dc; color: #2f2a1f; font-size: 13px; }
-        #StickyRoot QTextEdit {
+        #StickyRoot #NoteEditor {
             background-color: #fff9e8;
             border: 1px solid #dccfa8;
             border-radius: 8px;
             padding: 10px;
             selection-background-color: #d9c88f;
         }
-        #StickyRoot QTextEdit QScrollBar:vertical {
+        #StickyRoot #NoteEditor QScrollBar:vertical {
             background: transparent;
             width: 10px;
             margin: 2px 2px 2px 0;
         }
-        #StickyRoot QTextEdit QScrollBar::handle:vertical {
+        #StickyRoot #NoteEditor QScrollBar::handle:vertical {
             background: rgba(0, 0, 0, 0.25);
             border-radius: 5px;
             min-height: 24px;
         }
-        #StickyRoot QTextEdit QScrollBar::add-line:vertical,
-        #StickyRoot QTextEdit QScrollBar::sub-line:vertical {
+        #StickyRoot #NoteEditor QScrollBar::add-line:vertical,
+        #StickyRoot #NoteEditor QScrollBar::sub-line:vertical {
             height: 0px;
         }
-        #StickyRoot QTextEdit QScrollBar:horizontal { height: 0px; }
+        #StickyRoot #NoteEditor QScrollBar:horizontal { height: 0px; }
         #StickyRoot QComboBox, #StickyRoot QCheckBox { padding: 4px; }
     """,
     "Sticky": """
         #StickyRoot { background-color: #fff6a8; color: #3b3b2a; font-size: 13px; }
-        #StickyRoot QTextEdit {
+        #StickyRoot #NoteEditor {
             background-color: #fff9be;
             border: 1px solid #d7cd63;
             border-radius: 6px;
             padding: 10px;
             selection-background-color: #ebdf73;
         }
-        #StickyRoot QTextEdit QScrollBar:vertical {
+        #StickyRoot #NoteEditor QScrollBar:vertical {
             background: transparent;
             width: 10px;
             margin: 2px 2px 2px 0;
         }
-        #StickyRoot QTextEdit QScrollBar::handle:vertical {
+        #StickyRoot #NoteEditor QScrollBar::handle:vertical {
             background: rgba(0, 0, 0, 0.28);
             border-radius: 5px;
             min-height: 24px;
         }
-        #StickyRoot QTextEdit QScrollBar::add-line:vertical,
-        #StickyRoot QTextEdit QScrollBar::sub-line:vertical {
+        #StickyRoot #NoteEditor QScrollBar::add-line:vertical,
+        #StickyRoot #NoteEditor QScrollBar::sub-line:vertical {
             height: 0px;
         }
-        #StickyRoot QTextEdit QScrollBar:horizontal { height: 0px; }
+        #StickyRoot #NoteEditor QScrollBar:horizontal { height: 0px; }
         #StickyRoot QComboBox, #StickyRoot QCheckBox { padding: 4px; }
     """,
     "Sombre": """
         #StickyRoot { background-color: #23262b; color: #f2f2f2; font-size: 13px; }
-        #StickyRoot QTextEdit {
+        #StickyRoot #NoteEditor {
             background-color: #12151a;
             border: 1px solid #3f4550;
             border-radius: 8px;
@@ -124,21 +604,21 @@ THEMES = {
             selection-background-color: #5b6575;
             color: #f2f2f2;
         }
-        #StickyRoot QTextEdit QScrollBar:vertical {
+        #StickyRoot #NoteEditor QScrollBar:vertical {
             background: #1a1d21;
             width: 10px;
             margin: 2px 2px 2px 0;
         }
-        #StickyRoot QTextEdit QScrollBar::handle:vertical {
+        #StickyRoot #NoteEditor QScrollBar::handle:vertical {
             background: #4a5361;
             border-radius: 5px;
             min-height: 24px;
         }
-        #StickyRoot QTextEdit QScrollBar::add-line:vertical,
-        #StickyRoot QTextEdit QScrollBar::sub-line:vertical {
+        #StickyRoot #NoteEditor QScrollBar::add-line:vertical,
+        #StickyRoot #NoteEditor QScrollBar::sub-line:vertical {
             height: 0px;
         }
-        #StickyRoot QTextEdit QScrollBar:horizontal { height: 0px; }
+        #StickyRoot #NoteEditor QScrollBar:horizontal { height: 0px; }
         #StickyRoot QComboBox, #StickyRoot QCheckBox { padding: 4px; }
     """,
     # Textures gérées dynamiquement (voir apply_theme)
@@ -149,16 +629,21 @@ THEMES = {
 
 
 class StickyNoteWindow(QWidget):
-    def __init__(self) -> None:
+    def __init__(self, data_dir: Path | None = None) -> None:
         super().__init__()
         self.setObjectName("StickyRoot")
         self.base_dir = Path(getattr(sys, "_MEIPASS", Path(__file__).parent))
-        self.data_dir = Path(QStandardPaths.writableLocation(QStandardPaths.AppDataLocation))
+        # data_dir explicite = instance isolée (benchmarks) : pas de registre, tray ni hotkey
+        self.isolated = data_dir is not None
+        self.created_at = time.monotonic()
+        self.data_dir = data_dir or Path(QStandardPaths.writableLocation(QStandardPaths.AppDataLocation))
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        remove_stale_temp_files(self.data_dir, local=True)
 
         # writable paths
         self.notes_path = self.data_dir.joinpath("notes.txt")
         self.notes_html_path = self.data_dir.joinpath("notes.html")
+        self.notes_compact_path = self.data_dir.joinpath("notes.json")
         self.custom_style_path = self.data_dir.joinpath("custom_style.json")
         self.layout_config_path = self.data_dir.joinpath("layout.json")
         self.font_config_path = self.data_dir.joinpath("font.json")
@@ -166,6 +651,14 @@ class StickyNoteWindow(QWidget):
         self.opacity_config_path = self.data_dir.joinpath("opacity.json")
         self.theme_config_path = self.data_dir.joinpath("theme.json")
         self.autostart_config_path = self.data_dir.joinpath("autostart.json")
+        self.sync_config_path = self.data_dir.joinpath("sync.json")
+        self.editor_mode_path = self.data_dir.joinpath("editor_mode.json")
+        self.tabs_config_path = self.data_dir.joinpath("tabs.json")
+        self.inbox_path = self.data_dir.joinpath("inbox.txt")
+        self.notes_lock = NotesFileLock(self.data_dir.joinpath("notes.lock"), timeout=0.0)
+        self.blobs_dir = self.data_dir.joinpath("blobs")
+        self.storage_config_path = self.data_dir.joinpath(STORAGE_CONFIG_NAME)
+        self.notes_db_path = self.data_dir.joinpath(NOTES_DB_NAME)
 
         # bundled resources
         self.icon_path = resource_path("icon.ico")
@@ -193,6 +686,12 @@ class StickyNoteWindow(QWidget):
         self._hotkey_registered = False
         self.hotkey_id = 1
         self.base_size = QSize(420, 420)
+        self.window_state = WindowStateLayer(self)
+        self.idle = IdleScheduler(self)
+        self.idle.add("surlignage", self.drain_highlighters, priority=0, budget_ms=FencedCodeHighlighter.PASS_BUDGET_MS)
+        self.idle.add("onglets", self.enforce_tab_budget, priority=1, budget_ms=8.0)
+        self.idle.add("images", priority=2, budget_ms=4.0)
+        self.idle.add("compactage", self.compact_store, priority=3, budget_ms=20.0)
 
         self.setWindowTitle("Bloc note épinglé")
         if self.icon_path.exists():
@@ -202,6 +701,9 @@ class StickyNoteWindow(QWidget):
         self.setAttribute(Qt.WA_TranslucentBackground, True)
         self.setAttribute(Qt.WA_StyledBackground, True)
 
+        self.serializer = CompactNoteSerializer()
+        # stockage SQLite optionnel : notes et réglages dans notes.db (avant toute lecture de config)
+        self.store = self.open_store() if storage_backend(self.data_dir) == "sqlite" else None
         self.layout_config = self.load_layout_config()
         self.font_config = self.load_font_config()
         self.color_config = self.load_color_config()
@@ -209,14 +711,32 @@ class StickyNoteWindow(QWidget):
         self.opacity_value = self.load_opacity_config()
         self.theme_config = self.load_theme_config()
         self.autostart_enabled = self.load_autostart_config()
+        self.editor_mode = self.load_editor_mode_config()
+        # seuil automatique vérifié sur notes.txt (toujours écrit) : la note n'est alors jamais mise en page en riche
+        self.plain_mode = self.editor_mode["plain"] or (
+            not self.editor_mode["keep_rich"] and self.exceeds_plain_threshold(self.stored_note_size())
+        )
+        if self.plain_mode and not self.editor_mode["plain"]:
+            self.editor_mode["plain"] = True
+            self.save_editor_mode_config()
+        self.tabs_config = self.load_tabs_config()
         self.current_font_name = self.font_config.get("current", "Défaut")
         self.font_families = self.load_fonts()
+        self.font_dirs = [Path(d) for d in self.font_config.get("dirs", [])]
+        self.font_index = FontIndex(self.data_dir.joinpath("font_index.json"), self)
+        self.font_index.load(self.read_config(self.font_index.index_path))
+        self.font_picker: FontPickerDialog | None = None
+        # dialogues construits au premier usage puis réutilisés (un seul exemplaire par fenêtre)
+        self.size_dialog: SizeDialog | None = None
+        self.resize_dialog: ResizeDialog | None = None
+        self.opacity_dialog: OpacityDialog | None = None
         self.current_color_mode = self.color_config.get("mode", "solid")
         self.current_colors = self.color_config.get("colors", ["#2f2a1f", "#2f2a1f"])
         self.current_font_size = int(self.font_config.get("size", self.default_font_size))
         self.setWindowOpacity(self.opacity_value)
         # ensure autostart registry matches saved preference
-        self.set_autostart(self.autostart_enabled)
+        if not self.isolated:
+            self.set_autostart(self.autostart_enabled)
 
         self.pin_button = QPushButton()
         self.pin_button.setCheckable(True)
@@ -257,7 +777,8 @@ class StickyNoteWindow(QWidget):
         custom_color.triggered.connect(self.choose_custom_color)
 
         self.font_menu = QMenu(self)
-        self.font_actions: list[QAction] = []
+        self.font_actions: dict[str, QAction] = {}
+        self.checked_font_action: QAction | None = None
         self.build_font_menu()
 
         self.color_menu = QMenu(self)
@@ -341,10 +862,31 @@ class StickyNoteWindow(QWidget):
             self.color_button.setIconSize(QSize(18, 18))
         self.color_button.setMenu(self.color_menu)
 
-        self.editor = QTextEdit()
-        self.editor.setPlaceholderText("Écris ici tes notes...")
-        self.editor.viewport().setAutoFillBackground(False)
-        self.editor.installEventFilter(self)
+        self.blob_store = ImageBlobStore(self.blobs_dir)
+        self.main_tab = NoteTab(NoteTab.MAIN_ID, self.data_dir, self.plain_mode)
+        self.tabs = [self.main_tab]
+        for entry in self.tabs_config["tabs"]:
+            if entry.get("id") and entry["id"] != NoteTab.MAIN_ID:
+                tab = NoteTab(entry["id"], self.data_dir.joinpath("tabs", entry["id"]), bool(entry.get("plain")))
+                tab.title = str(entry.get("title", ""))
+                self.tabs.append(tab)
+        # onglets dont le document est en mémoire, du moins au plus récemment utilisé
+        self.loaded_tabs: OrderedDict[str, NoteTab] = OrderedDict()
+        self.active_tab = self.main_tab
+        self.tab_evictions = 0
+        self.last_tab_switch_ms = 0.0
+        self.editor = self.create_editor(self.plain_mode)
+        self.stats_label = QLabel()
+        self.stats_label.setObjectName("NoteStats")
+        self.stats_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        self.stats_label.setStyleSheet("font-size: 11px; padding: 0 6px;")
+        # largeur imposée par la fenêtre : un texte plus long ne doit pas l'élargir (relayout complet)
+        self.stats_label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Preferred)
+        # affichage limité à 4 rafraîchissements par seconde, quel que soit le rythme de frappe
+        self.stats_timer = QTimer(self)
+        self.stats_timer.setSingleShot(True)
+        self.stats_timer.setInterval(250)
+        self.stats_timer.timeout.connect(self.refresh_stats_label)
 
         top_bar = QHBoxLayout()
         top_bar.addWidget(self.hide_button)
@@ -363,37 +905,112 @@ class StickyNoteWindow(QWidget):
         self.editor_container.setObjectName("EditorContainer")
         self.editor_layout = QVBoxLayout(self.editor_container)
         self.editor_layout.setContentsMargins(*self.default_margins)
-        self.editor_layout.addWidget(self.editor)
+        self.outline_view = QListView()
+        self.outline_view.setObjectName("Outline")
+        self.outline_view.setUniformItemSizes(True)
+        self.outline_view.setEditTriggers(QListView.NoEditTriggers)
+        self.outline_view.setStyleSheet("QListView#Outline { background: transparent; border: none; border-right: 1px solid rgba(0, 0, 0, 0.15); }")
+        self.outline_view.clicked.connect(self.jump_to_heading)
+        self.outline_view.activated.connect(self.jump_to_heading)
+        self.outline_view.hide()
+        self.editor_split = QSplitter(Qt.Horizontal)
+        self.editor_split.setChildrenCollapsible(False)
+        self.editor_split.addWidget(self.outline_view)
+        self.editor_split.addWidget(self.editor)
+        self.editor_split.setStretchFactor(1, 1)
+        self.editor_split.setSizes([140, 280])
+        self.tab_bar = QTabBar()
+        self.tab_bar.setObjectName("NoteTabs")
+        self.tab_bar.setDocumentMode(True)
+        self.tab_bar.setExpanding(False)
+        self.tab_bar.setTabsClosable(True)
+        self.tab_bar.setElideMode(Qt.ElideRight)
+        self.tab_bar.setUsesScrollButtons(True)
+        self.tab_bar.tabCloseRequested.connect(lambda index: self.close_tab(self.tabs[index]))
+        self.editor_layout.addWidget(self.tab_bar)
+        self.editor_layout.addWidget(self.editor_split)
+        self.find_panel = FindPanel(self)
+        self.editor_layout.addWidget(self.find_panel)
+        find_action = QAction("Rechercher / remplacer", self)
+        find_action.setShortcut("Ctrl+F")
+        find_action.triggered.connect(self.find_panel.open_panel)
+        self.addAction(find_action)
+        for text, shortcut, slot in (
+            ("Nouvel onglet", "Ctrl+T", self.new_tab),
+            ("Fermer l'onglet", "Ctrl+W", lambda: self.close_tab(self.active_tab)),
+            ("Onglet suivant", "Ctrl+PgDown", lambda: self.cycle_tab(1)),
+            ("Onglet précédent", "Ctrl+PgUp", lambda: self.cycle_tab(-1)),
+        ):
+            action = QAction(text, self)
+            action.setShortcut(shortcut)
+            action.triggered.connect(slot)
+            self.addAction(action)
+        outline_action = QAction("Plan de la note", self)
+        outline_action.setShortcut("Ctrl+Shift+O")
+        outline_action.triggered.connect(self.toggle_outline)
+        self.addAction(outline_action)
 
         self.overlay = MarginOverlay(self.editor_container, self.get_editor_margins, self.on_overlay_margins_changed)
         self.overlay.hide()
+        self.last_save_ms = 0.0
+        self.last_save_bytes = 0
+        self.perf_hud = PerfHudOverlay(self.editor_container, self.collect_perf_stats)
+        self.perf_hud.hide()
+        hud_action = QAction("Diagnostic", self)
+        hud_action.setShortcut("Ctrl+Shift+P")
+        hud_action.triggered.connect(self.toggle_perf_hud)
+        self.addAction(hud_action)
 
         root = QVBoxLayout(self)
         root.setContentsMargins(12, 16, 12, 12)
         root.addLayout(top_bar)
         root.addWidget(self.editor_container)
+        root.addWidget(self.stats_label)
 
-        self.save_timer = QTimer(self)
-        self.save_timer.setSingleShot(True)
-        self.save_timer.setInterval(500)
-        self.save_timer.timeout.connect(self.save_notes)
-
-        self.editor.textChanged.connect(self.on_text_changed)
-        self.setup_format_shortcuts()
+        self.bind_editor()
+        self.load_notes()
+        active = next((tab for tab in self.tabs if tab.id == self.tabs_config["active"]), self.main_tab)
+        self.activate_tab(active)
+        self.refresh_tab_bar()
+        self.tab_bar.currentChanged.connect(self.on_tab_bar_changed)
+        plain_action = QAction("Mode texte brut", self)
+        plain_action.setShortcut("Ctrl+Shift+T")
+        plain_action.setCheckable(True)
+        plain_action.setChecked(self.plain_mode)
+        plain_action.triggered.connect(self.set_plain_mode)
+        self.addAction(plain_action)
+        self.plain_action = plain_action
 
         self.tray_icon: QSystemTrayIcon | None = None
-        self.setup_tray()
-
-        self.load_notes()
+        self.storage_action: QAction | None = None
+        if not self.isolated:
+            self.setup_tray()
+
+        self.autosave.mark_saved()
+        self.inbox_retry = QTimer(self)
+        self.inbox_retry.setSingleShot(True)
+        self.inbox_retry.setInterval(200)
+        self.inbox_retry.timeout.connect(self.merge_inbox)
+        self.merge_inbox()
+        self.inbox_watcher = QFileSystemWatcher([str(self.data_dir)], self)
+        self.inbox_watcher.directoryChanged.connect(lambda _path: self.merge_inbox())
+        if self.load_sync_config():
+            if self.main_tab.plain:
+                self.notify_sync_paused()
+            else:
+                self.note_sync.start(adopt_remote=True)
+        self.load_document_fonts(self.main_tab.document)
+        if self.font_dirs or self.font_index.files:
+            self.font_index.scan(self.font_dirs)
         self.apply_theme(self.theme_combo.currentText())
         self.apply_color_scheme()
-        self.register_global_hotkey()
+        if not self.isolated:
+            self.register_global_hotkey()
 
     def toggle_pin(self, pinned: bool) -> None:
         self._pinned = pinned
-        self.setWindowFlags(self.compute_flags(pinned))
+        self.window_state.set_stays_on_top(pinned)
         self.set_pin_icon(pinned)
-        self.show()
 
     def apply_theme(self, theme_name: str) -> None:
         if theme_name in {"Texture1", "Notes"}:
@@ -426,20 +1043,509 @@ class StickyNoteWindow(QWidget):
         self.save_theme_config(theme_name)
 
     def on_text_changed(self) -> None:
-        self.save_timer.start()
+        self.idle.note_input()
+        self.autosave.note_change()
+        self.check_plain_threshold()
+        self.find_panel.on_document_changed()
 
     def save_notes(self) -> None:
-        # Save rich text to HTML for formatting persistence
-        html = self.editor.toHtml()
-        self.notes_html_path.write_text(html, encoding="utf-8")
-        # Also keep plain text as fallback
-        self.notes_path.write_text(self.editor.toPlainText(), encoding="utf-8")
+        start = time.perf_counter()
+        try:
+            with self.notes_lock:
+                self.last_save_bytes = self.write_notes(self.active_tab)
+        except OSError:
+            # notes.lock tenu par la ligne de commande (TimeoutError) ou écriture impossible :
+            # la note reste à sauver et l'autosauvegarde réessaie
+            self.autosave.timer.start(AutosavePolicy.RETRY_MS)
+            return
+        self.last_save_ms = (time.perf_counter() - start) * 1000
+        if self.active_tab.is_main and self.note_sync.push_pending:
+            # dossier partagé pas à jour : la note reste à sauver et l'autosauvegarde réessaie
+            self.autosave.timer.start(AutosavePolicy.RETRY_MS)
+        else:
+            self.autosave.mark_saved()
+        self.update_tab_title(self.active_tab)
+
+    def write_notes(self, tab: NoteTab) -> int:
+        # mode synchro : seuls les blocs modifiés sont écrits (+ manifeste) ; si la poussée échoue,
+        # la note est tout de même écrite localement
+        if tab.is_main and not tab.plain and self.note_sync.enabled and self.note_sync.push():
+            return self.note_sync.last_push_bytes
+        if self.store is not None:
+            # seules les lignes des blocs modifiés, en une transaction
+            written = self.store.save(tab.id, tab.document, tab.title, tab.plain)
+            self.idle.request("compactage")
+            return written
+        return self.write_note_files(tab, tab.document)
+
+    def write_note_files(self, tab: NoteTab, doc: QTextDocument) -> int:
+        tab.folder.mkdir(parents=True, exist_ok=True)
+        if tab.plain:
+            # texte brut : notes.txt fait foi, les anciens fichiers riches sont retirés après son écriture
+            plain = doc.toPlainText().encode("utf-8")
+            atomic_write(tab.text_path, plain)
+            tab.compact_path.unlink(missing_ok=True)
+            tab.html_path.unlink(missing_ok=True)
+            return len(plain)
+        # Save rich text in the compact format (style table), HTML if the document has tables/frames
+        compact = self.serializer.serialize(doc)
+        if compact is not None:
+            rich = compact.encode("utf-8")
+            atomic_write(tab.compact_path, rich)
+            tab.html_path.unlink(missing_ok=True)
+        else:
+            rich = doc.toHtml().encode("utf-8")
+            atomic_write(tab.html_path, rich)
+            tab.compact_path.unlink(missing_ok=True)
+        # Also keep plain text as fallback (écrit après le format riche, qui fait foi au chargement)
+        plain = doc.toPlainText().encode("utf-8")
+        atomic_write(tab.text_path, plain)
+        return len(rich) + len(plain)
+
+    def merge_inbox(self) -> None:
+        # textes ajoutés par la ligne de commande (main.py append)
+        if not self.inbox_path.exists():
+            return
+        # inbox.txt n'est retiré qu'une fois la note principale écrite, sous le même verrou :
+        # un arrêt brutal entre les deux laisse le texte en attente au lieu de le perdre
+        doc = self.main_tab.document
+        try:
+            with self.notes_lock:
+                text = self.inbox_path.read_text(encoding="utf-8").rstrip("\n")
+                if text:
+                    # toujours dans la note principale (celle de la ligne de commande), même depuis un autre onglet
+                    cursor = QTextCursor(doc)
+                    cursor.movePosition(QTextCursor.End)
+                    start = cursor.position()
+                    cursor.insertText(("\n" if not doc.isEmpty() else "") + text)
+                    try:
+                        self.write_notes(self.main_tab)
+                    except OSError:
+                        # note non écrite : le texte reste dans inbox.txt, on le retire du document
+                        # pour ne pas l'insérer deux fois à la prochaine fusion
+                        cursor.setPosition(start)
+                        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+                        cursor.removeSelectedText()
+                        return
+                self.inbox_path.unlink()
+        except OSError:
+            # verrou tenu (la ligne de commande écrit encore) : nouvel essai sans attendre ici
+            self.inbox_retry.start()
 
     def load_notes(self) -> None:
-        if self.notes_html_path.exists():
-            self.editor.setHtml(self.notes_html_path.read_text(encoding="utf-8"))
-        elif self.notes_path.exists():
-            self.editor.setPlainText(self.notes_path.read_text(encoding="utf-8"))
+        if self.store is not None and self.store.has_note(self.main_tab.id):
+            self.store.collect_formats()
+            self.hydrate_tab(self.main_tab)
+            rich = self.store.referenced_text()
+        else:
+            texts = StartupLoader.read_notes(self.data_dir)
+            self.hydrate_tab(self.main_tab, texts)
+            rich = texts.get(self.notes_compact_path.name) or texts.get(self.notes_html_path.name)
+        if rich is not None and not self.main_tab.plain:
+            self.idle.start_job("images", self.blob_garbage_job(rich))
+
+    def blob_garbage_job(self, rich: str) -> Iterator[None]:
+        # les images sont partagées entre onglets : celles encore citées par un onglet sont gardées
+        referenced = self.blob_store.referenced_names(rich)
+        for tab in self.tabs[1:]:
+            for path in (tab.compact_path, tab.html_path):
+                if path.exists():
+                    referenced |= self.blob_store.referenced_names(path.read_text(encoding="utf-8"))
+                yield
+        if self.load_sync_config():
+            # notes.json n'est pas réécrit après une poussée réussie et la synchro démarre après
+            # ce ménage : les blocs du dossier partagé font foi pour les images de la note principale
+            manifest = self.note_sync.read_manifest()
+            for digest in manifest["blocks"] if manifest is not None else []:
+                referenced |= self.blob_store.referenced_names(self.note_sync.read_record(digest) or "")
+                yield
+        yield from self.blob_store.collect_garbage(referenced)
+
+    def fill_document(self, tab: NoteTab, doc: QTextDocument, texts: dict[str, str]) -> None:
+        text = texts.get(tab.text_path.name)
+        if text is None and (tab.plain or not texts) and tab.text_path.exists():
+            text = tab.text_path.read_text(encoding="utf-8")
+        if tab.plain:
+            doc.setPlainText((text or "").replace("\ufffc", ""))
+            return
+        compact = texts.get(tab.compact_path.name)
+        if compact is not None and self.serializer.deserialize(doc, compact):
+            return
+        html = texts.get(tab.html_path.name)
+        if html is not None:
+            # anciennes notes : images inline en base64 -> blobs externes
+            if "data:image/" in html:
+                html = self.blob_store.externalize_data_uris(html)
+            doc.setHtml(html)
+        elif text is not None:
+            doc.setPlainText(text)
+
+    def new_document(self, plain: bool) -> QTextDocument:
+        # parent : la fenêtre (un document enfant de l'éditeur serait détruit par setDocument)
+        doc = NoteDocument(self.blob_store, self)
+        if plain:
+            doc.setDocumentLayout(QPlainTextDocumentLayout(doc))
+        return doc
+
+    def attach_tab_services(self, tab: NoteTab, doc: QTextDocument) -> None:
+        # index par bloc liés au document : ils le suivent quand l'onglet est inactif, sans reconstruction
+        tab.document = doc
+        tab.highlighter = FencedCodeHighlighter(doc, lambda: self.idle.request("surlignage"))
+        tab.stats = NoteStatistics(doc)
+        tab.stats.block_index.subscribe(lambda *_: self.stats_timer.isActive() or self.stats_timer.start())
+        # les titres viennent de la mise en forme : pas de plan (ni d'index par bloc) en texte brut
+        tab.outline = None if tab.plain else NoteOutline(doc, self.current_font_size, self)
+        if self.store is not None:
+            self.store.track(tab.id, doc)
+        if tab.is_main:
+            # la synchro ne concerne que la note principale
+            if getattr(self, "note_sync", None) is not None:
+                self.note_sync.stop()
+                self.note_sync.deleteLater()
+            self.note_sync = NoteSync(doc, self.serializer, self.blob_store, self.data_dir.joinpath("sync"), self)
+
+    def hydrate_tab(self, tab: NoteTab, texts: dict[str, str] | None = None) -> None:
+        start = time.perf_counter()
+        doc = self.new_document(tab.plain)
+        if self.store is None or not self.store.load(tab.id, doc, tab.plain):
+            self.fill_document(tab, doc, texts if texts is not None else StartupLoader.read_notes(tab.folder))
+        doc.setModified(False)
+        doc.clearUndoRedoStacks()
+        self.attach_tab_services(tab, doc)
+        self.loaded_tabs[tab.id] = tab
+        tab.loads += 1
+        tab.last_load_ms = (time.perf_counter() - start) * 1000
+        if tab is not self.main_tab:
+            self.load_document_fonts(doc)
+        self.update_tab_title(tab)
+
+    def evict_tab(self, tab: NoteTab) -> None:
+        # onglet déjà sauvegardé (quitté via activate_tab) : seul le fichier reste
+        self.update_tab_title(tab)
+        if tab.outline is not None:
+            tab.outline.deleteLater()
+        tab.document.deleteLater()
+        tab.document = tab.highlighter = tab.stats = tab.outline = None
+        if self.store is not None:
+            self.store.forget(tab.id)
+        self.loaded_tabs.pop(tab.id, None)
+        self.tab_evictions += 1
+
+    def enforce_tab_budget(self, deadline: float) -> bool:
+        # tâche "onglets" : le moins récemment utilisé d'abord, jusqu'à revenir sous le budget
+        budget = self.tabs_config["budget_mb"] * 1024 * 1024
+        total = sum(tab.estimated_bytes() for tab in self.loaded_tabs.values())
+        for tab in list(self.loaded_tabs.values()):
+            if total <= budget:
+                return False
+            # la note principale reste chargée (boîte de réception, synchro, ligne de commande)
+            if tab is self.active_tab or tab is self.main_tab:
+                continue
+            total -= tab.estimated_bytes()
+            self.evict_tab(tab)
+            # un onglet par tranche : son document est détruit (deleteLater) au retour dans la boucle
+            return total > budget
+        return False
+
+    def drain_highlighters(self, deadline: float) -> bool:
+        # tâche "surlignage" : l'onglet affiché d'abord, puis les autres onglets chargés
+        tabs = [self.active_tab, *(tab for tab in reversed(self.loaded_tabs.values()) if tab is not self.active_tab)]
+        for tab in tabs:
+            if tab.highlighter is not None and tab.highlighter.pending:
+                if tab.highlighter.drain_pending(deadline):
+                    return True
+        return False
+
+    def compact_store(self, deadline: float) -> bool:
+        # tâche "compactage" : le WAL est reporté dans notes.db hors des sauvegardes
+        if self.store is not None:
+            self.store.compact()
+        return False
+
+    def create_editor(self, plain: bool) -> NoteEditor | PlainNoteEditor:
+        editor = PlainNoteEditor() if plain else NoteEditor(self.blob_store)
+        editor.setPlaceholderText("Écris ici tes notes...")
+        editor.viewport().setAutoFillBackground(False)
+        editor.installEventFilter(self)
+        # souris et molette arrivent au viewport : elles aussi suspendent le travail de fond
+        editor.viewport().installEventFilter(self)
+        return editor
+
+    def on_bulk_edit(self, active: bool) -> None:
+        # travail par tranches (collage, mise en forme, remplacement) : ni sauvegarde auto ni fusion
+        # distante, qui décalerait ses positions et rejoindrait son groupe d'annulation
+        if active:
+            self.autosave.suspend()
+            self.note_sync.suspend()
+        else:
+            self.autosave.resume()
+            self.note_sync.resume()
+
+    def bind_editor(self) -> None:
+        # connexions du widget éditeur ; refaites quand le mode (riche / brut) le remplace
+        self.editor.cursorPositionChanged.connect(self.sync_outline_selection)
+        self.editor.bulk_edit_hook = self.on_bulk_edit
+        self.editor.textChanged.connect(self.on_text_changed)
+        if not self.plain_mode:
+            self.setup_format_shortcuts()
+
+    def replace_editor(self, plain: bool) -> None:
+        old_editor = self.editor
+        self.plain_mode = plain
+        self.editor = self.create_editor(plain)
+        self.editor_split.replaceWidget(1, self.editor)
+        old_editor.deleteLater()
+        self.bind_editor()
+
+    def bind_document(self) -> None:
+        # l'onglet actif fournit ses services ; la sauvegarde auto ne suit que lui
+        tab = self.active_tab
+        doc = tab.document
+        self.code_highlighter = tab.highlighter
+        self.note_stats = tab.stats
+        self.outline = tab.outline
+        self.set_outline_model(self.outline)
+        self.outline_view.setVisible(self.outline is not None and self.outline_view.isVisible())
+        self.autosave = AutosavePolicy(doc, self.save_notes, self)
+        # le seuil automatique ne se déclenche qu'en le franchissant pendant l'édition
+        self.plain_threshold_armed = not self.exceeds_plain_threshold(doc.characterCount())
+        QTimer.singleShot(0, self.find_panel.on_document_changed)
+
+    def unbind_document(self) -> None:
+        self.autosave.timer.stop()
+        self.autosave.deleteLater()
+        self.set_outline_model(None)
+
+    def set_outline_model(self, model: NoteOutline | None) -> None:
+        # setModel crée un nouveau modèle de sélection sans détruire l'ancien (fuite à chaque onglet)
+        previous = self.outline_view.selectionModel()
+        self.outline_view.setModel(model)
+        if previous is not None and previous is not self.outline_view.selectionModel():
+            previous.deleteLater()
+
+    def activate_tab(self, tab: NoteTab) -> None:
+        start = time.perf_counter()
+        previous = self.active_tab if getattr(self, "autosave", None) is not None else None
+        if previous is tab or self.editor.bulk_job is not None:
+            self.tab_bar.setCurrentIndex(self.tabs.index(self.active_tab))
+            return
+        if previous is not None:
+            # l'onglet quitté est sauvegardé : il peut ensuite être évincé sans perte
+            self.autosave.flush()
+            previous.cursor_position = self.editor.textCursor().position()
+            previous.scroll_value = self.editor.verticalScrollBar().value()
+            self.unbind_document()
+        if tab.document is None:
+            self.hydrate_tab(tab)
+        self.loaded_tabs.move_to_end(tab.id)
+        self.active_tab = tab
+        if tab.plain != self.plain_mode:
+            self.replace_editor(tab.plain)
+        self.bind_document()
+        self.editor.setDocument(tab.document)
+        self.apply_current_font()
+        self.apply_color_scheme()
+        cursor = self.editor.textCursor()
+        cursor.setPosition(min(tab.cursor_position, tab.document.characterCount() - 1))
+        self.editor.setTextCursor(cursor)
+        self.editor.verticalScrollBar().setValue(tab.scroll_value)
+        self.plain_action_sync()
+        self.idle.request("onglets")
+        self.tab_bar.setCurrentIndex(self.tabs.index(tab))
+        if previous is not None:
+            self.tabs_config["active"] = tab.id
+            self.save_tabs_config()
+            self.refresh_stats_label()
+        self.last_tab_switch_ms = (time.perf_counter() - start) * 1000
+
+    def plain_action_sync(self) -> None:
+        if getattr(self, "plain_action", None) is not None:
+            self.plain_action.setChecked(self.plain_mode)
+        if getattr(self, "tray_icon", None) is not None:
+            self.sync_action.setEnabled(not self.main_tab.plain)
+            self.sync_action.setText(
+                "Synchroniser le dossier de notes" + (" (en pause : texte brut)" if self.main_tab.plain else "")
+            )
+
+    def new_tab(self) -> NoteTab:
+        tab_id = uuid.uuid4().hex[:12]
+        tab = NoteTab(tab_id, self.data_dir.joinpath("tabs", tab_id), False)
+        self.tabs.append(tab)
+        self.save_tabs_config()
+        self.refresh_tab_bar()
+        self.activate_tab(tab)
+        self.editor.setFocus()
+        return tab
+
+    def close_tab(self, tab: NoteTab) -> None:
+        if tab is self.main_tab:
+            return
+        if (
+            tab.document is not None
+            and not tab.document.isEmpty()
+            or tab.text_path.exists()
+            and tab.text_path.stat().st_size
+            or self.store is not None
+            and self.store.note_size(tab.id)
+        ):
+            answer = QMessageBox.question(self, "Fermer l'onglet", "Supprimer définitivement cette note ?")
+            if answer != QMessageBox.Yes:
+                return
+        if tab is self.active_tab:
+            index = self.tabs.index(tab)
+            self.activate_tab(self.tabs[index - 1])
+        if tab.document is not None:
+            self.evict_tab(tab)
+        self.tabs.remove(tab)
+        shutil.rmtree(tab.folder, ignore_errors=True)
+        if self.store is not None:
+            self.store.delete_note(tab.id)
+        self.save_tabs_config()
+        self.refresh_tab_bar()
+
+    def on_tab_bar_changed(self, index: int) -> None:
+        if 0 <= index < len(self.tabs):
+            self.activate_tab(self.tabs[index])
+
+    def cycle_tab(self, step: int) -> None:
+        self.activate_tab(self.tabs[(self.tabs.index(self.active_tab) + step) % len(self.tabs)])
+
+    def update_tab_title(self, tab: NoteTab) -> None:
+        if tab.document is None:
+            return
+        block = tab.document.begin()
+        while block.isValid() and not block.text().strip():
+            block = block.next()
+        title = block.text().replace("\ufffc", "").strip()[:40] if block.isValid() else ""
+        if title != tab.title:
+            tab.title = title
+            index = self.tabs.index(tab)
+            self.tab_bar.setTabText(index, self.tab_label(tab, index))
+            if not tab.is_main:
+                self.save_tabs_config()
+
+    def tab_label(self, tab: NoteTab, index: int) -> str:
+        return tab.title or ("Note" if tab.is_main else f"Note {index + 1}")
+
+    def refresh_tab_bar(self) -> None:
+        self.tab_bar.blockSignals(True)
+        while self.tab_bar.count() > len(self.tabs):
+            self.tab_bar.removeTab(self.tab_bar.count() - 1)
+        for index, tab in enumerate(self.tabs):
+            if index >= self.tab_bar.count():
+                self.tab_bar.addTab("")
+            self.tab_bar.setTabText(index, self.tab_label(tab, index))
+        # la note principale ne se ferme pas
+        self.tab_bar.setTabButton(0, QTabBar.RightSide, None)
+        self.tab_bar.setCurrentIndex(self.tabs.index(self.active_tab))
+        self.tab_bar.blockSignals(False)
+        self.tab_bar.setVisible(len(self.tabs) > 1)
+
+    def set_plain_mode(self, enabled: bool, confirm: bool = True) -> None:
+        enabled = bool(enabled)
+        if enabled == self.plain_mode or self.editor.bulk_job is not None:
+            self.plain_action.setChecked(self.plain_mode)
+            return
+        if enabled and confirm and not self.confirm_plain_conversion():
+            self.plain_action.setChecked(False)
+            return
+        tab = self.active_tab
+        if enabled and tab.is_main and self.note_sync.enabled:
+            # la synchro échange des blocs riches : en pause en texte brut, sync.json reste inchangé
+            self.note_sync.stop()
+        text = self.editor.toPlainText().replace("\ufffc", "")
+        position = self.editor.textCursor().position()
+        self.unbind_document()
+        old_document, old_outline = tab.document, tab.outline
+        tab.plain = enabled
+        doc = self.new_document(enabled)
+        doc.setPlainText(text)
+        if not enabled:
+            # la police et la couleur de la fenêtre deviennent celles du texte converti
+            fmt = self.note_base_format()
+            cursor = QTextCursor(doc)
+            cursor.select(QTextCursor.Document)
+            cursor.mergeCharFormat(fmt)
+        doc.clearUndoRedoStacks()
+        self.attach_tab_services(tab, doc)
+        self.replace_editor(enabled)
+        self.bind_document()
+        self.editor.setDocument(doc)
+        old_document.deleteLater()
+        if old_outline is not None:
+            old_outline.deleteLater()
+        self.apply_current_font()
+        self.apply_color_scheme()
+        cursor = self.editor.textCursor()
+        cursor.setPosition(min(position, len(text)))
+        self.editor.setTextCursor(cursor)
+        self.editor.ensureCursorVisible()
+        self.editor.setFocus()
+        if tab.is_main:
+            self.editor_mode["plain"] = enabled
+            self.editor_mode["keep_rich"] = not enabled and not self.plain_threshold_armed
+            self.save_editor_mode_config()
+            if self.load_sync_config():
+                if enabled:
+                    self.notify_sync_paused()
+                else:
+                    # la note locale (modifiée en texte brut) est fusionnée avec la version partagée
+                    self.note_sync.start(adopt_remote=False)
+        else:
+            self.save_tabs_config()
+        self.save_notes()
+        self.plain_action_sync()
+        self.refresh_stats_label()
+
+    def notify_sync_paused(self) -> None:
+        if self.tray_icon is not None:
+            self.tray_icon.showMessage(
+                "Synchronisation en pause",
+                "La note principale est en texte brut : la synchronisation reprendra au retour en texte riche.",
+                QSystemTrayIcon.Information,
+                5000,
+            )
+
+    def confirm_plain_conversion(self) -> bool:
+        answer = QMessageBox.question(
+            self,
+            "Mode texte brut",
+            "La note passe en texte brut : la mise en forme et les images sont retirées "
+            "et seul notes.txt est conservé. Continuer ?",
+        )
+        return answer == QMessageBox.Yes
+
+    def stored_note_size(self) -> int:
+        if self.store is not None and self.store.has_note(NoteTab.MAIN_ID):
+            return self.store.note_size(NoteTab.MAIN_ID)
+        try:
+            return self.notes_path.stat().st_size
+        except OSError:
+            return 0
+
+    def exceeds_plain_threshold(self, size: int) -> bool:
+        threshold = self.editor_mode["auto_plain_chars"]
+        return threshold > 0 and size >= threshold
+
+    def set_auto_plain_mode(self, enabled: bool) -> None:
+        self.editor_mode["auto_plain_chars"] = AUTO_PLAIN_MODE_CHARS if enabled else 0
+        self.save_editor_mode_config()
+        self.plain_threshold_armed = not self.exceeds_plain_threshold(self.editor.document().characterCount())
+
+    def check_plain_threshold(self) -> None:
+        if self.plain_mode or not self.plain_threshold_armed:
+            return
+        if self.exceeds_plain_threshold(self.editor.document().characterCount()):
+            self.plain_threshold_armed = False
+            # hors du signal textChanged : l'éditeur courant est remplacé
+            QTimer.singleShot(0, lambda: self.set_plain_mode(True, confirm=False))
+
+    def read_config(self, path: Path) -> object:
+        if self.store is not None:
+            value = self.store.setting(path.name)
+            if value is not None:
+                return value
+        return StartupLoader.read_json(path)
 
     def setup_tray(self) -> None:
         if not QSystemTrayIcon.isSystemTrayAvailable():
@@ -460,6 +1566,26 @@ class StickyNoteWindow(QWidget):
         autostart_action.toggled.connect(self.set_autostart)
         self.autostart_action = autostart_action
 
+        sync_action = QAction("Synchroniser le dossier de notes", self)
+        sync_action.setCheckable(True)
+        sync_action.setChecked(self.load_sync_config())
+        sync_action.toggled.connect(self.set_sync_enabled)
+        self.sync_action = sync_action
+
+        storage_action = QAction("Stocker les notes dans notes.db (SQLite)", self)
+        storage_action.setCheckable(True)
+        storage_action.setChecked(self.store is not None)
+        storage_action.toggled.connect(self.set_storage_backend)
+        self.storage_action = storage_action
+
+        auto_plain_action = QAction("Texte brut automatique au-delà de 4 Mo", self)
+        auto_plain_action.setCheckable(True)
+        auto_plain_action.setChecked(self.editor_mode["auto_plain_chars"] > 0)
+        auto_plain_action.toggled.connect(self.set_auto_plain_mode)
+
+        memory_action = QAction("Rapport mémoire", self)
+        memory_action.triggered.connect(self.show_memory_report)
+
         quit_action = QAction("Quitter", self)
         quit_action.triggered.connect(self.quit_from_tray)
 
@@ -468,6 +1594,11 @@ class StickyNoteWindow(QWidget):
         menu.addAction(hide_action)
         menu.addSeparator()
         menu.addAction(autostart_action)
+        menu.addAction(sync_action)
+        menu.addAction(storage_action)
+        menu.addAction(self.plain_action)
+        menu.addAction(auto_plain_action)
+        menu.addAction(memory_action)
         menu.addSeparator()
         menu.addAction(quit_action)
 
@@ -477,6 +1608,7 @@ class StickyNoteWindow(QWidget):
         tray.showMessage("Bloc note", "Toujours disponible dans la barre système.", QSystemTrayIcon.Information, 2000)
 
         self.tray_icon = tray
+        self.plain_action_sync()
 
     def show_window(self) -> None:
         self.show()
@@ -492,17 +1624,32 @@ class StickyNoteWindow(QWidget):
 
     def quit_from_tray(self) -> None:
         self._quitting = True
+        if not self.isVisible():
+            # fenêtre cachée dans le tray : quit() ne lui envoie pas de closeEvent
+            self.flush_before_exit()
         self.unregister_global_hotkey()
         QApplication.quit()
 
+    def flush_before_exit(self) -> None:
+        if self.editor.bulk_job is not None:
+            # travail par tranches annulé (une seule annulation le retire) : la note sauvée est celle
+            # d'avant, avec les modifications faites avant son lancement ; la sauvegarde auto reprend
+            self.editor.bulk_job.cancel()
+        # dernière chance d'écrire : on peut attendre que la ligne de commande libère notes.lock
+        self.notes_lock.timeout = NotesFileLock.SHUTDOWN_TIMEOUT
+        self.autosave.flush(force=True)
+
     def closeEvent(self, event) -> None:  # type: ignore[override]
         if self.tray_icon and self.tray_icon.isVisible() and not self._quitting:
             event.ignore()
             self.hide()
             return
 
-        self.save_notes()
+        self.flush_before_exit()
         self.unregister_global_hotkey()
+        self.idle.timer.stop()
+        if self.store is not None:
+            self.store.close()
         event.accept()
 
     def set_pin_icon(self, pinned: bool) -> None:
@@ -537,8 +1684,155 @@ class StickyNoteWindow(QWidget):
         super().resizeEvent(event)
         if hasattr(self, "overlay") and self.overlay:
             self.overlay.setGeometry(self.editor_container.rect())
+        if hasattr(self, "perf_hud") and self.perf_hud.isVisible():
+            self.perf_hud.place()
+
+    def toggle_perf_hud(self) -> None:
+        if self.perf_hud.isVisible():
+            self.perf_hud.stop()
+        else:
+            self.perf_hud.start()
+
+    def toggle_outline(self) -> None:
+        if self.outline is None:
+            return
+        self.outline_view.setVisible(not self.outline_view.isVisible())
+        self.sync_outline_selection()
+
+    def jump_to_heading(self, index) -> None:
+        block = self.editor.document().findBlockByNumber(index.data(Qt.UserRole))
+        if not block.isValid():
+            return
+        self.editor.setTextCursor(QTextCursor(block))
+        # titre en haut de la zone visible plutôt que simplement rendu visible
+        top = self.editor.document().documentLayout().blockBoundingRect(block).top()
+        self.editor.verticalScrollBar().setValue(int(top))
+        self.editor.setFocus()
+
+    def sync_outline_selection(self) -> None:
+        if self.outline is None or not self.outline_view.isVisible():
+            return
+        row = self.outline.row_for_block(self.editor.textCursor().blockNumber())
+        current = self.outline_view.currentIndex().row()
+        if row >= 0 and row != current:
+            index = self.outline.index_of(row)
+            self.outline_view.setCurrentIndex(index)
+            self.outline_view.scrollTo(index)
+        elif row < 0:
+            self.outline_view.clearSelection()
+
+    def refresh_stats_label(self) -> None:
+        stats = self.note_stats
+        minutes = stats.reading_minutes
+        reading = "< 1 min" if minutes < 1 else f"{round(minutes)} min"
+        self.stats_label.setText(
+            f"{stats.words} mots · {stats.characters} caractères · {stats.lines} lignes · {reading} de lecture"
+        )
+
+    def collect_perf_stats(self) -> list[str]:
+        doc = self.editor.document()
+        paint_ms = sorted(self.editor.paint_times_ms) or [0.0]
+        frame_ms = sorted(self.editor.frame_intervals_ms) or [0.0]
+        rss = process_rss_bytes()
+        gradient = getattr(doc, "gradient_cache", None)
+        return [
+            f"paint  {paint_ms[len(paint_ms) // 2]:6.2f} ms  max {paint_ms[-1]:6.2f}",
+            f"frame  {frame_ms[len(frame_ms) // 2]:6.1f} ms  max {frame_ms[-1]:6.1f}",
+            f"save   {self.last_save_ms:6.1f} ms  {self.last_save_bytes / 1024:8.1f} Ko"
+            + (f"  {self.store.last_rows_written} lignes SQLite" if self.store is not None else ""),
+            f"auto   {self.autosave.save_count} écr.  {self.autosave.skipped_count} évitées  {self.autosave.current_interval_ms} ms",
+            f"doc    {doc.blockCount()} blocs  {doc.characterCount()} car.",
+            f"undo   {doc.availableUndoSteps()} étapes",
+            f"tabs   {len(self.loaded_tabs)}/{len(self.tabs)} chargés  "
+            f"{sum(tab.estimated_bytes() for tab in self.loaded_tabs.values()) / (1024 * 1024):.1f} Mo  "
+            f"{self.tab_evictions} évict.  {self.last_tab_switch_ms:.1f} ms",
+            f"images {self.blob_store.cache_bytes / 1024:.0f} / {self.blob_store.cache_limit_bytes / 1024:.0f} Ko"
+            f"  (QPixmapCache {QPixmapCache.cacheLimit()} Ko)",
+            f"grad   {gradient.renders} rendus  {gradient.hits} repris  {gradient.cached_bytes / 1024:.0f} Ko"
+            if gradient is not None else "grad   -",
+            f"pin    {self.window_state.last_toggle_ms:6.2f} ms ({self.window_state.last_method or '-'})",
+            f"idle   {', '.join(self.idle.pending_names()) or '-'}  {self.idle.pauses} pauses  "
+            + "  ".join(f"{task.name} {task.runs}× ≤{task.max_ms:.1f} ms" for task in self.idle.tasks.values() if task.runs),
+            f"RSS    {rss / (1024 * 1024):.1f} Mo" if rss else "RSS    n/d",
+            f"objets {sum(live_qobject_counts().values())} QObject vivants",
+        ]
+
+    def memory_report(self) -> dict:
+        icons = {}
+        for widget in (self, *self.findChildren(QAbstractButton)):
+            icon = widget.windowIcon() if widget is self else widget.icon()
+            if not icon.isNull():
+                icons[icon.cacheKey()] = icon_bytes(icon)
+        if self.tray_icon is not None:
+            icons[self.tray_icon.icon().cacheKey()] = icon_bytes(self.tray_icon.icon())
+        previews = self.font_picker.delegate.cache if self.font_picker is not None else {}
+        widgets = QApplication.allWidgets()
+        return {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "epoch": round(time.time(), 1),
+            "uptime_s": round(time.monotonic() - self.created_at, 1),
+            "pid": os.getpid(),
+            "rss_bytes": process_rss_bytes(),
+            "python": python_allocations(),
+            "documents": {
+                tab.id: {"title": tab.title, "estimated_bytes": tab.estimated_bytes(), **document_memory(tab.document)}
+                for tab in self.loaded_tabs.values()
+            },
+            "caches": {
+                "pixmap_cache_limit_kb": QPixmapCache.cacheLimit(),
+                "images_bytes": self.blob_store.cache_bytes,
+                "font_previews": len(previews),
+                "font_previews_bytes": sum(p.width() * p.height() * p.depth() // 8 for p in previews.values()),
+                "icons": len(icons),
+                "icons_bytes": sum(icons.values()),
+                "gradient_blocks_bytes": sum(
+                    tab.document.gradient_cache.cached_bytes for tab in self.loaded_tabs.values() if tab.document.gradient_cache is not None
+                ),
+            },
+            "fonts": {
+                "bundled": self.app_fonts,
+                "bundled_bytes": sum(font["bytes"] for font in self.app_fonts.values()),
+                "picker_files_loaded": len(self.font_index.loaded),
+            },
+            "widgets": {
+                "live": len(widgets),
+                "top_level": len(QApplication.topLevelWidgets()),
+                "qobjects": live_qobject_counts(),
+            },
+        }
+
+    def dump_memory_report(self) -> tuple[Path, dict]:
+        # un fichier par rapport dans memory/ ; chacun porte l'écart avec le précédent
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_TRACE_FRAMES)
+        report = self.memory_report()
+        directory = self.data_dir.joinpath("memory")
+        directory.mkdir(parents=True, exist_ok=True)
+        entry: dict = {"report": report}
+        previous = sorted(directory.glob("memory-*.json"))
+        if previous:
+            try:
+                entry["diff"] = diff_memory_reports(load_memory_report(previous[-1]), report)
+            except (OSError, ValueError, AttributeError):
+                pass
+        path = directory.joinpath(f"memory-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        atomic_write(path, json.dumps(entry, ensure_ascii=False, indent=1).encode("utf-8"))
+        return path, entry
+
+    def show_memory_report(self) -> None:
+        tracing = tracemalloc.is_tracing()
+        path, entry = self.dump_memory_report()
+        lines = [path.name]
+        if not tracing:
+            lines.append("Suivi des allocations Python démarré : le prochain rapport montrera ce qui grossit.")
+        for key, change in list(entry.get("diff", {}).get("changes", {}).items())[:3]:
+            lines.append(f"{key} {change['delta']:+}")
+        if self.tray_icon is not None:
+            self.tray_icon.showMessage("Rapport mémoire", "\n".join(lines), QSystemTrayIcon.Information, 5000)
 
     def eventFilter(self, watched: QObject, event) -> bool:  # type: ignore[override]
+        if event.type() in IdleScheduler.INPUT_EVENTS:
+            self.idle.note_input()
         if watched is self.drag_button and event.type() in {event.Type.MouseButtonPress, event.Type.MouseMove, event.Type.MouseButtonRelease}:
             if event.type() == event.Type.MouseButtonPress and event.button() == Qt.LeftButton:
                 self._drag_pos = event.globalPosition().toPoint() - self.frameGeometry().topLeft()
@@ -620,8 +1914,12 @@ class StickyNoteWindow(QWidget):
             act.setChecked(act.text() == current)
 
     def update_font_menu_checks(self, current: str) -> None:
-        for act in self.font_menu.actions():
-            act.setChecked(act.text() == current)
+        # une police des dossiers utilisateur choisie via le sélecteur rejoint le menu
+        act = self.font_actions.get(current) or self.add_font_action(current)
+        if self.checked_font_action is not None and self.checked_font_action is not act:
+            self.checked_font_action.setChecked(False)
+        act.setChecked(True)
+        self.checked_font_action = act
 
     def update_color_menu_checks(self, current: str) -> None:
         for act in self.color_menu.actions():
@@ -684,11 +1982,29 @@ class StickyNoteWindow(QWidget):
         theme = self.theme_combo.currentText()
         return self.get_margins_for_theme(theme)
 
+    def resolve_font_family(self, family: str) -> str:
+        if family == "Défaut":
+            return QFont().family()
+        if family in self.font_families:
+            return family
+        return self.font_index.ensure_loaded(family) or family
+
+    def load_document_fonts(self, doc: QTextDocument) -> None:
+        # charge (une fois) les fichiers des polices utilisateur employées dans la note
+        for fmt in doc.allFormats():
+            if fmt.isCharFormat():
+                for family in fmt.toCharFormat().fontFamilies() or []:
+                    if family not in self.font_families:
+                        self.font_index.ensure_loaded(family)
+
     def apply_current_font(self) -> None:
-        fam = QFont().family() if self.current_font_name == "Défaut" else self.current_font_name
-        f = QFont(fam, self.current_font_size)
-        # setCurrentFont affects new text and caret, not existing formatted runs
-        self.editor.setCurrentFont(f)
+        f = QFont(self.resolve_font_family(self.current_font_name), self.current_font_size)
+        if self.plain_mode:
+            # texte brut : une seule police pour toute la note
+            self.editor.setFont(f)
+        else:
+            # setCurrentFont affects new text and caret, not existing formatted runs
+            self.editor.setCurrentFont(f)
         self.update_font_menu_checks(self.current_font_name)
 
     def apply_editor_margins(self, theme_name: str) -> None:
@@ -707,9 +2023,10 @@ class StickyNoteWindow(QWidget):
             self.editor.mergeCurrentCharFormat(fmt)
 
     def apply_font_family_to_cursor(self, family: str) -> None:
-        fam = QFont().family() if family == "Défaut" else family
+        if self.plain_mode:
+            return
         fmt = QTextCharFormat()
-        fmt.setFontFamily(fam)
+        fmt.setFontFamily(self.resolve_font_family(family))
         cursor = self.editor.textCursor()
         if cursor.hasSelection():
             cursor.mergeCharFormat(fmt)
@@ -717,17 +2034,48 @@ class StickyNoteWindow(QWidget):
         else:
             self.editor.mergeCurrentCharFormat(fmt)
 
-    def apply_font_size(self, size: int, commit: bool) -> None:
+    def format_whole_note(self, label: str, fmt: QTextCharFormat, replace: bool = False) -> None:
+        # texte brut : police, taille et couleur sont déjà celles de toute la note
+        if self.plain_mode or self.editor.bulk_job is not None:
+            return
+        self.editor.bulk_job = BatchFormat(self.editor, label, fmt, replace)
+        self.editor.bulk_job.start()
+
+    def note_base_format(self) -> QTextCharFormat:
+        # police, taille et couleur de la fenêtre, comme pour un texte converti depuis le texte brut
+        fmt = self.color_scheme_format()
+        fmt.setFontFamilies([self.resolve_font_family(self.current_font_name)])
+        fmt.setFontPointSize(self.current_font_size)
+        return fmt
+
+    def apply_color_to_note(self) -> None:
+        self.format_whole_note("Couleur de toute la note", self.color_scheme_format())
+
+    def apply_font_to_note(self) -> None:
+        fmt = QTextCharFormat()
+        fmt.setFontFamilies([self.resolve_font_family(self.current_font_name)])
+        self.format_whole_note("Police de toute la note", fmt)
+
+    def apply_size_to_note(self, size: int) -> None:
         fmt = QTextCharFormat()
         fmt.setFontPointSize(size)
-        cursor = self.editor.textCursor()
-        if cursor.hasSelection():
-            self.editor.mergeCurrentCharFormat(fmt)
+        self.format_whole_note("Taille de toute la note", fmt)
+
+    def strip_note_formatting(self) -> None:
+        self.format_whole_note("Effacement de la mise en forme", self.note_base_format(), replace=True)
+
+    def apply_font_size(self, size: int, commit: bool) -> None:
+        if self.plain_mode:
+            self.editor.setFont(QFont(self.resolve_font_family(self.current_font_name), size))
         else:
+            fmt = QTextCharFormat()
+            fmt.setFontPointSize(size)
             self.editor.mergeCurrentCharFormat(fmt)
         if commit:
             self.current_font_size = size
             self.save_font_config()
+            if self.outline is not None:
+                self.outline.set_base_size(size)
 
     def set_autostart(self, enabled: bool) -> None:
         self.autostart_enabled = enabled
@@ -770,159 +2118,197 @@ class StickyNoteWindow(QWidget):
 
     def save_margins_for_theme(self, theme_name: str, margins: tuple[int, int, int, int]) -> None:
         self.layout_config[theme_name] = list(margins)
-        self.layout_config_path.write_text(json.dumps(self.layout_config, indent=2), encoding="utf-8")
+        self.write_config(self.layout_config_path, self.layout_config)
+
+    def write_config(self, path: Path, data: object) -> None:
+        if self.store is not None:
+            self.store.set_setting(path.name, data)
+            return
+        atomic_write(path, json.dumps(data, indent=2).encode("utf-8"))
 
     def save_theme_config(self, theme_name: str) -> None:
         data = {"theme": theme_name}
-        self.theme_config_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        self.write_config(self.theme_config_path, data)
 
     def save_font_config(self) -> None:
-        data = {"current": self.current_font_name, "size": self.current_font_size}
-        self.font_config_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        data = {"current": self.current_font_name, "size": self.current_font_size, "dirs": [str(d) for d in self.font_dirs]}
+        self.write_config(self.font_config_path, data)
 
     def save_color_config(self) -> None:
         data = {"mode": self.current_color_mode, "colors": self.current_colors}
-        self.color_config_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        self.write_config(self.color_config_path, data)
 
     def save_opacity_config(self) -> None:
         data = {"opacity": self.opacity_value}
-        self.opacity_config_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        self.write_config(self.opacity_config_path, data)
 
     def save_custom_style(self) -> None:
-        self.custom_style_path.write_text(json.dumps(self.custom_style, indent=2), encoding="utf-8")
+        self.write_config(self.custom_style_path, self.custom_style)
 
     def save_autostart_config(self, enabled: bool) -> None:
-        self.autostart_config_path.write_text(json.dumps({"enabled": enabled}, indent=2), encoding="utf-8")
+        self.write_config(self.autostart_config_path, {"enabled": enabled})
 
     def load_layout_config(self) -> dict:
         default = {
             "Notes": list(self.default_margins),
             "Calpin": list(self.default_margins),
         }
-        if self.layout_config_path.exists():
-            try:
-                loaded = json.loads(self.layout_config_path.read_text(encoding="utf-8"))
-                # migrate anciens noms
-                if "Texture1" in loaded and "Notes" not in loaded:
-                    loaded["Notes"] = loaded.get("Texture1")
-                if "Texture2" in loaded and "Calpin" not in loaded:
-                    loaded["Calpin"] = loaded.get("Texture2")
-                default.update(loaded)
-            except Exception:
-                pass
+        loaded = self.read_config(self.layout_config_path)
+        if isinstance(loaded, dict):
+            # migrate anciens noms
+            if "Texture1" in loaded and "Notes" not in loaded:
+                loaded["Notes"] = loaded.get("Texture1")
+            if "Texture2" in loaded and "Calpin" not in loaded:
+                loaded["Calpin"] = loaded.get("Texture2")
+            default.update(loaded)
         return default
 
     def open_resize_dialog(self) -> None:
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Redimensionner la note")
-        layout = QVBoxLayout(dialog)
-
-        base_w = self.base_size.width()
-        base_h = self.base_size.height()
-        current_w = self.width()
-        current_h = self.height()
-
-        def pct(val, base):
-            return max(60, min(200, int(val / base * 100)))
-
-        slider_w = QSlider(Qt.Horizontal)
-        slider_w.setMinimum(60)
-        slider_w.setMaximum(200)
-        slider_w.setValue(pct(current_w, base_w))
-        label_w = QLabel(f"Largeur : {slider_w.value()}%")
-
-        slider_h = QSlider(Qt.Horizontal)
-        slider_h.setMinimum(60)
-        slider_h.setMaximum(200)
-        slider_h.setValue(pct(current_h, base_h))
-        label_h = QLabel(f"Hauteur : {slider_h.value()}%")
-
-        def apply_preview() -> None:
-            w = int(base_w * slider_w.value() / 100)
-            h = int(base_h * slider_h.value() / 100)
-            self.resize(w, h)
-            label_w.setText(f"Largeur : {slider_w.value()}%")
-            label_h.setText(f"Hauteur : {slider_h.value()}%")
-
-        slider_w.valueChanged.connect(lambda _: apply_preview())
-        slider_h.valueChanged.connect(lambda _: apply_preview())
-
-        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        buttons.accepted.connect(dialog.accept)
-
-        def on_cancel():
-            self.resize(current_w, current_h)
-            dialog.reject()
-
-        buttons.rejected.connect(on_cancel)
-
-        layout.addWidget(label_w)
-        layout.addWidget(slider_w)
-        layout.addWidget(label_h)
-        layout.addWidget(slider_h)
-        layout.addWidget(buttons)
-
-        dialog.exec()
+        if self.resize_dialog is None:
+            self.resize_dialog = ResizeDialog(self)
+        self.resize_dialog.open_dialog()
 
     def load_theme_config(self) -> dict:
         default = {"theme": "Papier"}
-        if self.theme_config_path.exists():
-            try:
-                loaded = json.loads(self.theme_config_path.read_text(encoding="utf-8"))
-                default.update(loaded)
-            except Exception:
-                pass
+        loaded = self.read_config(self.theme_config_path)
+        if isinstance(loaded, dict):
+            default.update(loaded)
         return default
 
     def load_font_config(self) -> dict:
         default = {"current": "Défaut"}
-        if self.font_config_path.exists():
-            try:
-                loaded = json.loads(self.font_config_path.read_text(encoding="utf-8"))
-                default.update(loaded)
-            except Exception:
-                pass
+        loaded = self.read_config(self.font_config_path)
+        if isinstance(loaded, dict):
+            default.update(loaded)
         return default
 
     def load_color_config(self) -> dict:
         default = {"mode": "solid", "colors": ["#2f2a1f", "#2f2a1f"]}
-        if self.color_config_path.exists():
-            try:
-                loaded = json.loads(self.color_config_path.read_text(encoding="utf-8"))
-                default.update(loaded)
-            except Exception:
-                pass
+        loaded = self.read_config(self.color_config_path)
+        if isinstance(loaded, dict):
+            default.update(loaded)
         return default
 
     def load_opacity_config(self) -> float:
         default_opacity = 1.0
-        if self.opacity_config_path.exists():
+        data = self.read_config(self.opacity_config_path)
+        if isinstance(data, dict):
             try:
-                data = json.loads(self.opacity_config_path.read_text(encoding="utf-8"))
                 val = float(data.get("opacity", default_opacity))
                 return max(0.3, min(1.0, val))
-            except Exception:
+            except (TypeError, ValueError):
                 pass
         return default_opacity
 
     def load_custom_style(self) -> dict:
         default = {"mode": "color", "value": "#f7f1dc"}
-        if self.custom_style_path.exists():
-            try:
-                loaded = json.loads(self.custom_style_path.read_text(encoding="utf-8"))
-                default.update(loaded)
-            except Exception:
-                pass
+        loaded = self.read_config(self.custom_style_path)
+        if isinstance(loaded, dict):
+            default.update(loaded)
         return default
 
+    def set_sync_enabled(self, enabled: bool) -> None:
+        self.write_config(self.sync_config_path, {"enabled": enabled})
+        if enabled:
+            self.note_sync.start(adopt_remote=False)
+        else:
+            self.note_sync.stop()
+            self.save_notes()
+
+    def open_store(self) -> SqliteNoteStore | None:
+        try:
+            return SqliteNoteStore(self.notes_db_path, self.serializer)
+        except sqlite3.Error:
+            return None  # base illisible : on reste sur les fichiers
+
+    def set_storage_backend(self, sqlite: bool) -> None:
+        if sqlite == (self.store is not None) or self.editor.bulk_job is not None:
+            if self.storage_action is not None:
+                self.storage_action.setChecked(self.store is not None)
+            return
+        self.autosave.flush()
+        try:
+            with self.notes_lock:
+                if sqlite:
+                    store = self.open_store()
+                    if store is None:
+                        if self.storage_action is not None:
+                            self.storage_action.setChecked(False)
+                        return
+                    for name in StartupLoader.CONFIG_FILES:
+                        if name == self.font_index.index_path.name:
+                            continue  # cache écrit par son thread de scan : reste un fichier
+                        path = self.data_dir.joinpath(name)
+                        value = StartupLoader.read_json(path)
+                        if value is not None:
+                            store.set_setting(name, value)
+                            path.unlink(missing_ok=True)
+                    store.retain({tab.id for tab in self.tabs})
+                    for tab in self.tabs:
+                        self.transfer_tab(tab, store, True)
+                    self.store = store
+                else:
+                    store, self.store = self.store, None
+                    for tab in self.tabs:
+                        self.transfer_tab(tab, store, False)
+                    for name, value in store.settings().items():
+                        self.write_config(self.data_dir.joinpath(name), value)
+                    store.close()
+                atomic_write(self.storage_config_path, json.dumps({"backend": "sqlite" if sqlite else "files"}).encode("utf-8"))
+        except TimeoutError:
+            # la ligne de commande lit ou écrit la note : bascule refusée, à refaire plus tard
+            if self.storage_action is not None:
+                self.storage_action.setChecked(self.store is not None)
+
+    def transfer_tab(self, tab: NoteTab, store: SqliteNoteStore, to_store: bool) -> None:
+        # copie la note d'un stockage à l'autre ; un onglet évincé n'est chargé que le temps de la copie
+        doc = tab.document
+        if doc is None:
+            doc = self.new_document(tab.plain)
+            if to_store:
+                self.fill_document(tab, doc, StartupLoader.read_notes(tab.folder))
+            elif not store.load(tab.id, doc, tab.plain):
+                doc.deleteLater()
+                return
+        if to_store:
+            # vers notes.db : les fichiers de la note ne feraient plus foi (ligne de commande, autres outils)
+            store.save(tab.id, doc, tab.title, tab.plain)
+            for path in (tab.compact_path, tab.html_path, tab.text_path):
+                path.unlink(missing_ok=True)
+        else:
+            self.write_note_files(tab, doc)
+        if doc is not tab.document:
+            store.forget(tab.id)
+            doc.deleteLater()
+
+    def load_sync_config(self) -> bool:
+        data = self.read_config(self.sync_config_path)
+        return bool(data.get("enabled", False)) if isinstance(data, dict) else False
+
+    def load_tabs_config(self) -> dict:
+        default = {"tabs": [], "active": NoteTab.MAIN_ID, "budget_mb": 64}
+        data = self.read_config(self.tabs_config_path)
+        if isinstance(data, dict):
+            default.update({key: type(value)(data[key]) for key, value in default.items() if key in data})
+        return default
+
+    def save_tabs_config(self) -> None:
+        self.tabs_config["tabs"] = [tab.to_config() for tab in self.tabs[1:]]
+        self.write_config(self.tabs_config_path, self.tabs_config)
+
+    def load_editor_mode_config(self) -> dict:
+        default = {"plain": False, "auto_plain_chars": 0, "keep_rich": False}
+        data = self.read_config(self.editor_mode_path)
+        if isinstance(data, dict):
+            default.update({key: type(value)(data[key]) for key, value in default.items() if key in data})
+        return default
+
+    def save_editor_mode_config(self) -> None:
+        self.write_config(self.editor_mode_path, self.editor_mode)
+
     def load_autostart_config(self) -> bool:
-        if self.autostart_config_path.exists():
-            try:
-                data = json.loads(self.autostart_config_path.read_text(encoding="utf-8"))
-                return bool(data.get("enabled", False))
-            except Exception:
-                pass
-        return False
+        data = self.read_config(self.autostart_config_path)
+        return bool(data.get("enabled", False)) if isinstance(data, dict) else False
 
     def on_overlay_margins_changed(self, margins: tuple[int, int, int, int]) -> None:
         theme = self.theme_combo.currentText()
@@ -932,18 +2318,43 @@ class StickyNoteWindow(QWidget):
         self.save_margins_for_theme(theme, margins)
 
     def build_font_menu(self) -> None:
+        # polices embarquées + polices déjà choisies ; les dossiers utilisateur passent par le sélecteur
         self.font_menu.clear()
-        default_action = self.font_menu.addAction("Défaut")
-        default_action.setCheckable(True)
-        default_action.triggered.connect(lambda checked: self.select_font(None))
+        self.font_actions.clear()
+        self.checked_font_action = None
+        self.font_menu_end = self.font_menu.addSeparator()
+        more = self.font_menu.addAction("Plus de polices…")
+        more.triggered.connect(self.open_font_picker)
         self.font_menu.addSeparator()
-
+        whole = self.font_menu.addAction("Appliquer à toute la note")
+        whole.triggered.connect(self.apply_font_to_note)
+        strip = self.font_menu.addAction("Effacer la mise en forme de la note")
+        strip.triggered.connect(self.strip_note_formatting)
+        self.add_font_action("Défaut")
+        self.font_menu.insertSeparator(self.font_menu_end)
         for fam in sorted(self.font_families.keys()):
-            act = self.font_menu.addAction(fam)
-            act.setCheckable(True)
-            act.triggered.connect(lambda checked, f=fam: self.select_font(f))
+            self.add_font_action(fam)
         self.update_font_menu_checks(self.current_font_name)
 
+    def add_font_action(self, family: str) -> QAction:
+        act = QAction(family, self.font_menu)
+        act.setCheckable(True)
+        act.triggered.connect(lambda checked, f=family: self.select_font(None if f == "Défaut" else f))
+        self.font_menu.insertAction(self.font_menu_end, act)
+        self.font_actions[family] = act
+        return act
+
+    def open_font_picker(self) -> None:
+        if self.font_picker is None:
+            self.font_picker = FontPickerDialog(self)
+        self.font_picker.open_picker()
+
+    def add_font_directory(self, path: Path) -> None:
+        if path not in self.font_dirs:
+            self.font_dirs.append(path)
+            self.save_font_config()
+        self.font_index.scan(self.font_dirs)
+
     def build_color_menu(self) -> None:
         self.color_menu.clear()
         modes = [
@@ -960,6 +2371,9 @@ class StickyNoteWindow(QWidget):
         pick1.triggered.connect(lambda: self.pick_color(0))
         pick2 = self.color_menu.addAction("Couleur 2…")
         pick2.triggered.connect(lambda: self.pick_color(1))
+        self.color_menu.addSeparator()
+        whole = self.color_menu.addAction("Appliquer à toute la note")
+        whole.triggered.connect(self.apply_color_to_note)
         self.update_color_menu_checks(self.current_color_mode)
 
     def solid_color_stylesheet(self, color: str) -> str:
@@ -974,28 +2388,28 @@ class StickyNoteWindow(QWidget):
             border: 1px solid rgba(0, 0, 0, 0.12);
             border-radius: 8px;
         }}
-        #StickyRoot QTextEdit {{
+        #StickyRoot #NoteEditor {{
             background: {color};
             border: none;
             border-radius: 6px;
             padding: 12px;
             selection-background-color: rgba(0, 0, 0, 0.12);
         }}
-        #StickyRoot QTextEdit QScrollBar:vertical {{
+        #StickyRoot #NoteEditor QScrollBar:vertical {{
             background: transparent;
             width: 10px;
             margin: 2px 2px 2px 0;
         }}
-        #StickyRoot QTextEdit QScrollBar::handle:vertical {{
+        #StickyRoot #NoteEditor QScrollBar::handle:vertical {{
             background: rgba(0, 0, 0, 0.28);
             border-radius: 5px;
             min-height: 24px;
         }}
-        #StickyRoot QTextEdit QScrollBar::add-line:vertical,
-        #StickyRoot QTextEdit QScrollBar::sub-line:vertical {{
+        #StickyRoot #NoteEditor QScrollBar::add-line:vertical,
+        #StickyRoot #NoteEditor QScrollBar::sub-line:vertical {{
             height: 0px;
         }}
-        #StickyRoot QTextEdit QScrollBar:horizontal {{ height: 0px; }}
+        #StickyRoot #NoteEditor QScrollBar:horizontal {{ height: 0px; }}
         #StickyRoot QComboBox, #StickyRoot QCheckBox, #StickyRoot QLabel {{
             background: transparent;
             border: none;
@@ -1005,12 +2419,13 @@ class StickyNoteWindow(QWidget):
 
     def load_fonts(self) -> dict[str, str]:
         families: dict[str, str] = {}
-        if not self.fonts_dir.exists():
-            return families
-        for ttf in self.fonts_dir.rglob("*.ttf"):
-            fid = QFontDatabase.addApplicationFont(str(ttf))
+        # polices enregistrées, pour le rapport mémoire (Qt garde une copie des données)
+        self.app_fonts: dict[str, dict] = {}
+        for path, data in StartupLoader.read_fonts(self.fonts_dir):
+            fid = QFontDatabase.addApplicationFontFromData(QByteArray(data))
             if fid == -1:
                 continue
+            self.app_fonts[PurePath(path).name] = {"bytes": len(data), "families": len(QFontDatabase.applicationFontFamilies(fid))}
             for fam in QFontDatabase.applicationFontFamilies(fid):
                 families[fam] = fam
         return families
@@ -1061,6 +2476,16 @@ class StickyNoteWindow(QWidget):
         self.editor.mergeCurrentCharFormat(fmt)
 
     def apply_color_scheme(self) -> None:
+        if self.plain_mode:
+            # texte brut : couleur de la vue via la palette (QPlainTextEdit n'y peint qu'une couleur
+            # unie, un dégradé prend sa première couleur)
+            palette = self.editor.palette()
+            palette.setColor(QPalette.Text, QColor(self.current_colors[0]))
+            self.editor.setPalette(palette)
+        else:
+            self.apply_char_format(self.color_scheme_format())
+
+    def color_scheme_format(self) -> QTextCharFormat:
         mode = self.current_color_mode
         colors = self.current_colors
         fmt = QTextCharFormat()
@@ -1072,7 +2497,7 @@ class StickyNoteWindow(QWidget):
             grad.setColorAt(0.0, QColor(colors[0]))
             grad.setColorAt(1.0, QColor(colors[1]))
             fmt.setForeground(QBrush(grad))
-        self.apply_char_format(fmt)
+        return fmt
 
     def compute_flags(self, pinned: bool) -> Qt.WindowType:
         flags = Qt.FramelessWindowHint | Qt.Window | Qt.CustomizeWindowHint
@@ -1103,77 +2528,9 @@ class StickyNoteWindow(QWidget):
             self.show_window()
 
     def open_size_dialog(self) -> None:
-        html_before = self.editor.toHtml()
-        cursor_before = self.editor.textCursor()
-
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Taille et alignement")
-        layout = QVBoxLayout(dialog)
-        label = QLabel(f"Taille : {self.current_font_size}")
-        slider = QSlider(Qt.Horizontal)
-        slider.setMinimum(8)
-        slider.setMaximum(48)
-        slider.setValue(self.current_font_size)
-        slider.valueChanged.connect(lambda v: label.setText(f"Taille : {v}"))
-        slider.valueChanged.connect(lambda v: self.preview_font_size(v))
-
-        align_row = QHBoxLayout()
-        align_label = QLabel("Alignement :")
-        btn_left = QPushButton("G")
-        btn_center = QPushButton("C")
-        btn_right = QPushButton("D")
-        btn_justify = QPushButton("J")
-        for b in (btn_left, btn_center, btn_right, btn_justify):
-            b.setCheckable(True)
-            b.setFixedWidth(28)
-        align_group = [btn_left, btn_center, btn_right, btn_justify]
-
-        current_align = self.editor.textCursor().blockFormat().alignment()
-        if current_align & Qt.AlignJustify:
-            btn_justify.setChecked(True)
-        elif current_align & Qt.AlignRight:
-            btn_right.setChecked(True)
-        elif current_align & Qt.AlignHCenter:
-            btn_center.setChecked(True)
-        else:
-            btn_left.setChecked(True)
-
-        def set_align(btn, align):
-            def handler():
-                for b in align_group:
-                    b.setChecked(b is btn)
-                self.apply_alignment(align)
-            return handler
-
-        btn_left.clicked.connect(set_align(btn_left, Qt.AlignLeft))
-        btn_center.clicked.connect(set_align(btn_center, Qt.AlignHCenter))
-        btn_right.clicked.connect(set_align(btn_right, Qt.AlignRight))
-        btn_justify.clicked.connect(set_align(btn_justify, Qt.AlignJustify))
-
-        align_row.addWidget(align_label)
-        for b in align_group:
-            align_row.addWidget(b)
-        align_row.addStretch(1)
-
-        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        buttons.accepted.connect(dialog.accept)
-        def on_cancel():
-            self.editor.setHtml(html_before)
-            self.editor.setTextCursor(cursor_before)
-            self.apply_current_font()
-            dialog.reject()
-        buttons.rejected.connect(on_cancel)
-
-        layout.addWidget(label)
-        layout.addWidget(slider)
-        layout.addLayout(align_row)
-        layout.addWidget(buttons)
-
-        if dialog.exec() == QDialog.Accepted:
-            size = slider.value()
-            self.apply_font_size(size, commit=True)
-        else:
-            self.preview_font_size(self.current_font_size)
+        if self.size_dialog is None:
+            self.size_dialog = SizeDialog(self)
+        self.size_dialog.open_dialog()
 
     def choose_custom_image(self) -> None:
         path, _ = QFileDialog.getOpenFileName(self, "Choisir une image", "", "Images (*.png *.jpg *.jpeg *.bmp *.gif)")
@@ -1195,43 +2552,9 @@ class StickyNoteWindow(QWidget):
         self.apply_theme("Personnalisé")
 
     def open_opacity_dialog(self) -> None:
-        previous = self.opacity_value
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Opacité de la note")
-        layout = QVBoxLayout(dialog)
-
-        label = QLabel(f"Opacité : {int(previous * 100)}%")
-        slider = QSlider(Qt.Horizontal)
-        slider.setMinimum(30)
-        slider.setMaximum(100)
-        slider.setValue(int(previous * 100))
-
-        def preview(val: int) -> None:
-            self.opacity_value = val / 100.0
-            self.setWindowOpacity(self.opacity_value)
-            label.setText(f"Opacité : {val}%")
-
-        slider.valueChanged.connect(preview)
-
-        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        buttons.accepted.connect(dialog.accept)
-
-        def on_cancel() -> None:
-            self.opacity_value = previous
-            self.setWindowOpacity(self.opacity_value)
-            dialog.reject()
-
-        buttons.rejected.connect(on_cancel)
-
-        layout.addWidget(label)
-        layout.addWidget(slider)
-        layout.addWidget(buttons)
-
-        if dialog.exec() == QDialog.Accepted:
-            self.save_opacity_config()
-        else:
-            self.opacity_value = previous
-            self.setWindowOpacity(self.opacity_value)
+        if self.opacity_dialog is None:
+            self.opacity_dialog = OpacityDialog(self)
+        self.opacity_dialog.open_dialog()
 
     def preview_font_size(self, size: int) -> None:
         self.apply_font_size(size, commit=False)
@@ -1251,28 +2574,28 @@ class StickyNoteWindow(QWidget):
             border-image: url("{url}") 0 0 0 0 stretch stretch;
             background: transparent;
         }}
-        #StickyRoot QTextEdit {{
+        #StickyRoot #NoteEditor {{
             background: transparent;
             border: none;
             border-radius: 10px;
             padding: 12px;
             selection-background-color: rgba(217, 200, 143, 0.6);
         }}
-        #StickyRoot QTextEdit QScrollBar:vertical {{
+        #StickyRoot #NoteEditor QScrollBar:vertical {{
             background: transparent;
             width: 10px;
             margin: 2px 2px 2px 0;
         }}
-        #StickyRoot QTextEdit QScrollBar::handle:vertical {{
+        #StickyRoot #NoteEditor QScrollBar::handle:vertical {{
             background: rgba(0, 0, 0, 0.28);
             border-radius: 5px;
             min-height: 24px;
         }}
-        #StickyRoot QTextEdit QScrollBar::add-line:vertical,
-        #StickyRoot QTextEdit QScrollBar::sub-line:vertical {{
+        #StickyRoot #NoteEditor QScrollBar::add-line:vertical,
+        #StickyRoot #NoteEditor QScrollBar::sub-line:vertical {{
             height: 0px;
         }}
-        #StickyRoot QTextEdit QScrollBar:horizontal {{ height: 0px; }}
+        #StickyRoot #NoteEditor QScrollBar:horizontal {{ height: 0px; }}
         #StickyRoot QComboBox, #StickyRoot QCheckBox, #StickyRoot QLabel {{
             background: transparent;
             border: none;
@@ -1281,13 +2604,317 @@ class StickyNoteWindow(QWidget):
         '''
 
 
+SESSION_VERSION = 1
+
+
+def open_session(path: Path, mode: str):
+    # ".gz" : l'en-tête porte toute la note de départ, gzip la réduit d'un ordre de grandeur
+    if path.suffix == ".gz":
+        return gzip.open(path, mode, encoding="utf-8")
+    return path.open(mode[0], encoding="utf-8")
+
+
+def note_digest(window: StickyNoteWindow) -> str:
+    return hashlib.sha256(window.editor.toPlainText().encode("utf-8")).hexdigest()[:16]
+
+
+def latency_summary(values: list[float]) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 2)
+
+    return {"count": len(ordered), "p50_ms": at(0.50), "p90_ms": at(0.90), "p99_ms": at(0.99), "max_ms": round(ordered[-1], 2)}
+
+
+class SessionRecorder(QObject):
+    # journal JSON lignes : en-tête (état de départ de la note), un événement par ligne avec "t" = ms
+    # écoulées depuis le précédent, puis l'empreinte finale ; seuls les événements reçus par la fenêtre
+    # ou ses enfants sont gardés (menus et dialogues sont des fenêtres à part et ne sont pas rejoués)
+    MOUSE_KINDS = {
+        QEvent.MouseButtonPress: "mp",
+        QEvent.MouseButtonRelease: "mr",
+        QEvent.MouseButtonDblClick: "md",
+        QEvent.MouseMove: "mm",
+    }
+
+    def __init__(self, window: StickyNoteWindow, path: Path) -> None:
+        super().__init__(window)
+        self.window = window
+        self.path = path
+        self.file = None
+        self.last = 0.0
+        self.origin = QPoint()
+        self.grab: QWidget | None = None
+        self.events = 0
+
+    def start(self) -> None:
+        window = self.window
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open_session(self.path, "wt")
+        self.origin = window.pos()
+        header = {
+            "v": SESSION_VERSION,
+            "size": [window.width(), window.height()],
+            "theme": window.theme_combo.currentText(),
+            "plain": window.plain_mode,
+            "cursor": window.editor.textCursor().position(),
+        }
+        if window.plain_mode:
+            header["text"] = window.editor.toPlainText()
+        else:
+            header["html"] = window.editor.toHtml()
+        self.file.write(json.dumps(header, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.last = time.perf_counter()
+        window.theme_combo.currentTextChanged.connect(self.on_theme)
+        QApplication.instance().installEventFilter(self)
+
+    def stop(self) -> None:
+        if self.file is None:
+            return
+        QApplication.instance().removeEventFilter(self)
+        self.window.theme_combo.currentTextChanged.disconnect(self.on_theme)
+        self.write({"k": "end", "digest": note_digest(self.window)})
+        self.file.close()
+        self.file = None
+
+    def write(self, entry: dict) -> None:
+        now = time.perf_counter()
+        line = {"t": round((now - self.last) * 1000, 1), **entry}
+        self.last = now
+        self.file.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.events += 1
+
+    def contains(self, widget: QWidget) -> bool:
+        return widget is self.window or self.window.isAncestorOf(widget)
+
+    def on_theme(self, name: str) -> None:
+        self.write({"k": "th", "n": name})
+
+    def eventFilter(self, watched: QObject, event) -> bool:  # type: ignore[override]
+        kind = event.type()
+        if kind == QEvent.Shortcut:
+            # le raccourci est consommé avant d'arriver au widget : on note l'action déclenchée
+            owner = watched.parent() if isinstance(watched, QAction) else None
+            if isinstance(owner, QWidget) and self.contains(owner):
+                self.write({"k": "a", "n": watched.text()})
+        elif not isinstance(watched, QWidget) or not self.contains(watched):
+            pass
+        elif kind == QEvent.KeyPress:
+            # un appui ignoré remonte aux parents : seul le widget qui a le focus le reçoit en premier
+            if watched is QApplication.focusWidget():
+                entry = {"k": "kp", "c": event.key(), "m": event.modifiers().value}
+                if event.text():
+                    entry["x"] = event.text()
+                if event.isAutoRepeat():
+                    entry["r"] = 1
+                self.write(entry)
+        elif kind in self.MOUSE_KINDS:
+            pos = watched.mapTo(self.window, event.position().toPoint())
+            if kind == QEvent.MouseMove and not event.buttons():
+                return False
+            # appui : le widget sous le pointeur ; ensuite déplacements et relâché vont à celui qui a reçu l'appui
+            first = self.grab if self.grab is not None else self.window.childAt(pos) or self.window
+            if watched is not first:
+                return False
+            if kind == QEvent.MouseButtonPress:
+                self.grab = watched
+            elif kind == QEvent.MouseButtonRelease:
+                self.grab = None
+            self.write({
+                "k": self.MOUSE_KINDS[kind],
+                "p": [pos.x(), pos.y()],
+                "g": self.global_offset(event),
+                "b": event.button().value,
+                "bs": event.buttons().value,
+                "m": event.modifiers().value,
+            })
+        elif kind == QEvent.Wheel:
+            pos = watched.mapTo(self.window, event.position().toPoint())
+            if watched is (self.window.childAt(pos) or self.window):
+                delta = event.angleDelta()
+                self.write({"k": "w", "p": [pos.x(), pos.y()], "g": self.global_offset(event), "d": [delta.x(), delta.y()], "m": event.modifiers().value})
+        elif kind == QEvent.Resize and watched is self.window:
+            self.write({"k": "rs", "s": [event.size().width(), event.size().height()]})
+        return False
+
+    def global_offset(self, event) -> list[int]:
+        # position globale relative à la fenêtre au début de la session : le glisser de la fenêtre se rejoue ailleurs
+        point = event.globalPosition().toPoint() - self.origin
+        return [point.x(), point.y()]
+
+
+class SessionReplayer:
+    def __init__(self, path: Path) -> None:
+        with open_session(path, "rt") as file:
+            lines = file.read().splitlines()
+        if not lines:
+            raise ValueError("session vide")
+        self.header = json.loads(lines[0])
+        if self.header.get("v") != SESSION_VERSION:
+            raise ValueError(f"version de session {self.header.get('v')!r} non prise en charge")
+        self.events = [json.loads(line) for line in lines[1:] if line]
+        self.expected_digest = next((entry["digest"] for entry in self.events if entry["k"] == "end"), None)
+
+    def prepare(self, window: StickyNoteWindow) -> None:
+        header = self.header
+        if header["plain"] != window.plain_mode:
+            window.set_plain_mode(header["plain"], confirm=False)
+        window.theme_combo.setCurrentText(header["theme"])
+        window.resize(*header["size"])
+        if header["plain"]:
+            window.editor.setPlainText(header["text"])
+        else:
+            window.editor.setHtml(header["html"])
+        cursor = window.editor.textCursor()
+        cursor.setPosition(min(header["cursor"], window.editor.document().characterCount() - 1))
+        window.editor.setTextCursor(cursor)
+        window.activateWindow()
+        window.editor.setFocus()
+        QApplication.instance().processEvents()
+
+    def run(self, window: StickyNoteWindow, speed: str = "max") -> dict:
+        # "real" respecte les écarts enregistrés, "max" enchaîne les événements ; la latence d'un
+        # événement couvre son traitement et les événements postés qu'il déclenche (mise en page, peinture)
+        app = QApplication.instance()
+        self.prepare(window)
+        origin = window.pos()
+        latencies: dict[str, list[float]] = {}
+        lateness = []
+        missing = 0
+        grab: QWidget | None = None
+        start = time.perf_counter()
+        due = start
+        for stamp, entry in enumerate(self.events, 1):
+            kind = entry["k"]
+            if kind == "end":
+                break
+            due += entry["t"] / 1000
+            if speed == "real":
+                while time.perf_counter() < due:
+                    app.processEvents()
+                lateness.append((time.perf_counter() - due) * 1000)
+            began = time.perf_counter()
+            if kind == "kp":
+                event = QKeyEvent(QEvent.KeyPress, entry["c"], Qt.KeyboardModifier(entry["m"]), entry.get("x", ""), bool(entry.get("r")))
+                event.setTimestamp(stamp)
+                QApplication.sendEvent(QApplication.focusWidget() or window.editor, event)
+            elif kind in ("mp", "mr", "md", "mm", "w"):
+                pos = QPoint(*entry["p"])
+                target = grab if grab is not None and kind in ("mm", "mr") else window.childAt(pos) or window
+                local = QPointF(target.mapFrom(window, pos))
+                global_pos = QPointF(origin + QPoint(*entry["g"]))
+                modifiers = Qt.KeyboardModifier(entry["m"])
+                if kind == "w":
+                    event = QWheelEvent(local, global_pos, QPoint(), QPoint(*entry["d"]), Qt.NoButton, modifiers, Qt.NoScrollPhase, False)
+                else:
+                    event_type = {"mp": QEvent.MouseButtonPress, "mr": QEvent.MouseButtonRelease, "md": QEvent.MouseButtonDblClick, "mm": QEvent.MouseMove}[kind]
+                    event = QMouseEvent(event_type, local, global_pos, Qt.MouseButton(entry["b"]), Qt.MouseButton(entry["bs"]), modifiers)
+                    grab = target if kind == "mp" else None if kind == "mr" else grab
+                event.setTimestamp(stamp)
+                QApplication.sendEvent(target, event)
+            elif kind == "a":
+                action = next((a for a in window.findChildren(QAction) if a.text() == entry["n"] and not a.shortcut().isEmpty() and a.isEnabled()), None)
+                if action is None:
+                    missing += 1
+                    continue
+                action.trigger()
+            elif kind == "th":
+                window.theme_combo.setCurrentText(entry["n"])
+            elif kind == "rs":
+                window.resize(*entry["s"])
+            app.processEvents()
+            latencies.setdefault(kind, []).append((time.perf_counter() - began) * 1000)
+        elapsed = time.perf_counter() - start
+        digest = note_digest(window)
+        result = {
+            "speed": speed,
+            "events": sum(len(values) for values in latencies.values()),
+            "duration_ms": round(elapsed * 1000, 1),
+            "latency": latency_summary([value for values in latencies.values() for value in values]),
+            "by_kind": {kind: latency_summary(values) for kind, values in sorted(latencies.items())},
+            "missing_actions": missing,
+            "digest": digest,
+            "digest_matches": None if self.expected_digest is None else digest == self.expected_digest,
+        }
+        if lateness:
+            result["lateness"] = latency_summary(lateness)
+        return result
+
+
+def replay_session(path: Path, speed: str) -> int:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    try:
+        replayer = SessionReplayer(path)
+    except (OSError, ValueError, KeyError) as exc:
+        print(f"Session illisible : {exc}", file=sys.stderr)
+        return 2
+    with tempfile.TemporaryDirectory() as tmp:
+        window = StickyNoteWindow(data_dir=Path(tmp))
+        window.show()
+        app.processEvents()
+        result = replayer.run(window, speed)
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+    print(json.dumps({"session": str(path), **result}), flush=True)
+    # une note finale différente de l'enregistrement fait échouer la fixture
+    return 1 if result["digest_matches"] is False else 0
+
+
 def main() -> int:
-    app = QApplication(sys.argv)
-    icon_file = resource_path("icon.ico")
-    if icon_file.exists():
-        app.setWindowIcon(QIcon(str(icon_file)))
-    window = StickyNoteWindow()
-    window.show()
+    parser = argparse.ArgumentParser(prog="BlocNoteEpinglé")
+    parser.add_argument("--data-dir", type=Path, help="dossier de données isolé (sans tray, hotkey ni démarrage auto)")
+    parser.add_argument("--startup-report", action="store_true", help="affiche les temps de démarrage puis quitte")
+    parser.add_argument("--memory-report", action="store_true", help="suit les allocations dès le lancement, affiche le rapport mémoire une fois la note prête puis quitte")
+    parser.add_argument("--memory-diff", nargs=2, type=Path, metavar=("AVANT", "APRES"), help="compare deux rapports mémoire (JSON) puis quitte")
+    parser.add_argument("--record", type=Path, metavar="FICHIER", help="enregistre la session (saisies, raccourcis, souris) dans ce fichier")
+    parser.add_argument("--replay", type=Path, metavar="FICHIER", help="rejoue une session enregistrée hors écran, affiche les latences puis quitte")
+    parser.add_argument("--replay-speed", choices=("max", "real"), default="max", help="rythme du rejeu : au plus vite ou temps réel")
+    args, qt_args = parser.parse_known_args()
+    if args.replay is not None:
+        return replay_session(args.replay, args.replay_speed)
+    if args.memory_diff:
+        print(json.dumps(diff_memory_reports(*(load_memory_report(path) for path in args.memory_diff)), ensure_ascii=False, indent=1))
+        return 0
+    if args.memory_report:
+        tracemalloc.start(MEMORY_TRACE_FRAMES)
+
+    startup = StartupLoader()
+    with startup.phase("qt_app"):
+        app = QApplication(sys.argv[:1] + qt_args)
+        icon_file = resource_path("icon.ico")
+        if icon_file.exists():
+            app.setWindowIcon(QIcon(str(icon_file)))
+    with startup.phase("window"):
+        window = StickyNoteWindow(data_dir=args.data_dir)
+    with startup.phase("show"):
+        window.show()
+    if args.record is not None:
+        recorder = SessionRecorder(window, args.record)
+        recorder.start()
+        app.aboutToQuit.connect(recorder.stop)
+    if args.startup_report:
+        shown = startup.now_ms()
+
+        def report() -> None:
+            startup.phases["first_frame"] = (shown, startup.now_ms())
+            print(json.dumps(startup.report()), flush=True)
+            app.exit(0)
+
+        QTimer.singleShot(0, report)
+    elif args.memory_report:
+
+        def memory_report() -> None:
+            # après le travail de fond du démarrage (coloration, ménage des images…)
+            window.idle.run_pending()
+            print(json.dumps(window.memory_report(), ensure_ascii=False, indent=1), flush=True)
+            app.exit(0)
+
+        QTimer.singleShot(0, memory_report)
     return app.exec()
 
 
@@ -1368,5 +2995,3401 @@ class MarginOverlay(QWidget):
         return edges
 
 
+class AutosavePolicy(QObject):
+    # Sauvegarde pilotée par la révision du document : rien n'est écrit si la révision est celle
+    # déjà persistée ou si le document est revenu à l'état sauvé (annulation). Le délai grandit
+    # avec la taille du document et la vitesse de frappe, sans dépasser MAX_DELAY_MS depuis la
+    # première modification non sauvée.
+    BASE_INTERVAL_MS = 500
+    MAX_INTERVAL_MS = 5000
+    RETRY_MS = 1000
+    MAX_DELAY_MS = 10000
+    CHARS_PER_STEP = 100_000
+    MS_PER_SIZE_STEP = 250
+    MS_PER_KEYSTROKE_PER_S = 100
+
+    def __init__(self, document: QTextDocument, save: Callable[[], None], parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self.document = document
+        self.save = save
+        self.saved_revision = document.revision()
+        self.first_dirty: float | None = None
+        self.changes: deque[float] = deque()
+        self.suspended = 0
+        self.save_count = 0
+        self.skipped_count = 0
+        self.current_interval_ms = self.BASE_INTERVAL_MS
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def is_dirty(self) -> bool:
+        return self.document.revision() != self.saved_revision and self.document.isModified()
+
+    def interval_ms(self, now: float) -> int:
+        while self.changes and now - self.changes[0] > 2.0:
+            self.changes.popleft()
+        typing_rate = len(self.changes) / 2.0
+        size_ms = self.document.characterCount() // self.CHARS_PER_STEP * self.MS_PER_SIZE_STEP
+        typing_ms = min(typing_rate, 20.0) * self.MS_PER_KEYSTROKE_PER_S
+        return int(min(self.MAX_INTERVAL_MS, self.BASE_INTERVAL_MS + size_ms + typing_ms))
+
+    def note_change(self) -> None:
+        now = time.monotonic()
+        self.changes.append(now)
+        if self.first_dirty is None:
+            self.first_dirty = now
+        self.current_interval_ms = self.interval_ms(now)
+        remaining_ms = self.MAX_DELAY_MS - (now - self.first_dirty) * 1000
+        self.timer.start(int(max(0.0, min(self.current_interval_ms, remaining_ms))))
+
+    def flush(self, force: bool = False) -> None:
+        # force (fermeture, quitter) : écrit même suspendu ; une révision déjà sauvée n'a rien à perdre
+        self.timer.stop()
+        if self.suspended and not force:
+            return
+        if not self.is_dirty():
+            self.skipped_count += 1
+            self.first_dirty = None
+            return
+        self.save_count += 1
+        self.save()
+
+    def mark_saved(self) -> None:
+        self.saved_revision = self.document.revision()
+        self.document.setModified(False)
+        self.first_dirty = None
+
+    def suspend(self) -> None:
+        self.suspended += 1
+        self.timer.stop()
+
+    def resume(self) -> None:
+        self.suspended = max(0, self.suspended - 1)
+        if not self.suspended:
+            self.timer.start(0)
+
+
+class IdleTask:
+    # travail de fond découpé en tranches : step(deadline) avance jusqu'à l'échéance (perf_counter)
+    # et renvoie True s'il en reste ; sans step, la tâche consomme le générateur job
+    def __init__(self, name: str, step: Callable[[float], bool] | None, priority: int, budget_ms: float) -> None:
+        self.name = name
+        self.step = step
+        self.priority = priority
+        self.budget_ms = budget_ms
+        self.job: Iterator | None = None
+        self.pending = False
+        self.requested_at = 0.0
+        self.last_run = 0.0
+        self.runs = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.overruns = 0
+        self.completions = 0
+        self.errors = 0
+        self.last_latency_ms = 0.0
+
+    def run(self) -> None:
+        start = time.perf_counter()
+        deadline = start + self.budget_ms / 1000
+        try:
+            more = self.step(deadline) if self.step is not None else self.consume(deadline)
+        except Exception:
+            # une tâche de fond en erreur ne doit ni bloquer les autres ni être relancée en boucle
+            self.errors += 1
+            self.job = None
+            more = False
+        now = time.perf_counter()
+        elapsed_ms = (now - start) * 1000
+        self.runs += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.overruns += elapsed_ms > self.budget_ms * 1.5
+        self.last_run = now
+        if not more:
+            self.pending = False
+            self.completions += 1
+            self.last_latency_ms = (now - self.requested_at) * 1000
+
+    def consume(self, deadline: float) -> bool:
+        if self.job is None:
+            return False
+        for _ in self.job:
+            if time.perf_counter() >= deadline:
+                return True
+        self.job = None
+        return False
+
+    def metrics(self) -> dict:
+        return {
+            "priority": self.priority,
+            "budget_ms": self.budget_ms,
+            "runs": self.runs,
+            "total_ms": round(self.total_ms, 2),
+            "max_slice_ms": round(self.max_ms, 2),
+            "overruns": self.overruns,
+            "completions": self.completions,
+            "errors": self.errors,
+            "last_latency_ms": round(self.last_latency_ms, 1),
+            "pending": self.pending,
+        }
+
+
+class IdleScheduler(QObject):
+    # Maintenance (coloration différée, évictions d'onglets, ménage des images, compactage de notes.db)
+    # exécutée par tranches sur la boucle Qt, seulement après IDLE_AFTER_MS sans frappe ni souris.
+    # Une tranche par tour de boucle, la plus prioritaire d'abord (0 = la plus urgente) ; une entrée
+    # repousse la tranche suivante jusqu'au prochain moment d'inactivité.
+    IDLE_AFTER_MS = 300
+    INPUT_EVENTS = {
+        QEvent.KeyPress,
+        QEvent.MouseButtonPress,
+        QEvent.MouseButtonDblClick,
+        QEvent.MouseMove,
+        QEvent.Wheel,
+        QEvent.InputMethod,
+    }
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self.tasks: dict[str, IdleTask] = {}
+        self.last_input = 0.0
+        self.input_events = 0
+        self.pauses = 0
+        self.running = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run_slice)
+
+    def add(self, name: str, step: Callable[[float], bool] | None = None, priority: int = 0, budget_ms: float = 8.0) -> IdleTask:
+        task = self.tasks[name] = IdleTask(name, step, priority, budget_ms)
+        return task
+
+    def request(self, name: str) -> None:
+        task = self.tasks[name]
+        if not task.pending:
+            task.pending = True
+            task.requested_at = time.perf_counter()
+        self.wake()
+
+    def start_job(self, name: str, job: Iterator) -> None:
+        # remplace un travail du même nom pas encore terminé
+        self.tasks[name].job = job
+        self.request(name)
+
+    def note_input(self) -> None:
+        self.last_input = time.monotonic()
+        self.input_events += 1
+        if self.running:
+            # tranches enchaînées : la suivante attend la prochaine inactivité
+            self.running = False
+            self.pauses += 1
+            self.timer.start(self.IDLE_AFTER_MS)
+
+    def idle_remaining_ms(self) -> int:
+        return max(0, int(self.IDLE_AFTER_MS - (time.monotonic() - self.last_input) * 1000))
+
+    def wake(self) -> None:
+        if not self.timer.isActive():
+            self.timer.start(self.idle_remaining_ms())
+
+    def next_task(self) -> IdleTask | None:
+        pending = [task for task in self.tasks.values() if task.pending]
+        # même priorité : la tâche servie le moins récemment
+        return min(pending, key=lambda task: (task.priority, task.last_run)) if pending else None
+
+    def run_slice(self) -> None:
+        remaining = self.idle_remaining_ms()
+        if remaining > 0:
+            self.running = False
+            self.timer.start(remaining)
+            return
+        task = self.next_task()
+        if task is None:
+            self.running = False
+            return
+        task.run()
+        self.running = self.next_task() is not None
+        if self.running:
+            self.timer.start(0)
+
+    def run_pending(self, timeout: float = 30.0) -> None:
+        # benchmarks / fermeture : tout de suite, sans attendre l'inactivité
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            task = self.next_task()
+            if task is None:
+                break
+            task.run()
+
+    def pending_names(self) -> list[str]:
+        return [task.name for task in sorted(self.tasks.values(), key=lambda task: task.priority) if task.pending]
+
+    def metrics(self) -> dict[str, dict]:
+        return {name: task.metrics() for name, task in self.tasks.items()}
+
+
+class WindowStateLayer:
+    # Toujours-au-premier-plan sans recréer la fenêtre native : QWidget.setWindowFlags() détruit
+    # la fenêtre (scintillement, repeinte complète de la texture, HWND du hotkey Ctrl+H invalidé).
+    # QWindow.setFlags() met à jour la fenêtre existante sur Windows, X11 et macOS.
+    IN_PLACE_PLATFORMS = {"windows", "xcb", "cocoa", "offscreen"}
+
+    def __init__(self, window: StickyNoteWindow) -> None:
+        self.window = window
+        self.last_toggle_ms = 0.0
+        self.last_method = ""
+
+    def set_stays_on_top(self, on: bool, allow_in_place: bool = True) -> str:
+        start = time.perf_counter()
+        flags = self.window.compute_flags(on)
+        handle = self.window.windowHandle()
+        if allow_in_place and handle is not None and QGuiApplication.platformName() in self.IN_PLACE_PLATFORMS:
+            # QWidget garde sa copie des flags : synchronisée sans toucher au système de fenêtres
+            self.window.overrideWindowFlags(flags)
+            handle.setFlags(flags)
+            self.last_method = "in_place"
+        else:
+            hotkey = self.window._hotkey_registered
+            if hotkey:
+                self.window.unregister_global_hotkey()
+            self.window.setWindowFlags(flags)
+            self.window.show()
+            if hotkey:
+                self.window.register_global_hotkey()
+            self.last_method = "recreated"
+        self.last_toggle_ms = (time.perf_counter() - start) * 1000
+        return self.last_method
+
+
+class ImageBlobStore:
+    SCHEME = "blob"
+    DATA_URI_RE = re.compile(r'data:image/([a-zA-Z0-9.+-]+);base64,([A-Za-z0-9+/=\s]+)')
+    BLOB_REF_RE = re.compile(r'blob:([0-9a-f]{64}\.[a-z0-9]+)')
+    BLOB_NAME_RE = re.compile(r'[0-9a-f]{64}\.[a-z0-9]+')
+
+    def __init__(self, blobs_dir: Path, cache_limit_bytes: int = 32 * 1024 * 1024) -> None:
+        self.blobs_dir = blobs_dir
+        self.cache_limit_bytes = cache_limit_bytes
+        self.cache_bytes = 0
+        self._cache: OrderedDict[str, QPixmap] = OrderedDict()
+        # images collées pendant la session : jamais ramassées (le ménage part de la note chargée)
+        self.session_names: set[str] = set()
+        self.collected = 0
+
+    def put_bytes(self, data: bytes, ext: str) -> str:
+        ext = ext.lower().replace("jpeg", "jpg").replace("svg+xml", "svg")
+        name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        self.session_names.add(name)
+        path = self.blobs_dir.joinpath(name)
+        # contenu adressé par hash : présent avec la bonne taille = déjà écrit (une taille
+        # différente trahit une écriture tronquée d'une ancienne version, on la répare)
+        try:
+            complete = path.stat().st_size == len(data)
+        except OSError:
+            complete = False
+        if not complete:
+            self.blobs_dir.mkdir(parents=True, exist_ok=True)
+            atomic_write(path, data)
+        return name
+
+    def put_image(self, image: QImage) -> str:
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, "PNG")
+        buffer.close()
+        return self.put_bytes(bytes(data), "png")
+
+    def url(self, name: str) -> str:
+        return f"{self.SCHEME}:{name}"
+
+    def pixmap(self, name: str) -> QPixmap | None:
+        cached = self._cache.get(name)
+        if cached is not None:
+            self._cache.move_to_end(name)
+            return cached
+        path = self.blobs_dir.joinpath(name)
+        if not path.exists():
+            return None
+        pixmap = QPixmap(str(path))
+        if pixmap.isNull():
+            return None
+        self._cache[name] = pixmap
+        self.cache_bytes += self.pixmap_bytes(pixmap)
+        while self.cache_bytes > self.cache_limit_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self.cache_bytes -= self.pixmap_bytes(evicted)
+        return pixmap
+
+    @staticmethod
+    def pixmap_bytes(pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+
+    def externalize_data_uris(self, html: str) -> str:
+        def replace(match: re.Match) -> str:
+            try:
+                data = base64.b64decode("".join(match.group(2).split()))
+            except ValueError:
+                return match.group(0)
+            return self.url(self.put_bytes(data, match.group(1)))
+
+        return self.DATA_URI_RE.sub(replace, html)
+
+    def referenced_names(self, html: str) -> set[str]:
+        return set(self.BLOB_REF_RE.findall(html))
+
+    def collect_garbage(self, referenced: set[str]) -> Iterator[None]:
+        # générateur : un fichier par pas (tâche "images" de IdleScheduler), dossier lu au fil des pas
+        # (scandir) et non listé d'un coup. Seuls les noms de blob sont ramassés : un .tmp peut être
+        # une écriture en cours (autre instance, pair de synchro), il n'est retiré qu'une fois
+        # abandonné depuis une minute
+        if not self.blobs_dir.exists():
+            return
+        now = time.time()
+        with os.scandir(self.blobs_dir) as entries:
+            for entry in entries:
+                path = Path(entry.path)
+                if entry.name.endswith(".tmp"):
+                    remove_stale_temp_file(path, now)
+                elif (
+                    self.BLOB_NAME_RE.fullmatch(entry.name)
+                    and entry.name not in referenced
+                    and entry.name not in self.session_names
+                    and entry.is_file()
+                ):
+                    try:
+                        path.unlink()
+                        self.collected += 1
+                    except OSError:
+                        pass
+                    if self._cache.pop(entry.name, None) is not None:
+                        self.cache_bytes = sum(self.pixmap_bytes(p) for p in self._cache.values())
+                yield
+
+
+class CompactNoteSerializer:
+    # Format : {"v", "c": formats de caractère, "p": formats de bloc, "l": formats de liste, "b": blocs}
+    # bloc = [réf. format bloc, réf. format caractère du bloc, réf. liste (-1), texte, réf., texte, réf., ...]
+    VERSION = 1
+    VALUE_TYPES = {"QBrush": QBrush, "QColor": QColor, "QPen": QPen, "QTextLength": QTextLength}
+
+    def serialize(self, document: QTextDocument) -> str | None:
+        if document.rootFrame().childFrames():
+            return None  # tableaux / cadres : laissé à toHtml
+        tables: dict[str, list] = {"c": [], "p": [], "l": []}
+        refs: dict[str, dict[int, int]] = {"c": {}, "p": {}, "l": {}}
+        char_refs, block_refs = refs["c"], refs["p"]
+
+        def intern(kind: str, key: int, fmt: QTextFormat) -> int:
+            encoded = self.encode_format(fmt)
+            if encoded is None:
+                raise ValueError(f"unsupported format property in {fmt}")
+            index = refs[kind][key] = len(tables[kind])
+            tables[kind].append(encoded)
+            return index
+
+        # boucle la plus chaude de la sauvegarde : l'index du format (un entier) est cherché avant de
+        # construire l'objet format, qui n'est créé et encodé qu'à la première rencontre
+        blocks = []
+        try:
+            block = document.begin()
+            while block.isValid():
+                key = block.blockFormatIndex()
+                block_ref = block_refs.get(key)
+                if block_ref is None:
+                    block_ref = intern("p", key, block.blockFormat())
+                key = block.charFormatIndex()
+                char_ref = char_refs.get(key)
+                if char_ref is None:
+                    char_ref = intern("c", key, block.charFormat())
+                text_list = block.textList()
+                if text_list is None:
+                    list_ref = -1
+                else:
+                    key = text_list.objectIndex()
+                    list_ref = refs["l"].get(key)
+                    if list_ref is None:
+                        list_ref = intern("l", key, text_list.format())
+                entry = [block_ref, char_ref, list_ref]
+                for it in block:
+                    fragment = it.fragment()
+                    key = fragment.charFormatIndex()
+                    char_ref = char_refs.get(key)
+                    if char_ref is None:
+                        char_ref = intern("c", key, fragment.charFormat())
+                    entry.append(fragment.text())
+                    entry.append(char_ref)
+                blocks.append(entry)
+                block = block.next()
+        except ValueError:
+            return None
+        return json.dumps({"v": self.VERSION, **tables, "b": blocks}, ensure_ascii=False, separators=(",", ":"))
+
+    def deserialize(self, document: QTextDocument, data: str) -> bool:
+        try:
+            payload = json.loads(data)
+            if payload.get("v") != self.VERSION:
+                return False
+            char_formats = [self.decode_format(QTextCharFormat(), props) for props in payload["c"]]
+            block_formats = [self.decode_format(QTextBlockFormat(), props) for props in payload["p"]]
+            list_formats = [self.decode_format(QTextListFormat(), props) for props in payload["l"]]
+            blocks = payload["b"]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return False
+
+        document.setUndoRedoEnabled(False)
+        document.clear()
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        lists: dict[int, object] = {}
+        for i, entry in enumerate(blocks):
+            if i == 0:
+                cursor.setBlockFormat(block_formats[entry[0]])
+                cursor.setBlockCharFormat(char_formats[entry[1]])
+            else:
+                cursor.insertBlock(block_formats[entry[0]], char_formats[entry[1]])
+            if entry[2] >= 0:
+                text_list = lists.get(entry[2])
+                if text_list is None:
+                    lists[entry[2]] = cursor.createList(list_formats[entry[2]])
+                else:
+                    text_list.add(cursor.block())  # type: ignore[attr-defined]
+            for j in range(3, len(entry), 2):
+                cursor.insertText(entry[j], char_formats[entry[j + 1]])
+        cursor.endEditBlock()
+        document.setUndoRedoEnabled(True)
+        document.setModified(False)
+        return True
+
+    def block_records(self, document: QTextDocument) -> list[str] | None:
+        # un enregistrement autonome (formats inclus) par bloc, pour la synchro bloc par bloc
+        cache: dict[tuple[str, int], dict | None] = {}
+
+        def encoded(kind: str, key: int, fmt: QTextFormat) -> dict:
+            if (kind, key) not in cache:
+                cache[(kind, key)] = self.encode_format(fmt)
+            value = cache[(kind, key)]
+            if value is None:
+                raise ValueError(f"unsupported format property in {fmt}")
+            return value
+
+        records = []
+        try:
+            block = document.begin()
+            while block.isValid():
+                text_list = block.textList()
+                fragments: list = []
+                it = block.begin()
+                while not it.atEnd():
+                    fragment = it.fragment()
+                    fragments.append(fragment.text())
+                    fragments.append(encoded("c", fragment.charFormatIndex(), fragment.charFormat()))
+                    it += 1
+                record = {
+                    "p": encoded("p", block.blockFormatIndex(), block.blockFormat()),
+                    "c": encoded("c", block.charFormatIndex(), block.charFormat()),
+                    "l": encoded("l", text_list.objectIndex(), text_list.format()) if text_list is not None else None,
+                    "f": fragments,
+                }
+                records.append(json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(",", ":")))
+                block = block.next()
+        except ValueError:
+            return None
+        return records
+
+    def replace_blocks(self, cursor: QTextCursor, start: int, end: int, records: list[str]) -> None:
+        # remplace les blocs [start, end) par records, sans toucher au reste du document
+        document = cursor.document()
+        decoded = [json.loads(record) for record in records]
+        if decoded:
+            if start == 0:
+                first = document.firstBlock()
+                cursor.setPosition(0)
+                cursor.insertBlock(first.blockFormat(), first.charFormat())
+                cursor.setPosition(0)
+                self.fill_block(cursor, decoded[0])
+                rest = decoded[1:]
+            else:
+                cursor.setPosition(document.findBlockByNumber(start - 1).position())
+                cursor.movePosition(QTextCursor.EndOfBlock)
+                rest = decoded
+            for record in rest:
+                cursor.insertBlock()
+                self.fill_block(cursor, record)
+            start += len(decoded)
+            end += len(decoded)
+        if end <= start:
+            return
+        last = document.findBlockByNumber(end - 1)
+        if start > 0:
+            cursor.setPosition(document.findBlockByNumber(start - 1).position())
+            cursor.movePosition(QTextCursor.EndOfBlock)
+            cursor.setPosition(last.position() + last.length() - 1, QTextCursor.KeepAnchor)
+        else:
+            cursor.setPosition(0)
+            if last.next().isValid():
+                cursor.setPosition(last.next().position(), QTextCursor.KeepAnchor)
+            else:
+                cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+
+    def fill_block(self, cursor: QTextCursor, record: dict) -> None:
+        cursor.setBlockFormat(self.decode_format(QTextBlockFormat(), record["p"]))
+        cursor.setBlockCharFormat(self.decode_format(QTextCharFormat(), record["c"]))
+        current_list = cursor.block().textList()
+        if current_list is not None:
+            current_list.remove(cursor.block())
+        if record.get("l") is not None:
+            list_format = self.decode_format(QTextListFormat(), record["l"])
+            previous = cursor.block().previous().textList()
+            if previous is not None and previous.format() == list_format:
+                previous.add(cursor.block())
+            else:
+                cursor.createList(list_format)
+        fragments = record["f"]
+        for j in range(0, len(fragments), 2):
+            cursor.insertText(fragments[j], self.decode_format(QTextCharFormat(), fragments[j + 1]))
+
+    def encode_format(self, fmt: QTextFormat) -> dict | None:
+        encoded = {}
+        for key, value in fmt.properties().items():
+            if key == QTextFormat.ObjectIndex:
+                continue  # index interne au document (listes), reconstruit au chargement
+            if value == "" or value == []:
+                continue  # chaîne / liste vide == propriété absente (évite deux encodages du même format)
+            if isinstance(value, (bool, int, float, str)):
+                encoded[str(key)] = value
+            elif isinstance(value, list) and all(isinstance(v, str) for v in value):
+                encoded[str(key)] = value
+            elif type(value).__name__ in self.VALUE_TYPES:
+                data = QByteArray()
+                stream = QDataStream(data, QIODevice.WriteOnly)
+                stream << value
+                encoded[str(key)] = {"q": type(value).__name__, "d": base64.b64encode(bytes(data)).decode("ascii")}
+            else:
+                return None
+        return encoded
+
+    def decode_format(self, fmt: QTextFormat, props: dict) -> QTextFormat:
+        for key, value in props.items():
+            if isinstance(value, dict):
+                decoded = self.VALUE_TYPES[value["q"]]()
+                stream = QDataStream(QByteArray(base64.b64decode(value["d"])))
+                stream >> decoded
+                value = decoded
+            fmt.setProperty(int(key), value)
+        return fmt
+
+
+class StoredNote:
+    # état d'une note de notes.db : lignes telles qu'en base (texte, format, runs) et leurs positions,
+    # plus la fenêtre de blocs modifiés depuis (first = premier bloc touché, tail = blocs intacts en fin)
+    def __init__(self) -> None:
+        self.rows: list[tuple] | None = None
+        self.positions: list[int] = []
+        self.plain = False
+        self.html = False
+        self.loaded: QTextDocument | None = None
+        self.document: QTextDocument | None = None
+        self.slot: Callable | None = None
+        self.first = 0
+        self.tail = 0
+
+
+class SqliteNoteStore:
+    # Stockage optionnel notes.db (SQLite, WAL) : une ligne par bloc (texte + référence vers un
+    # format dédupliqué), toutes les notes dans la même base, réglages dans la table settings.
+    # Lisible par d'autres outils pendant que l'interface écrit :
+    #   SELECT text FROM blocks WHERE note = 'main' ORDER BY position
+    # Une sauvegarde ne réécrit que les blocs touchés depuis la précédente (suivis par contentsChange).
+    POSITION_STEP = 1024
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS notes (id TEXT PRIMARY KEY, title TEXT NOT NULL DEFAULT '', "
+        "plain INTEGER NOT NULL DEFAULT 0, html TEXT, updated REAL NOT NULL DEFAULT 0)",
+        # data = {"p": format bloc, "c": format caractère du bloc, "l": liste, "f": formats des runs}
+        "CREATE TABLE IF NOT EXISTS formats (id INTEGER PRIMARY KEY, data TEXT NOT NULL UNIQUE)",
+        # positions espacées : une insertion prend une position libre entre ses voisines
+        "CREATE TABLE IF NOT EXISTS blocks (note TEXT NOT NULL, position INTEGER NOT NULL, text TEXT NOT NULL, "
+        "format INTEGER, runs TEXT, PRIMARY KEY (note, position)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    )
+
+    def __init__(self, path: Path, serializer: CompactNoteSerializer) -> None:
+        self.path = path
+        self.serializer = serializer
+        # write_config peut être appelé depuis des threads
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # FULL : une transaction validée est sur disque, comme après atomic_write
+        self.conn.execute("PRAGMA synchronous=FULL")
+        with self.conn:
+            for statement in self.SCHEMA:
+                self.conn.execute(statement)
+        self.format_ids: dict[str, int] = {}
+        self.layouts: dict[int, tuple] = {}
+        self.reload_formats()
+        self.states: dict[str, StoredNote] = {}
+        self.last_rows_written = 0
+        self.compactions = 0
+
+    def close(self) -> None:
+        with self.lock:
+            for note_id in list(self.states):
+                self.forget(note_id)
+            self.conn.close()
+
+    def compact(self) -> None:
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        self.compactions += 1
+
+    def collect_formats(self) -> None:
+        # formats que plus aucun bloc ne cite (au chargement : aucun identifiant en cache n'est encore utilisé)
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM formats WHERE id NOT IN (SELECT format FROM blocks WHERE format IS NOT NULL)")
+            self.reload_formats()
+            self.layouts.clear()
+
+    def reload_formats(self) -> None:
+        self.format_ids = {data: format_id for format_id, data in self.conn.execute("SELECT id, data FROM formats")}
+
+    # --- réglages ---
+
+    def setting(self, key: str) -> object:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set_setting(self, key: str, value: object) -> None:
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def settings(self) -> dict[str, object]:
+        with self.lock:
+            return {key: json.loads(value) for key, value in self.conn.execute("SELECT key, value FROM settings")}
+
+    # --- notes ---
+
+    def has_note(self, note_id: str) -> bool:
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM notes WHERE id = ?", (note_id,)).fetchone() is not None
+
+    def note_size(self, note_id: str) -> int:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(CAST(text AS BLOB))) + COUNT(*) - 1, 0) FROM blocks WHERE note = ?", (note_id,)
+            ).fetchone()
+        return max(0, row[0])
+
+    def referenced_text(self) -> str:
+        # tout ce qui peut citer une image (formats des runs, notes enregistrées en HTML)
+        with self.lock:
+            parts = [data for (data,) in self.conn.execute("SELECT data FROM formats")]
+            parts += [html for (html,) in self.conn.execute("SELECT html FROM notes WHERE html IS NOT NULL")]
+        return "\n".join(parts)
+
+    def delete_note(self, note_id: str) -> None:
+        self.forget(note_id)
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM blocks WHERE note = ?", (note_id,))
+            self.conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+
+    def retain(self, note_ids: set[str]) -> None:
+        with self.lock:
+            stored = [note_id for (note_id,) in self.conn.execute("SELECT id FROM notes")]
+        for note_id in stored:
+            if note_id not in note_ids:
+                self.delete_note(note_id)
+
+    def load(self, note_id: str, document: QTextDocument, plain: bool) -> bool:
+        with self.lock:
+            note = self.conn.execute("SELECT plain, html FROM notes WHERE id = ?", (note_id,)).fetchone()
+            if note is None:
+                return False
+            records = self.conn.execute(
+                "SELECT position, text, format, runs FROM blocks WHERE note = ? ORDER BY position", (note_id,)
+            ).fetchall()
+            rows = [record[1:] for record in records]
+            if plain:
+                document.setPlainText("\n".join(row[0] for row in rows).replace("\ufffc", ""))
+            elif note[1] is not None:
+                document.setHtml(note[1])
+            else:
+                self.fill(document, rows)
+        state = self.states.get(note_id) or StoredNote()
+        self.states[note_id] = state
+        state.rows, state.positions = rows, [record[0] for record in records]
+        state.plain, state.html = bool(note[0]), note[1] is not None
+        # note enregistrée dans l'autre mode : la première sauvegarde reprend tous les blocs
+        state.loaded = document if state.plain == plain else None
+        return True
+
+    def fill(self, document: QTextDocument, rows: list[tuple]) -> None:
+        document.setUndoRedoEnabled(False)
+        document.clear()
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        text_list = None
+        for i, (text, format_id, runs) in enumerate(rows):
+            block_format, block_char_format, list_format, char_formats = self.layout(format_id)
+            if i == 0:
+                cursor.setBlockFormat(block_format)
+                cursor.setBlockCharFormat(block_char_format)
+            else:
+                cursor.insertBlock(block_format, block_char_format)
+            if list_format is None:
+                text_list = None
+            elif text_list is not None and text_list.format() == list_format:
+                text_list.add(cursor.block())
+            else:
+                text_list = cursor.createList(list_format)
+            start = 0
+            for length, char_format in zip([int(n) for n in runs.split(",")] if runs else [len(text)], char_formats):
+                cursor.insertText(text[start : start + length], char_format)
+                start += length
+        cursor.endEditBlock()
+        document.setUndoRedoEnabled(True)
+        document.setModified(False)
+
+    def layout(self, format_id: int | None) -> tuple:
+        if format_id is None:
+            return QTextBlockFormat(), QTextCharFormat(), None, [QTextCharFormat()]
+        layout = self.layouts.get(format_id)
+        if layout is None:
+            with self.lock:
+                data = json.loads(self.conn.execute("SELECT data FROM formats WHERE id = ?", (format_id,)).fetchone()[0])
+            decode = self.serializer.decode_format
+            layout = self.layouts[format_id] = (
+                decode(QTextBlockFormat(), data["p"]),
+                decode(QTextCharFormat(), data["c"]),
+                decode(QTextListFormat(), data["l"]) if data["l"] is not None else None,
+                [decode(QTextCharFormat(), props) for props in data["f"]],
+            )
+        return layout
+
+    # --- suivi des modifications ---
+
+    def track(self, note_id: str, document: QTextDocument) -> None:
+        state = self.states.get(note_id) or StoredNote()
+        self.states[note_id] = state
+        self.untrack(state)
+        state.document = document
+        count = document.blockCount()
+        # document tout juste chargé depuis la base : rien à réécrire ; sinon tous les blocs sont à comparer
+        state.first, state.tail = (count, count) if state.loaded is document else (0, 0)
+        state.loaded = None
+        state.slot = lambda position, removed, added: self.mark_dirty(state, position, added)
+        document.contentsChange.connect(state.slot)
+
+    def untrack(self, state: StoredNote) -> None:
+        if state.document is not None:
+            try:
+                state.document.contentsChange.disconnect(state.slot)
+            except (RuntimeError, TypeError):
+                pass  # document déjà détruit
+        state.document = state.slot = None
+
+    def forget(self, note_id: str) -> None:
+        state = self.states.pop(note_id, None)
+        if state is not None:
+            self.untrack(state)
+
+    @staticmethod
+    def mark_dirty(state: StoredNote, position: int, added: int) -> None:
+        document = state.document
+        count = document.blockCount()
+        first = document.findBlock(position)
+        last = document.findBlock(position + added)
+        state.first = min(state.first, first.blockNumber() if first.isValid() else count - 1)
+        state.tail = min(state.tail, count - 1 - (last.blockNumber() if last.isValid() else count - 1))
+
+    # --- sauvegarde ---
+
+    def save(self, note_id: str, document: QTextDocument, title: str, plain: bool) -> int:
+        state = self.states.get(note_id)
+        if state is None or state.document is not document:
+            self.track(note_id, document)
+            state = self.states[note_id]
+        count = document.blockCount()
+        with self.lock:
+            try:
+                with self.conn:
+                    written = self.write(note_id, state, document, count, title, plain)
+            except sqlite3.Error:
+                # formats insérés dans la transaction annulée
+                self.reload_formats()
+                self.layouts.clear()
+                raise
+        state.first = state.tail = count
+        return written
+
+    def write(self, note_id: str, state: StoredNote, document: QTextDocument, count: int, title: str, plain: bool) -> int:
+        html = None
+        rich = not plain and not document.rootFrame().childFrames()
+        first = min(state.first, count)
+        last = max(first, count - state.tail)
+        rows: list[tuple] = []
+        if rich:
+            try:
+                rows = self.block_rows(document, first, last, True)
+            except ValueError:
+                rich = False
+        if not plain and not rich:
+            # tableaux / cadres ou propriété non encodable : la note entière en HTML, les blocs en texte seul
+            html = document.toHtml()
+        if state.rows is None or plain != state.plain or (html is not None) != state.html:
+            first, last = 0, count
+            if rich:
+                rows = self.block_rows(document, first, last, True)
+        if not rich:
+            rows = self.block_rows(document, first, last, False)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO notes (id, title, plain, html, updated) VALUES (?, ?, ?, ?, ?)",
+            (note_id, title, int(plain), html, time.time()),
+        )
+        state.plain, state.html = plain, html is not None
+        if state.rows is None:
+            state.rows = []
+            state.positions = []
+            written = self.splice(note_id, state, 0, 0, rows)
+        else:
+            written = self.splice(note_id, state, first, len(state.rows) - (count - last), rows)
+        return written + len(html or "")
+
+    def splice(self, note_id: str, state: StoredNote, start: int, end: int, rows: list[tuple]) -> int:
+        # remplace les lignes [start, end) par rows : mises à jour sur place, puis insertions ou suppressions
+        old, positions = state.rows, state.positions
+        head, tail = 0, len(rows)
+        while head < tail and start < end and rows[head] == old[start]:
+            head, start = head + 1, start + 1
+        while head < tail and start < end and rows[tail - 1] == old[end - 1]:
+            tail, end = tail - 1, end - 1
+        rows = rows[head:tail]
+        shared = min(len(rows), end - start)
+        updates = [(*rows[k], note_id, positions[start + k]) for k in range(shared) if rows[k] != old[start + k]]
+        self.conn.executemany("UPDATE blocks SET text = ?, format = ?, runs = ? WHERE note = ? AND position = ?", updates)
+        removed = positions[start + shared : end]
+        self.conn.executemany("DELETE FROM blocks WHERE note = ? AND position = ?", [(note_id, p) for p in removed])
+        added = rows[shared:]
+        new_positions = self.free_positions(
+            positions[start + shared - 1] if start + shared > 0 else None,
+            positions[end] if end < len(positions) else None,
+            len(added),
+        )
+        old[start:end] = rows
+        if new_positions is None:
+            # plus de place entre les voisines : la note est renumérotée
+            positions[:] = [i * self.POSITION_STEP for i in range(len(old))]
+            self.conn.execute("DELETE FROM blocks WHERE note = ?", (note_id,))
+            self.insert_rows(note_id, old, positions)
+            self.last_rows_written = len(old)
+            return sum(len(row[0]) for row in old)
+        positions[start + shared : end] = new_positions
+        self.insert_rows(note_id, added, new_positions)
+        self.last_rows_written = len(updates) + len(removed) + len(added)
+        return sum(len(row[0]) for row in updates) + sum(len(row[0]) for row in added)
+
+    def insert_rows(self, note_id: str, rows: list[tuple], positions: list[int]) -> None:
+        self.conn.executemany(
+            "INSERT INTO blocks (note, position, text, format, runs) VALUES (?, ?, ?, ?, ?)",
+            [(note_id, position, *row) for position, row in zip(positions, rows)],
+        )
+
+    def free_positions(self, before: int | None, after: int | None, n: int) -> list[int] | None:
+        step = self.POSITION_STEP
+        if n == 0:
+            return []
+        if before is None and after is None:
+            return [i * step for i in range(n)]
+        if after is None:
+            return [before + (i + 1) * step for i in range(n)]
+        if before is None:
+            return [after - (n - i) * step for i in range(n)]
+        gap = after - before
+        if gap <= n:
+            return None
+        return [before + gap * (i + 1) // (n + 1) for i in range(n)]
+
+    def block_rows(self, document: QTextDocument, first: int, last: int, rich: bool) -> list[tuple]:
+        rows: list[tuple] = []
+        block = document.findBlockByNumber(first)
+        if not rich:
+            for _ in range(last - first):
+                rows.append((block.text(), None, None))
+                block = block.next()
+            return rows
+        encoded: dict[tuple[str, int], dict | None] = {}
+
+        def encode(kind: str, key: int, fmt: QTextFormat) -> dict:
+            if (kind, key) not in encoded:
+                encoded[(kind, key)] = self.serializer.encode_format(fmt)
+            value = encoded[(kind, key)]
+            if value is None:
+                raise ValueError(f"unsupported format property in {fmt}")
+            return value
+
+        format_ids: dict[tuple, int] = {}
+        for _ in range(last - first):
+            text_list = block.textList()
+            fragments = []
+            it = block.begin()
+            while not it.atEnd():
+                fragments.append(it.fragment())
+                it += 1
+            key = (
+                block.blockFormatIndex(),
+                block.charFormatIndex(),
+                text_list.objectIndex() if text_list is not None else -1,
+                *(fragment.charFormatIndex() for fragment in fragments),
+            )
+            format_id = format_ids.get(key)
+            if format_id is None:
+                data = {
+                    "p": encode("p", block.blockFormatIndex(), block.blockFormat()),
+                    "c": encode("c", block.charFormatIndex(), block.charFormat()),
+                    "l": encode("l", text_list.objectIndex(), text_list.format()) if text_list is not None else None,
+                    "f": [encode("c", fragment.charFormatIndex(), fragment.charFormat()) for fragment in fragments],
+                }
+                format_id = format_ids[key] = self.format_id(
+                    json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+                )
+            texts = [fragment.text() for fragment in fragments]
+            rows.append(("".join(texts), format_id, ",".join(str(len(t)) for t in texts) if len(texts) > 1 else None))
+            block = block.next()
+        return rows
+
+    def format_id(self, data: str) -> int:
+        format_id = self.format_ids.get(data)
+        if format_id is None:
+            format_id = self.format_ids[data] = self.conn.execute("INSERT INTO formats (data) VALUES (?)", (data,)).lastrowid
+        return format_id
+
+
+class NoteSync(QObject):
+    # Dossier partagé : blocks/<hash>.json (un fichier par paragraphe, écrit une seule fois)
+    # + manifest.json (liste ordonnée des hash, révision, auteur) + blobs/ (images citées par les blocs,
+    # publiées avant le bloc qui les cite). Fusion à 3 voies base/local/distant.
+    LOCK_STALE_SECONDS = 10.0
+    RETRY_MS = 1000
+
+    def __init__(
+        self,
+        document: QTextDocument,
+        serializer: CompactNoteSerializer,
+        blob_store: ImageBlobStore,
+        sync_dir: Path,
+        parent: QObject | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self.document = document
+        self.serializer = serializer
+        self.blob_store = blob_store
+        self.sync_dir = sync_dir
+        self.blocks_dir = sync_dir.joinpath("blocks")
+        self.blobs_dir = sync_dir.joinpath("blobs")
+        self.manifest_path = sync_dir.joinpath("manifest.json")
+        self.lock_path = sync_dir.joinpath("manifest.lock")
+        self.instance_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.enabled = False
+        self.known_rev = -1
+        self.base: list[str] = []
+        self.blocks_written = 0
+        self.last_push_bytes = 0
+        self.conflicts = 0
+        self.push_pending = False
+        self.suspended = False
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_pull)
+        self.watcher.fileChanged.connect(self.schedule_pull)
+        self.pull_timer = QTimer(self)
+        self.pull_timer.setSingleShot(True)
+        self.pull_timer.setInterval(150)
+        self.pull_timer.timeout.connect(self.pull)
+
+    def start(self, adopt_remote: bool) -> None:
+        self.blocks_dir.mkdir(parents=True, exist_ok=True)
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        remove_stale_temp_files(self.sync_dir)
+        remove_stale_temp_files(self.blocks_dir)
+        remove_stale_temp_files(self.blobs_dir)
+        self.enabled = True
+        self.watcher.addPath(str(self.sync_dir))
+        manifest = self.read_manifest()
+        if manifest is None:
+            self.push()
+            return
+        # au démarrage le dossier partagé fait foi ; à l'activation, la note locale
+        # est traitée comme une modification de la dernière version partagée
+        if adopt_remote:
+            snapshot = self.local_snapshot()
+            self.base = snapshot[0] if snapshot is not None else []
+        else:
+            self.base = list(manifest["blocks"])
+        self.known_rev = -1
+        self.pull()
+
+    def stop(self) -> None:
+        self.enabled = False
+        self.push_pending = False
+        self.pull_timer.stop()
+        paths = self.watcher.files() + self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
+
+    def schedule_pull(self, _path: str = "") -> None:
+        if self.enabled:
+            self.pull_timer.start()
+
+    def suspend(self) -> None:
+        # pendant un ChunkedEditJob le document n'est modifié que par lui : fusions reportées
+        self.suspended = True
+
+    def resume(self) -> None:
+        self.suspended = False
+        self.schedule_pull()
+
+    def read_manifest(self) -> dict | None:
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(manifest.get("blocks"), list):
+            return None
+        return manifest
+
+    def read_record(self, digest: str) -> str | None:
+        try:
+            return self.blocks_dir.joinpath(f"{digest}.json").read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def local_snapshot(self) -> tuple[list[str], dict[str, str]] | None:
+        records = self.serializer.block_records(self.document)
+        if records is None:
+            return None
+        by_hash = {hashlib.sha256(r.encode("utf-8")).hexdigest()[:32]: r for r in records}
+        return [hashlib.sha256(r.encode("utf-8")).hexdigest()[:32] for r in records], by_hash
+
+    def publish_blobs(self, record: str) -> None:
+        # images citées par un bloc : copiées dans le dossier partagé avant le bloc lui-même
+        for name in self.blob_store.referenced_names(record):
+            target = self.blobs_dir.joinpath(name)
+            if target.exists():
+                continue
+            try:
+                data = self.blob_store.blobs_dir.joinpath(name).read_bytes()
+            except OSError:
+                continue  # image déjà absente localement : rien à publier
+            atomic_write(target, data)
+
+    def fetch_blobs(self, record: str) -> bool:
+        # -> False si une image citée par un bloc distant n'est pas encore arrivée (ou incomplète)
+        for name in self.blob_store.referenced_names(record):
+            if self.blob_store.blobs_dir.joinpath(name).exists():
+                self.blob_store.session_names.add(name)
+                continue
+            try:
+                data = self.blobs_dir.joinpath(name).read_bytes()
+            except OSError:
+                return False
+            if self.blob_store.put_bytes(data, PurePath(name).suffix[1:]) != name:
+                return False
+        return True
+
+    def acquire_lock(self) -> bool:
+        # une seule tentative (appelé depuis le thread de l'interface) : si le verrou est pris,
+        # push() reprogramme pull_timer, qui retente plus tard
+        for _attempt in range(2):
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, self.instance_id.encode("utf-8"))
+                os.close(fd)
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - self.lock_path.stat().st_mtime <= self.LOCK_STALE_SECONDS:
+                        return False
+                    self.lock_path.unlink(missing_ok=True)  # verrou abandonné : une seconde tentative
+                except OSError:
+                    pass
+        return False
+
+    def push(self) -> bool:
+        # verrou occupé ou blocs distants pas encore arrivés : la poussée est retentée par pull()
+        self.push_pending = True
+        if not self.acquire_lock():
+            self.pull_timer.start(self.RETRY_MS)
+            return False
+        try:
+            manifest = self.read_manifest()
+            if manifest is not None and manifest.get("rev") != self.known_rev:
+                if self.suspended or not self.merge(manifest):
+                    self.pull_timer.start(self.RETRY_MS)
+                    return False
+            self.push_pending = False
+            snapshot = self.local_snapshot()
+            if snapshot is None:
+                return False  # tableaux / cadres : pas de synchro bloc par bloc
+            hashes, records = snapshot
+            self.last_push_bytes = 0
+            if manifest is not None and hashes == manifest["blocks"]:
+                self.base = hashes
+                return True
+            for digest, record in records.items():
+                path = self.blocks_dir.joinpath(f"{digest}.json")
+                if not path.exists():
+                    self.publish_blobs(record)
+                    data = record.encode("utf-8")
+                    atomic_write(path, data)
+                    self.blocks_written += 1
+                    self.last_push_bytes += len(data)
+            rev = (manifest or {}).get("rev", 0) + 1
+            data = json.dumps({"rev": rev, "writer": self.instance_id, "blocks": hashes}).encode("utf-8")
+            atomic_write(self.manifest_path, data)
+            self.last_push_bytes += len(data)
+            self.known_rev = rev
+            self.base = hashes
+            return True
+        finally:
+            self.lock_path.unlink(missing_ok=True)
+
+    def pull(self) -> None:
+        if not self.enabled:
+            return
+        if self.suspended:
+            self.pull_timer.start(self.RETRY_MS)  # reprise aussi par resume() à la fin du travail
+            return
+        manifest = self.read_manifest()
+        if manifest is not None and manifest.get("rev") != self.known_rev:
+            if not self.merge(manifest):
+                self.pull_timer.start(self.RETRY_MS)  # blocs pas encore arrivés : on réessaie
+                return
+        elif not self.push_pending:
+            return
+        snapshot = self.local_snapshot()
+        if snapshot is not None and (manifest is None or snapshot[0] != manifest["blocks"]):
+            self.push()
+        else:
+            self.push_pending = False
+
+    def merge(self, manifest: dict) -> bool:
+        remote: list[str] = manifest["blocks"]
+        snapshot = self.local_snapshot()
+        if snapshot is None:
+            return False
+        local, _ = snapshot
+        remote_records: dict[str, str] = {}
+        for digest in set(remote) - set(local):
+            record = self.read_record(digest)
+            if record is None or not self.fetch_blobs(record):
+                return False
+            remote_records[digest] = record
+
+        edits = self.plan_merge(self.base, local, remote)
+        cursor = QTextCursor(self.document)
+        cursor.beginEditBlock()
+        for start, end, digests in sorted(edits, key=lambda e: e[0], reverse=True):
+            records = [remote_records.get(d) or self.read_record(d) or "" for d in digests]
+            self.serializer.replace_blocks(cursor, start, end, [r for r in records if r])
+        cursor.endEditBlock()
+        self.base = list(remote)
+        self.known_rev = manifest.get("rev", 0)
+        return True
+
+    def plan_merge(self, base: list[str], local: list[str], remote: list[str]) -> list[tuple[int, int, list[str]]]:
+        # -> remplacements à appliquer au document local : (début, fin, nouveaux hash), en indices locaux
+        local_ops = SequenceMatcher(None, base, local, autojunk=False).get_opcodes()
+        local_changes = [(i1, i2, j1, j2) for tag, i1, i2, j1, j2 in local_ops if tag != "equal"]
+
+        def to_local(i: int, first: bool) -> int | None:
+            # une frontière bordée par une insertion locale a deux positions : avant ou après les blocs insérés
+            positions = [j1 + (i - i1) for tag, i1, i2, j1, _j2 in local_ops if tag == "equal" and i1 <= i <= i2]
+            if not positions:
+                return None
+            return max(positions) if first else min(positions)
+
+        edits = []
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, base, remote, autojunk=False).get_opcodes():
+            if tag == "equal":
+                continue
+            # même modification des deux côtés : rien à faire
+            if any(c[:2] == (i1, i2) and local[c[2] : c[3]] == remote[j1:j2] for c in local_changes):
+                continue
+            # conflit si les plages se recouvrent vraiment (des blocs voisins ne font que se toucher),
+            # ou si les deux côtés insèrent au même endroit
+            clash = next(
+                (c for c in local_changes if (i1 < c[1] and c[0] < i2) or (i1 == i2 == c[0] == c[1])),
+                None,
+            )
+            start = to_local(i1, True)
+            end = start if i1 == i2 else to_local(i2, False)
+            if clash is None and start is not None and end is not None:
+                edits.append((start, end, remote[j1:j2]))
+                continue
+            # conflit : la version locale gagne, la version distante est conservée juste après
+            self.conflicts += 1
+            kept = [d for d in remote[j1:j2] if d not in local]
+            if kept:
+                anchor = clash[3] if clash is not None else len(local)
+                edits.append((anchor, anchor, kept))
+        return edits
+
+
+class FencedCodeHighlighter(QSyntaxHighlighter):
+    # État par bloc : hors bloc ```, dedans, ou dedans mais pas encore tokenisé (DEFERRED).
+    # Seuls les blocs modifiés (et ceux dont l'état change en cascade) sont re-colorés ; les formats
+    # sont posés en surcouche de mise en page, le document (dégradés, polices par run) n'est pas modifié.
+    OUTSIDE = 0
+    INSIDE = 1
+    DEFERRED = 2
+    PASS_BUDGET_MS = 8.0
+    RELAYOUT_MS_PER_FOLLOWING_BLOCK = 0.001
+    RELAYOUT_MS_PER_BLOCK = 0.03
+    FENCE_RE = re.compile(r"^\s*(```|~~~)")
+    TOKEN_RE = re.compile(
+        r"(?P<comment>(?:#|//|--).*$)"
+        r"|(?P<string>\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*')"
+        r"|(?P<number>\b\d+(?:\.\d+)?\b)"
+        r"|(?P<keyword>\b(?:def|class|return|if|elif|else|for|while|in|import|from|as|try|except|finally|with|"
+        r"lambda|yield|async|await|None|True|False|function|const|let|var|new|null|true|false|this|self|"
+        r"public|private|static|void|int|struct|fn|match|SELECT|FROM|WHERE)\b)"
+        r"|(?P<level>\b(?:ERROR|FATAL|CRITICAL|WARN|WARNING|INFO|DEBUG|TRACE)\b)"
+    )
+
+    def __init__(self, document: QTextDocument, request_drain: Callable[[], None]) -> None:
+        super().__init__(document)
+        # la tokenisation différée passe par l'ordonnanceur de la fenêtre (IdleScheduler)
+        self.request_drain = request_drain
+        self.formats = {
+            "fence": self.color_format("#8e908c"),
+            "comment": self.color_format("#8e908c", italic=True),
+            "string": self.color_format("#718c00"),
+            "number": self.color_format("#f5871f"),
+            "keyword": self.color_format("#8959a8", bold=True),
+            "level": self.color_format("#c82829", bold=True),
+        }
+        # premiers blocs de chaque suite de blocs DEFERRED
+        self.pending: deque = deque()
+        self.deferred_blocks = 0
+        self.relayout_samples: deque = deque(maxlen=4)
+        self.relayout_max_ms = 0.0
+        self._pass_start = 0.0
+        # se déclenche au prochain tour de boucle : délimite un "passage" de re-coloration
+        self._pass_timer = QTimer(self)
+        self._pass_timer.setSingleShot(True)
+        self._pass_timer.setInterval(0)
+
+    @staticmethod
+    def color_format(color: str, bold: bool = False, italic: bool = False) -> QTextCharFormat:
+        fmt = QTextCharFormat()
+        fmt.setForeground(QColor(color))
+        if bold:
+            fmt.setFontWeight(QFont.Bold)
+        if italic:
+            fmt.setFontItalic(True)
+        return fmt
+
+    def highlightBlock(self, text: str) -> None:  # type: ignore[override]
+        previous = self.previousBlockState()
+        inside = previous in (self.INSIDE, self.DEFERRED)
+        if self.FENCE_RE.match(text):
+            self.setFormat(0, len(text), self.formats["fence"])
+            self.setCurrentBlockState(self.OUTSIDE if inside else self.INSIDE)
+            return
+        if not inside or not text.strip():
+            self.setCurrentBlockState(self.INSIDE if inside else self.OUTSIDE)
+            return
+        if self.pass_over_budget():
+            # gros collage : l'état est propagé tout de suite, la tokenisation attend l'inactivité
+            if previous != self.DEFERRED:
+                self.pending.append(self.currentBlock())
+                self.request_drain()
+            self.setCurrentBlockState(self.DEFERRED)
+            self.deferred_blocks += 1
+            return
+        self.setCurrentBlockState(self.INSIDE)
+        for start, length, fmt in self.tokens(text):
+            self.setFormat(start, length, fmt)
+
+    def tokens(self, text: str) -> list[tuple[int, int, QTextCharFormat]]:
+        return [
+            (m.start(), m.end() - m.start(), self.formats[m.lastgroup])
+            for m in self.TOKEN_RE.finditer(text)
+            if m.lastgroup is not None
+        ]
+
+    def pass_over_budget(self) -> bool:
+        now = time.perf_counter()
+        if not self._pass_timer.isActive():
+            self._pass_start = now
+            self._pass_timer.start()
+        return (now - self._pass_start) * 1000 > self.PASS_BUDGET_MS
+
+    def relayout_estimate_ms(self, after: int, count: int) -> float:
+        # markContentsDirty coûte ~ k * blocs déjà mis en page qui suivent (repositionnement, comme une
+        # frappe à cet endroit) + p * blocs re-mis en page. k grandit tant que la mise en page paresseuse
+        # de Qt avance : on garde le plus fort des dernières tranches plutôt qu'un ajustement moyen
+        p = self.RELAYOUT_MS_PER_BLOCK
+        k = max(
+            (max(0.0, t - p * n) / a for a, n, t in self.relayout_samples if a),
+            default=self.RELAYOUT_MS_PER_FOLLOWING_BLOCK,
+        )
+        return k * after + p * count
+
+    def drain_pending(self, deadline: float) -> bool:
+        # Formats posés directement sur les QTextLayout puis un seul markContentsDirty pour la
+        # tranche : rehighlightBlock() bloc par bloc relancerait la mise en page à chaque appel.
+        # Cette remise en page synchrone est estimée d'après les tranches précédentes : avant chaque
+        # bloc, on s'arrête de tokeniser quand elle ne tiendrait plus avant l'échéance.
+        budget = deadline - time.perf_counter()
+        progressed = False
+        while self.pending:
+            block = first = self.pending.popleft()
+            after = self.document().blockCount() - first.blockNumber()
+            limit = deadline
+            fixed = self.relayout_estimate_ms(after, 0) / 1000
+            if not progressed:
+                # au moins un quart de tranche de travail utile ; si la part fixe dépasse déjà la
+                # tranche, le dépassement est inévitable : une tranche entière en plus, pour en faire moins
+                limit = max(deadline, time.perf_counter() + fixed + (budget if fixed > budget else budget / 4))
+            count = end = 0
+            while block.isValid() and block.userState() == self.DEFERRED:
+                if (count or progressed) and time.perf_counter() + self.relayout_estimate_ms(after, count + 1) / 1000 >= limit:
+                    self.pending.appendleft(block)
+                    break
+                ranges = []
+                for start, length, fmt in self.tokens(block.text()):
+                    rng = QTextLayout.FormatRange()
+                    rng.start, rng.length, rng.format = start, length, fmt
+                    ranges.append(rng)
+                block.layout().setFormats(ranges)
+                block.setUserState(self.INSIDE)
+                end = block.position() + block.length()
+                count += 1
+                block = block.next()
+            if count:
+                start = time.perf_counter()
+                self.document().markContentsDirty(first.position(), end - first.position())
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.relayout_samples.append((after, count, elapsed_ms))
+                self.relayout_max_ms = max(self.relayout_max_ms, elapsed_ms)
+                progressed = True
+            if self.pending and self.pending[0] == block:
+                break
+        return bool(self.pending)
+
+
+class NoteDocument(QTextDocument):
+    # documents des onglets, enfants de la fenêtre : QTextDocument ne délègue les images qu'à un
+    # parent éditeur, les blobs sont donc résolus ici
+    def __init__(self, blob_store: ImageBlobStore, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self.blob_store = blob_store
+        # créé à la première peinture d'un bloc en dégradé (NoteEditor.paint_gradient_blocks)
+        self.gradient_cache: GradientBlockCache | None = None
+
+    def loadResource(self, type: int, name: QUrl):  # type: ignore[override]
+        if type == QTextDocument.ImageResource and name.scheme() == ImageBlobStore.SCHEME:
+            return self.blob_store.pixmap(name.path())
+        return super().loadResource(type, name)
+
+
+class NoteTab:
+    # Un onglet = une note dans son dossier (la note principale : le dossier de données, les autres :
+    # tabs/<id>/). document est None quand l'onglet est évincé : seuls ses fichiers restent.
+    MAIN_ID = "main"
+    # estimation de la mémoire d'un document chargé (texte UTF-16, mise en page, index par bloc),
+    # calibrée sur le RSS par le benchmark tabs
+    BYTES_PER_CHAR = 12
+    BYTES_PER_BLOCK = 600
+
+    def __init__(self, tab_id: str, folder: Path, plain: bool) -> None:
+        self.id = tab_id
+        self.folder = folder
+        self.plain = plain
+        self.compact_path = folder.joinpath("notes.json")
+        self.html_path = folder.joinpath("notes.html")
+        self.text_path = folder.joinpath("notes.txt")
+        self.title = ""
+        self.document: QTextDocument | None = None
+        self.highlighter: FencedCodeHighlighter | None = None
+        self.stats: NoteStatistics | None = None
+        self.outline: NoteOutline | None = None
+        self.cursor_position = 0
+        self.scroll_value = 0
+        self.loads = 0
+        self.last_load_ms = 0.0
+
+    @property
+    def is_main(self) -> bool:
+        return self.id == self.MAIN_ID
+
+    def estimated_bytes(self) -> int:
+        if self.document is None:
+            return 0
+        return self.document.characterCount() * self.BYTES_PER_CHAR + self.document.blockCount() * self.BYTES_PER_BLOCK
+
+    def to_config(self) -> dict:
+        return {"id": self.id, "plain": self.plain, "title": self.title}
+
+
+class GradientBlockCache:
+    # Rendu des blocs dont le texte porte un dégradé (pinceaux QLinearGradient en ObjectMode
+    # d'apply_color_scheme) : un pixmap par bloc visible, aligné sur les blocs par un BlockIndex.
+    # Un bloc modifié (texte ou format) perd le sien ; largeur, palette ou police par défaut
+    # vident tout ; les blocs éloignés de la zone visible sont relâchés.
+    MARGIN_BLOCKS = 40
+
+    def __init__(self, document: QTextDocument) -> None:
+        self.document = document
+        self.entries: list[tuple[QPixmap, int, float] | None] = []
+        self.live: set[int] = set()
+        self.key: tuple | None = None
+        self.hits = 0
+        self.renders = 0
+        self.block_index = BlockIndex(document, self.has_gradient)
+        self.block_index.subscribe(self.on_splice)
+
+    @staticmethod
+    def has_gradient(block: QTextBlock) -> bool:
+        it = block.begin()
+        while not it.atEnd():
+            if it.fragment().charFormat().foreground().gradient() is not None:
+                return True
+            it += 1
+        return False
+
+    def on_splice(self, first: int, old: list, new: list) -> None:
+        end = first + len(old)
+        shift = len(new) - len(old)
+        self.entries[first:end] = [None] * len(new)
+        self.live = {number if number < first else number + shift for number in self.live if not first <= number < end}
+
+    def is_gradient(self, number: int) -> bool:
+        return self.block_index.values[number]
+
+    def validate(self, key: tuple) -> None:
+        if key != self.key:
+            self.key = key
+            self.clear()
+
+    def clear(self) -> None:
+        for number in self.live:
+            self.entries[number] = None
+        self.live.clear()
+
+    def pixmap(self, block: QTextBlock, area: QRectF, width: int, palette: QPalette, ratio: float) -> QPixmap:
+        # pixmap de la largeur de la vue, calé sur la ligne de pixels entière au-dessus du bloc
+        number = block.blockNumber()
+        top = math.floor(area.top())
+        height = math.ceil(area.bottom()) - top
+        offset = round(area.top() - top, 3)
+        entry = self.entries[number]
+        if entry is not None and entry[1] == height and entry[2] == offset:
+            self.hits += 1
+            return entry[0]
+        pixmap = QPixmap(round(width * ratio), round(height * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.translate(0, -top)
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette = palette
+        context.clip = area
+        self.document.documentLayout().draw(painter, context)
+        painter.end()
+        self.entries[number] = (pixmap, height, offset)
+        self.live.add(number)
+        self.renders += 1
+        return pixmap
+
+    def retain(self, first: int, last: int) -> None:
+        for number in [n for n in self.live if not first - self.MARGIN_BLOCKS <= n <= last + self.MARGIN_BLOCKS]:
+            self.entries[number] = None
+            self.live.discard(number)
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(self.entries[n][0].width() * self.entries[n][0].height() * 4 for n in self.live)
+
+
+class NoteEditor(QTextEdit):
+    # au-delà, le collage passe par ChunkedPaste (texte brut par tranches) au lieu de bloquer l'interface
+    LARGE_PASTE_CHARS = 1_000_000
+
+    def __init__(self, blob_store: ImageBlobStore, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.setObjectName("NoteEditor")
+        self.blob_store = blob_store
+        # appelé avec True/False autour des insertions longues (la fenêtre y suspend l'autosave)
+        self.bulk_edit_hook: Callable[[bool], None] | None = None
+        self.bulk_job: ChunkedEditJob | None = None
+        self.paint_times_ms: deque[float] = deque(maxlen=120)
+        self.frame_intervals_ms: deque[float] = deque(maxlen=120)
+        self._last_paint = 0.0
+        self.gradient_cache_enabled = True
+
+    def paintEvent(self, event) -> None:  # type: ignore[override]
+        start = time.perf_counter()
+        if not (self.gradient_cache_enabled and self.paint_gradient_blocks(event.rect())):
+            super().paintEvent(event)
+        end = time.perf_counter()
+        self.paint_times_ms.append((end - start) * 1000)
+        if self._last_paint:
+            self.frame_intervals_ms.append((start - self._last_paint) * 1000)
+        self._last_paint = start
+
+    def paint_gradient_blocks(self, rect: QRect) -> bool:
+        # -> False : aucun bloc à reprendre du cache, peinture habituelle de QTextEdit. Sinon les
+        # bandes entre blocs en cache sont peintes par QTextEdit (curseur, sélection compris) et
+        # les blocs en dégradé posés depuis leur pixmap
+        doc = self.document()
+        if not isinstance(doc, NoteDocument) or self.horizontalScrollBar().value():
+            return False
+        layout = doc.documentLayout()
+        scroll = self.verticalScrollBar().value()
+        block = doc.findBlock(max(0, layout.hitTest(QPointF(0, rect.top() + scroll), Qt.FuzzyHit)))
+        visible = []
+        while block.isValid():
+            area = layout.blockBoundingRect(block)
+            if area.top() - scroll > rect.bottom():
+                break
+            visible.append((block, area))
+            block = block.next()
+        if not visible:
+            return False
+        cache = doc.gradient_cache
+        if cache is None:
+            if not any(GradientBlockCache.has_gradient(block) for block, _area in visible):
+                return False
+            cache = doc.gradient_cache = GradientBlockCache(doc)
+        cursor = self.textCursor()
+        selections = [c for c in (cursor, *(s.cursor for s in self.extraSelections())) if c.hasSelection()]
+        root = doc.rootFrame()
+        cached = []
+        for block, area in visible:
+            start, end = block.position(), block.position() + block.length()
+            if (
+                cache.is_gradient(block.blockNumber())
+                and area.height() >= 1
+                and block.blockNumber() != cursor.blockNumber()
+                # coloration des blocs de code : formats de mise en page, hors contentsChange
+                and not block.layout().formats()
+                and QTextCursor(block).currentFrame() == root
+                and not any(c.selectionStart() < end and c.selectionEnd() > start for c in selections)
+            ):
+                cached.append((block, area))
+        if not cached:
+            return False
+        viewport = self.viewport()
+        ratio = viewport.devicePixelRatioF()
+        cache.validate((viewport.width(), ratio, self.palette().cacheKey(), doc.defaultFont().key()))
+        pixmaps = []
+        top = rect.top()
+        for block, area in cached:
+            y = math.floor(area.top()) - scroll
+            if y > top:
+                super().paintEvent(QPaintEvent(QRect(rect.left(), top, rect.width(), y - top)))
+            pixmaps.append((y, cache.pixmap(block, area, viewport.width(), self.palette(), ratio)))
+            top = max(top, math.ceil(area.bottom()) - scroll)
+        if top <= rect.bottom():
+            super().paintEvent(QPaintEvent(QRect(rect.left(), top, rect.width(), rect.bottom() - top + 1)))
+        painter = QPainter(viewport)
+        painter.setClipRect(rect)
+        for y, pixmap in pixmaps:
+            painter.drawPixmap(0, y, pixmap)
+        painter.end()
+        cache.retain(visible[0][0].blockNumber(), visible[-1][0].blockNumber())
+        return True
+
+    def canInsertFromMimeData(self, source) -> bool:  # type: ignore[override]
+        return source.hasImage() or super().canInsertFromMimeData(source)
+
+    def insertFromMimeData(self, source) -> None:  # type: ignore[override]
+        if self.bulk_job is not None:
+            return
+        if source.hasText() and self.paste_large(source):
+            return
+        if source.hasHtml() and "data:image/" in source.html():
+            self.textCursor().insertHtml(self.blob_store.externalize_data_uris(source.html()))
+            return
+        if source.hasImage() and not source.hasHtml():
+            image = QImage(source.imageData())
+            if not image.isNull():
+                fmt = QTextImageFormat()
+                fmt.setName(self.blob_store.url(self.blob_store.put_image(image)))
+                fmt.setWidth(image.width())
+                fmt.setHeight(image.height())
+                self.textCursor().insertImage(fmt)
+                return
+        super().insertFromMimeData(source)
+
+    def paste_large(self, source) -> bool:
+        # -> True si le collage est pris en charge ici (ou annulé)
+        html_size = len(source.html()) if source.hasHtml() else 0
+        text = source.text()
+        if max(len(text), html_size) < self.LARGE_PASTE_CHARS:
+            return False
+        if html_size:
+            choice = self.ask_large_paste_mode(max(len(text), html_size))
+            if choice is None:
+                return True
+            if choice == "rich":
+                return False
+        self.bulk_job = ChunkedPaste(self, text)
+        self.bulk_job.start()
+        return True
+
+    def ask_large_paste_mode(self, size: int) -> str | None:
+        box = QMessageBox(self.window())
+        box.setWindowTitle("Coller")
+        box.setIcon(QMessageBox.Question)
+        box.setText(f"Le presse-papiers contient environ {size / (1024 * 1024):.1f} Mo.")
+        box.setInformativeText("Le texte brut est collé par morceaux sans bloquer la note ; la mise en forme impose une analyse HTML complète.")
+        plain = box.addButton("Texte brut (rapide)", QMessageBox.AcceptRole)
+        rich = box.addButton("Avec la mise en forme", QMessageBox.ActionRole)
+        box.addButton(QMessageBox.Cancel)
+        box.setDefaultButton(plain)
+        box.exec()
+        clicked = box.clickedButton()
+        box.deleteLater()
+        if clicked is plain:
+            return "plain"
+        if clicked is rich:
+            return "rich"
+        return None
+
+    def loadResource(self, type: int, name: QUrl):  # type: ignore[override]
+        if type == QTextDocument.ImageResource and name.scheme() == ImageBlobStore.SCHEME:
+            return self.blob_store.pixmap(name.path())
+        return super().loadResource(type, name)
+
+
+class PlainNoteEditor(QPlainTextEdit):
+    # Mode texte brut : QPlainTextDocumentLayout ne met en page que des lignes de texte, sans
+    # cadres ni tailles de police par fragment, et reste fluide sur des notes de plusieurs Mo.
+    # Police et couleur viennent de la vue (setFont / palette), pas de formats par caractère.
+    LARGE_PASTE_CHARS = NoteEditor.LARGE_PASTE_CHARS
+
+    def __init__(self, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.setObjectName("NoteEditor")
+        self.bulk_edit_hook: Callable[[bool], None] | None = None
+        self.bulk_job: ChunkedEditJob | None = None
+        self.paint_times_ms: deque[float] = deque(maxlen=120)
+        self.frame_intervals_ms: deque[float] = deque(maxlen=120)
+        self._last_paint = 0.0
+
+    def paintEvent(self, event) -> None:  # type: ignore[override]
+        start = time.perf_counter()
+        super().paintEvent(event)
+        end = time.perf_counter()
+        self.paint_times_ms.append((end - start) * 1000)
+        if self._last_paint:
+            self.frame_intervals_ms.append((start - self._last_paint) * 1000)
+        self._last_paint = start
+
+    def insertFromMimeData(self, source) -> None:  # type: ignore[override]
+        if self.bulk_job is not None:
+            return
+        if source.hasText() and len(source.text()) >= self.LARGE_PASTE_CHARS:
+            self.bulk_job = ChunkedPaste(self, source.text())
+            self.bulk_job.start()
+            return
+        super().insertFromMimeData(source)
+
+
+class ChunkedEditJob(QObject):
+    # Modification de toute la note par tranches depuis la boucle d'événements : progression annulable,
+    # éditeur en lecture seule et sauvegarde auto suspendue (bulk_edit_hook) jusqu'à la fin. Tout le
+    # travail forme un seul groupe d'annulation (edit_block), qu'une annulation retire d'un coup.
+    # La taille des tranches est ajustée pour que chaque pas reste sous TARGET_STEP_MS ; les sous-classes
+    # n'implémentent que step_chunk().
+    TARGET_STEP_MS = 40.0
+    MIN_CHUNK = 1
+    MAX_CHUNK = 1_000_000
+    # True : un bloc d'édition reste ouvert du début à la fin (Qt ne remet en page qu'à la fermeture)
+    HOLD_EDIT_BLOCK = False
+
+    def __init__(self, editor: NoteEditor | PlainNoteEditor, title: str, label: str, chunk: int) -> None:
+        super().__init__(editor)
+        self.editor = editor
+        self.chunk = chunk
+        self.cursor = QTextCursor(editor.document())
+        self.started = False
+        self.stepping = False
+        self.done = False
+        self.step_times_ms: list[float] = []
+        self.progress = QProgressDialog(label, "Annuler", 0, 1000, editor.window())
+        self.progress.setWindowTitle(title)
+        self.progress.setWindowModality(Qt.WindowModal)
+        self.progress.setMinimumDuration(300)
+        self.progress.setAutoClose(False)
+        self.progress.setAutoReset(False)
+        self.progress.canceled.connect(self.cancel)
+        self.timer = QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.step)
+
+    def step_chunk(self) -> tuple[int, float]:
+        # -> (unités traitées, part du travail faite entre 0 et 1) ; au plus self.chunk unités
+        raise NotImplementedError
+
+    def edit_block(self) -> None:
+        # ouvre le groupe d'annulation au premier appel, le rejoint ensuite (à refermer par endEditBlock)
+        if self.started:
+            self.cursor.joinPreviousEditBlock()
+        else:
+            self.cursor.beginEditBlock()
+            self.started = True
+
+    def start(self) -> None:
+        self.editor.setReadOnly(True)
+        if self.editor.bulk_edit_hook is not None:
+            self.editor.bulk_edit_hook(True)
+        if self.HOLD_EDIT_BLOCK:
+            self.edit_block()
+        self.timer.start()
+
+    def step(self) -> None:
+        # un dialogue modal traite les événements dans setValue : pas de tranche imbriquée
+        if self.stepping or self.done:
+            return
+        self.stepping = True
+        start = time.perf_counter()
+        count, fraction = self.step_chunk()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        rate = count / max(elapsed_ms, 1.0)
+        self.chunk = int(min(self.MAX_CHUNK, max(self.MIN_CHUNK, rate * self.TARGET_STEP_MS)))
+        self.step_times_ms.append(elapsed_ms)
+        self.progress.setValue(int(fraction * 1000))
+        self.stepping = False
+        if fraction >= 1.0:
+            self.finish(completed=True)
+
+    def cancel(self) -> None:
+        if self.done:
+            return
+        self.finish(completed=False)
+
+    def finish(self, completed: bool) -> None:
+        self.done = True
+        self.timer.stop()
+        if self.HOLD_EDIT_BLOCK:
+            self.cursor.endEditBlock()
+        if not completed and self.started:
+            # tout le travail partiel forme un seul groupe : une annulation le retire
+            self.editor.document().undo()
+        self.progress.canceled.disconnect(self.cancel)
+        self.progress.close()
+        self.editor.setReadOnly(False)
+        if self.editor.bulk_edit_hook is not None:
+            self.editor.bulk_edit_hook(False)
+        self.editor.bulk_job = None
+        self.progress.deleteLater()
+        self.deleteLater()
+
+
+class ChunkedPaste(ChunkedEditJob):
+    # Gros collage en texte brut, inséré par tranches de caractères (coupées en fin de ligne) à la
+    # position du curseur.
+    MIN_CHUNK = 8 * 1024
+    MAX_CHUNK = 1024 * 1024
+
+    def __init__(self, editor: NoteEditor | PlainNoteEditor, text: str) -> None:
+        super().__init__(editor, "Coller", "Collage en cours…", 64 * 1024)
+        self.text = text.replace("\r\n", "\n").replace("\r", "\n")
+        self.offset = 0
+        self.cursor = editor.textCursor()
+
+    def step_chunk(self) -> tuple[int, float]:
+        end = min(len(self.text), self.offset + self.chunk)
+        if end < len(self.text):
+            newline = self.text.find("\n", end, end + 4096)
+            if newline != -1:
+                end = newline + 1
+        self.edit_block()
+        self.cursor.insertText(self.text[self.offset : end])
+        self.cursor.endEditBlock()
+        count = end - self.offset
+        self.offset = end
+        return count, self.offset / len(self.text) if self.text else 1.0
+
+    def finish(self, completed: bool) -> None:
+        super().finish(completed)
+        if completed:
+            self.editor.setTextCursor(self.cursor)
+            self.editor.ensureCursorVisible()
+
+
+class BatchFormat(ChunkedEditJob):
+    # Mise en forme de toute la note par tranches de paragraphes. Le bloc d'édition reste ouvert du
+    # début à la fin : Qt ne remet en page (et ne signale contentsChange au surlignage, aux statistiques
+    # et au plan) qu'une fois, à la fermeture.
+    # replace=True remplace les formats au lieu de les fusionner (effacer la mise en forme) ; les images
+    # gardent leur format.
+    MIN_CHUNK = 64
+    MAX_CHUNK = 50_000
+    HOLD_EDIT_BLOCK = True
+
+    def __init__(self, editor: NoteEditor, label: str, fmt: QTextCharFormat, replace: bool = False) -> None:
+        super().__init__(editor, "Mise en forme", f"{label}…", 1024)
+        self.fmt = fmt
+        self.replace = replace
+        self.document = editor.document()
+        self.block = self.document.begin()
+        self.blocks_done = 0
+
+    def step_chunk(self) -> tuple[int, float]:
+        first = self.block
+        last = first
+        count = 0
+        while self.block.isValid() and count < self.chunk:
+            last = self.block
+            self.block = self.block.next()
+            count += 1
+        if self.replace:
+            self.replace_range(first, last)
+        else:
+            self.cursor.setPosition(first.position())
+            self.cursor.setPosition(last.position() + last.length() - 1, QTextCursor.KeepAnchor)
+            self.cursor.mergeCharFormat(self.fmt)
+        self.blocks_done += count
+        if not self.block.isValid():
+            return count, 1.0
+        return count, min(0.999, self.blocks_done / max(1, self.document.blockCount()))
+
+    def replace_range(self, first: QTextBlock, last: QTextBlock) -> None:
+        # formats remplacés par plages contiguës de texte ; une image interrompt la plage
+        run_start = first.position()
+        block = first
+        while True:
+            # seuls les paragraphes contenant un caractère objet peuvent porter une image
+            if "\ufffc" in block.text():
+                fragments = block.begin()
+                while not fragments.atEnd():
+                    fragment = fragments.fragment()
+                    if fragment.isValid() and fragment.charFormat().isImageFormat():
+                        self.set_run(run_start, fragment.position())
+                        run_start = fragment.position() + fragment.length()
+                    fragments += 1
+            if block == last:
+                break
+            block = block.next()
+        # le séparateur de paragraphe porte le format du paragraphe suivant (lignes vides comprises)
+        self.set_run(run_start, min(last.position() + last.length(), self.document.characterCount() - 1))
+        self.cursor.setPosition(first.position())
+        self.cursor.setPosition(last.position(), QTextCursor.KeepAnchor)
+        self.cursor.setBlockFormat(QTextBlockFormat())
+
+    def set_run(self, start: int, end: int) -> None:
+        if end > start:
+            self.cursor.setPosition(start)
+            self.cursor.setPosition(end, QTextCursor.KeepAnchor)
+            self.cursor.setCharFormat(self.fmt)
+
+
+class ChunkedReplace(ChunkedEditJob):
+    # "Tout remplacer" : remplacements (début, fin, texte) calculés par NoteSearch, appliqués de la fin
+    # vers le début (les positions déjà calculées restent justes). Chaque remplacement rejoint le groupe
+    # d'annulation mais referme aussitôt son bloc d'édition : contentsChange ne couvre que le paragraphe
+    # touché, alors qu'un bloc resté ouvert signalerait tout l'intervalle entre la première et la
+    # dernière occurrence (surlignage, statistiques et plan recalculés sur toute la note).
+    MIN_CHUNK = 16
+    MAX_CHUNK = 200_000
+
+    def __init__(self, editor: NoteEditor | PlainNoteEditor, edits: list[tuple[int, int, str]]) -> None:
+        super().__init__(editor, "Remplacer", f"Remplacement de {len(edits)} occurrences…", 256)
+        self.edits = edits
+        self.remaining = len(edits)
+
+    def step_chunk(self) -> tuple[int, float]:
+        stop = max(0, self.remaining - self.chunk)
+        cursor = self.cursor
+        for index in range(self.remaining - 1, stop - 1, -1):
+            begin, end, text = self.edits[index]
+            self.edit_block()
+            cursor.setPosition(begin)
+            cursor.setPosition(end, QTextCursor.KeepAnchor)
+            cursor.insertText(text)
+            cursor.endEditBlock()
+        count = self.remaining - stop
+        self.remaining = stop
+        return count, 1.0 - self.remaining / max(1, len(self.edits))
+
+
+class PerfHudOverlay(QWidget):
+    MARGIN = 6
+    REFRESH_MS = 500
+
+    def __init__(self, parent: QWidget, collect_stats) -> None:
+        super().__init__(parent)
+        self.collect_stats = collect_stats
+        self.lines: list[str] = []
+        self.setAttribute(Qt.WA_TransparentForMouseEvents, True)
+        font = QFont("monospace")
+        font.setStyleHint(QFont.Monospace)
+        font.setPointSize(8)
+        self.setFont(font)
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def start(self) -> None:
+        self.refresh()
+        self.show()
+        self.raise_()
+        self.timer.start()
+
+    def stop(self) -> None:
+        self.timer.stop()
+        self.hide()
+
+    def refresh(self) -> None:
+        self.lines = self.collect_stats()
+        self.place()
+        self.update()
+
+    def place(self) -> None:
+        # seulement le coin supérieur droit : repeindre tout l'éditeur fausserait les mesures
+        metrics = self.fontMetrics()
+        width = max((metrics.horizontalAdvance(line) for line in self.lines), default=0) + 2 * self.MARGIN
+        height = metrics.height() * len(self.lines) + 2 * self.MARGIN
+        parent = self.parentWidget().rect()
+        self.setGeometry(parent.right() - width - self.MARGIN, parent.top() + self.MARGIN, width, height)
+
+    def paintEvent(self, event) -> None:  # type: ignore[override]
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(20, 20, 20, 190))
+        painter.drawRoundedRect(self.rect(), 6, 6)
+        painter.setPen(QColor(120, 255, 140))
+        metrics = self.fontMetrics()
+        y = self.MARGIN + metrics.ascent()
+        for line in self.lines:
+            painter.drawText(self.MARGIN, y, line)
+            y += metrics.height()
+
+
+def process_rss_bytes() -> int:
+    if sys.platform.startswith("linux"):
+        try:
+            pages = int(Path("/proc/self/statm").read_text().split()[1])
+            return pages * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return 0
+    if sys.platform.startswith("win"):
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+        return 0
+    try:
+        import resource
+
+        # macOS : pic de RSS (en octets), faute d'API simple pour la valeur courante
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (ImportError, OSError):
+        return 0
+
+
+def live_qobject_counts() -> dict[str, int]:
+    # objets Qt vivants par classe : l'application et les fenêtres sans parent, avec tous leurs
+    # descendants (les dialogues parentés à la note sont comptés sous elle)
+    app = QApplication.instance()
+    counts: dict[str, int] = {}
+    if app is None:
+        return counts
+    roots = [app, *(widget for widget in QApplication.topLevelWidgets() if widget.parent() is None)]
+    for root in roots:
+        for obj in (root, *root.findChildren(QObject)):
+            name = obj.metaObject().className()
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+# rapport mémoire : profondeur des piles tracemalloc (la classe ou fonction de ce fichier la plus
+# proche de l'allocation donne le sous-système) et coût approximatif d'une mise en page Qt
+MEMORY_TRACE_FRAMES = 12
+LAYOUT_BYTES_PER_LINE = 96
+LAYOUT_BYTES_PER_CHAR = 24
+source_spans: list[tuple[int, int, str]] | None = None
+
+
+def source_subsystems() -> list[tuple[int, int, str]]:
+    global source_spans
+    if source_spans is None:
+        try:
+            tree = ast.parse(Path(__file__).read_text(encoding="utf-8"))
+        except (OSError, SyntaxError):
+            # exécutable figé : pas de source, tout est compté sous "<module>"
+            tree = ast.Module(body=[], type_ignores=[])
+        source_spans = sorted(
+            (node.lineno, node.end_lineno or node.lineno, node.name)
+            for node in tree.body
+            if isinstance(node, (ast.ClassDef, ast.FunctionDef))
+        )
+    return source_spans
+
+
+def python_allocations(top: int = 40) -> dict:
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+    snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+    spans = source_subsystems()
+    starts = [start for start, _end, _name in spans]
+    own_file = os.path.abspath(__file__)
+    groups: dict[str, int] = {}
+    for trace in snapshot.traces:
+        name = None
+        # piles de la plus ancienne à la plus récente : on remonte depuis l'allocation
+        for frame in reversed(trace.traceback):
+            if os.path.abspath(frame.filename) == own_file:
+                index = bisect_right(starts, frame.lineno) - 1
+                name = spans[index][2] if index >= 0 and frame.lineno <= spans[index][1] else "<module>"
+                break
+        if name is None:
+            parts = PurePath(trace.traceback[-1].filename).parts
+            name = parts[parts.index("site-packages") + 1] if "site-packages" in parts[:-1] else PurePath(parts[-1]).stem
+            name = f"lib:{name}"
+        groups[name] = groups.get(name, 0) + trace.size
+    ranked = sorted(groups.items(), key=lambda item: item[1], reverse=True)
+    by_subsystem = dict(ranked[:top])
+    if len(ranked) > top:
+        by_subsystem["autres"] = sum(size for _name, size in ranked[top:])
+    current, peak = tracemalloc.get_traced_memory()
+    return {"tracing": True, "traced_bytes": current, "peak_bytes": peak, "by_subsystem": by_subsystem}
+
+
+def document_memory(doc: QTextDocument) -> dict:
+    # seuls les blocs déjà mis en page ont des lignes : la mise en page est paresseuse
+    laid_out = lines = chars = 0
+    block = doc.begin()
+    while block.isValid():
+        count = block.layout().lineCount()
+        if count:
+            laid_out += 1
+            lines += count
+            chars += block.length()
+        block = block.next()
+    return {
+        "characters": doc.characterCount(),
+        "blocks": doc.blockCount(),
+        "undo_steps": doc.availableUndoSteps(),
+        "laid_out_blocks": laid_out,
+        "layout_lines": lines,
+        "layout_bytes_estimate": lines * LAYOUT_BYTES_PER_LINE + chars * LAYOUT_BYTES_PER_CHAR,
+    }
+
+
+def icon_bytes(icon: QIcon) -> int:
+    return sum(size.width() * size.height() * 4 for size in icon.availableSizes())
+
+
+def flatten_numbers(report: dict, prefix: str = "") -> dict[str, float]:
+    values: dict[str, float] = {}
+    for key, value in report.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten_numbers(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def diff_memory_reports(before: dict, after: dict) -> dict:
+    # chaque valeur numérique du rapport, par chemin ("python.by_subsystem.NoteTab") ; les plus
+    # fortes variations d'abord, une clé absente d'un côté vaut 0
+    old, new = flatten_numbers(before), flatten_numbers(after)
+    changes = {}
+    for key in old.keys() | new.keys():
+        delta = new.get(key, 0) - old.get(key, 0)
+        if delta and key not in ("epoch", "uptime_s", "pid"):
+            changes[key] = {"before": old.get(key, 0), "after": new.get(key, 0), "delta": round(delta, 3)}
+    return {
+        "from": before.get("time"),
+        "to": after.get("time"),
+        "hours": round((after.get("epoch", 0) - before.get("epoch", 0)) / 3600, 2),
+        "changes": dict(sorted(changes.items(), key=lambda item: abs(item[1]["delta"]), reverse=True)),
+    }
+
+
+def load_memory_report(path: Path) -> dict:
+    # un fichier du tray contient {"report": ..., "diff": ...} ; --memory-report écrit le rapport seul
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return data.get("report", data)
+
+
+class BlockIndex:
+    # Une valeur par bloc (compute), tenue à jour depuis contentsChange : seuls les blocs touchés
+    # sont recalculés puis raccordés dans la liste ; chaque abonné reçoit (premier bloc, anciennes
+    # valeurs, nouvelles valeurs) et met ses propres agrégats à jour sans relire le document.
+    def __init__(self, document: QTextDocument, compute: Callable[[QTextBlock], object]) -> None:
+        self.document = document
+        self.compute = compute
+        self.values: list = []
+        self.listeners: list[Callable[[int, list, list], None]] = []
+        self.rebuilds = 0
+        self.last_update_ms = 0.0
+        document.contentsChange.connect(self.on_contents_change)
+        self.rebuild()
+
+    def subscribe(self, listener: Callable[[int, list, list], None]) -> None:
+        self.listeners.append(listener)
+        listener(0, [], list(self.values))
+
+    def rebuild(self) -> None:
+        old = self.values
+        values = []
+        block = self.document.begin()
+        while block.isValid():
+            values.append(self.compute(block))
+            block = block.next()
+        self.values = values
+        self.rebuilds += 1
+        for listener in self.listeners:
+            listener(0, old, values)
+
+    def on_contents_change(self, position: int, removed: int, added: int) -> None:
+        start = time.perf_counter()
+        self.splice(position, added)
+        self.last_update_ms = (time.perf_counter() - start) * 1000
+
+    def splice(self, position: int, added: int) -> None:
+        doc = self.document
+        first_block = doc.findBlock(position)
+        last_block = doc.findBlock(position + added)
+        if not last_block.isValid():
+            last_block = doc.lastBlock()
+        first = first_block.blockNumber()
+        new_span = last_block.blockNumber() - first + 1
+        old_span = new_span - (doc.blockCount() - len(self.values))
+        if not first_block.isValid() or old_span < 1 or first + old_span > len(self.values):
+            self.rebuild()
+            return
+        fresh = []
+        block = first_block
+        for _ in range(new_span):
+            fresh.append(self.compute(block))
+            block = block.next()
+        old = self.values[first : first + old_span]
+        self.values[first : first + old_span] = fresh
+        for listener in self.listeners:
+            listener(first, old, fresh)
+
+
+class NoteStatistics:
+    # Totaux mots / caractères / lignes à partir des comptes par bloc d'un BlockIndex
+    def __init__(self, document: QTextDocument) -> None:
+        self.words = 0
+        self.chars = 0
+        self.line_breaks = 0
+        self.block_index = BlockIndex(document, self.count_block)
+        self.block_index.subscribe(self.on_splice)
+
+    @staticmethod
+    def count_block(block: QTextBlock) -> tuple[int, int, int]:
+        text = block.text().replace("\ufffc", "")
+        return len(text.split()), len(text), text.count("\u2028")
+
+    def on_splice(self, first: int, old: list, new: list) -> None:
+        for words, chars, breaks in old:
+            self.words -= words
+            self.chars -= chars
+            self.line_breaks -= breaks
+        for words, chars, breaks in new:
+            self.words += words
+            self.chars += chars
+            self.line_breaks += breaks
+
+    @property
+    def lines(self) -> int:
+        return len(self.block_index.values) + self.line_breaks
+
+    @property
+    def characters(self) -> int:
+        # même convention que la commande stats : les fins de ligne comptent
+        return self.chars + len(self.block_index.values) - 1
+
+    @property
+    def reading_minutes(self) -> float:
+        return self.words / READING_WORDS_PER_MINUTE
+
+
+class NoteOutline(QAbstractListModel):
+    # Titres de la note : lignes courtes en grande taille (niveau 1) ou entièrement en gras (niveau 2).
+    # Un BlockIndex ne réévalue que les blocs modifiés ; la liste triée des numéros de blocs titres
+    # est raccordée autour d'eux et le modèle émet des insertions/suppressions de lignes ciblées.
+    MAX_TITLE_CHARS = 200
+    LARGE_RATIO = 1.25
+
+    def __init__(self, document: QTextDocument, base_size: int, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self.base_size = base_size
+        # numéros de blocs titres (triés) et (niveau, libellé) correspondants
+        self.headings: list[int] = []
+        self.titles: list[tuple[int, str]] = []
+        self.block_index = BlockIndex(document, self.heading_of)
+        self.block_index.subscribe(self.on_splice)
+
+    def heading_of(self, block: QTextBlock) -> tuple[int, str] | None:
+        text = block.text().replace("\ufffc", "").strip()
+        if not text or len(text) > self.MAX_TITLE_CHARS:
+            return None
+        bold = True
+        largest = 0.0
+        it = block.begin()
+        while not it.atEnd():
+            fragment = it.fragment()
+            if fragment.text().strip():
+                fmt = fragment.charFormat()
+                bold = bold and fmt.fontWeight() >= QFont.DemiBold
+                largest = max(largest, fmt.fontPointSize())
+            it += 1
+        if largest >= self.base_size * self.LARGE_RATIO:
+            return 1, text
+        if bold:
+            return 2, text
+        return None
+
+    def set_base_size(self, size: int) -> None:
+        if size != self.base_size:
+            self.base_size = size
+            self.block_index.rebuild()
+
+    def on_splice(self, first: int, old: list, new: list) -> None:
+        lo = bisect_left(self.headings, first)
+        hi = bisect_left(self.headings, first + len(old))
+        fresh = [first + i for i, value in enumerate(new) if value is not None]
+        titles = [value for value in new if value is not None]
+        delta = len(new) - len(old)
+        if hi - lo == len(fresh):
+            # même nombre de titres dans la zone : décalage éventuel + rafraîchissement des libellés
+            self.headings[lo:hi] = fresh
+            self.titles[lo:hi] = titles
+            if delta:
+                self.shift(lo + len(fresh), delta)
+            if fresh:
+                self.dataChanged.emit(self.index_of(lo), self.index_of(lo + len(fresh) - 1))
+            return
+        if hi > lo:
+            self.beginRemoveRows(QModelIndex(), lo, hi - 1)
+            del self.headings[lo:hi]
+            del self.titles[lo:hi]
+            self.shift(lo, delta)
+            self.endRemoveRows()
+        elif delta:
+            self.shift(lo, delta)
+        if fresh:
+            self.beginInsertRows(QModelIndex(), lo, lo + len(fresh) - 1)
+            self.headings[lo:lo] = fresh
+            self.titles[lo:lo] = titles
+            self.endInsertRows()
+
+    def shift(self, start: int, delta: int) -> None:
+        headings = self.headings
+        for i in range(start, len(headings)):
+            headings[i] += delta
+
+    def index_of(self, row: int) -> QModelIndex:
+        return self.createIndex(row, 0)
+
+    def row_for_block(self, block_number: int) -> int:
+        # titre de la section contenant le bloc (-1 avant le premier titre)
+        return bisect_right(self.headings, block_number) - 1
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # type: ignore[override]
+        return 0 if parent.isValid() else len(self.headings)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):  # type: ignore[override]
+        if not index.isValid() or index.row() >= len(self.headings):
+            return None
+        level, title = self.titles[index.row()]
+        if role == Qt.DisplayRole:
+            return title if level == 1 else f"    {title}"
+        if role == Qt.ToolTipRole:
+            return title
+        if role == Qt.FontRole and level == 1:
+            font = QFont()
+            font.setBold(True)
+            return font
+        if role == Qt.UserRole:
+            return self.headings[index.row()]
+        return None
+
+
+class StartupLoader:
+    # Lectures disque du démarrage (configs, notes, polices embarquées), faites en série par la fenêtre
+    # là où elle en a besoin, et chronométrage des phases de main() pour --startup-report. (Un pool de
+    # threads lancé avant QApplication n'apportait rien : ces lectures ne font que ~10 ms à froid.)
+    CONFIG_FILES = (
+        "layout.json",
+        "font.json",
+        "color.json",
+        "opacity.json",
+        "theme.json",
+        "autostart.json",
+        "custom_style.json",
+        "sync.json",
+        "font_index.json",
+        "editor_mode.json",
+        "tabs.json",
+    )
+    NOTE_FILES = ("notes.json", "notes.html", "notes.txt")
+
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        self.phases: dict[str, tuple[float, float]] = {}
+
+    def now_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000
+
+    @contextmanager
+    def phase(self, name: str):
+        start = self.now_ms()
+        try:
+            yield
+        finally:
+            self.phases[name] = (start, self.now_ms())
+
+    @staticmethod
+    def read_json(path: Path) -> object:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def read_notes(data_dir: Path) -> dict[str, str]:
+        # même priorité que load_notes : notes.txt n'est lu qu'en l'absence de format riche
+        texts: dict[str, str] = {}
+        for name in StartupLoader.NOTE_FILES:
+            if name == "notes.txt" and texts:
+                continue
+            try:
+                texts[name] = data_dir.joinpath(name).read_text(encoding="utf-8")
+            except OSError:
+                pass
+        return texts
+
+    @staticmethod
+    def read_fonts(fonts_dir: Path) -> list[tuple[str, bytes]]:
+        return [(str(path), path.read_bytes()) for path in sorted(fonts_dir.rglob("*.ttf"))]
+
+    def report(self) -> dict:
+        main_ms = sum(end - start for start, end in self.phases.values())
+        return {
+            "wall_ms": round(self.now_ms(), 1),
+            "main_thread_ms": round(main_ms, 1),
+            "phases": {name: [round(start, 1), round(end, 1)] for name, (start, end) in self.phases.items()},
+        }
+
+
+def sfnt_family_name(table: bytes) -> str | None:
+    # table "name" : famille (nameID 1), de préférence Windows/anglais, sinon Unicode puis Mac
+    count, string_offset = struct.unpack(">HH", table[2:6])
+    best: tuple[int, str] | None = None
+    for i in range(count):
+        platform, encoding, language, name_id, length, offset = struct.unpack(">6H", table[6 + 12 * i : 18 + 12 * i])
+        if name_id != 1:
+            continue
+        raw = table[string_offset + offset : string_offset + offset + length]
+        if platform == 3:
+            rank, text = (0 if language == 0x409 else 1), raw.decode("utf-16-be", "replace")
+        elif platform == 0:
+            rank, text = 2, raw.decode("utf-16-be", "replace")
+        elif platform == 1 and encoding == 0:
+            rank, text = 3, raw.decode("mac_roman", "replace")
+        else:
+            continue
+        if text.strip() and (best is None or rank < best[0]):
+            best = (rank, text.strip())
+    return best[1] if best else None
+
+
+def read_font_families(path: str) -> list[str]:
+    # ne lit que l'en-tête et la table "name" (les polices CJK font plusieurs dizaines de Mo)
+    families: list[str] = []
+    try:
+        with open(path, "rb") as fh:
+            head = fh.read(12)
+            offsets = [0]
+            if head[:4] == b"ttcf":
+                count = struct.unpack(">I", head[8:12])[0]
+                offsets = list(struct.unpack(f">{count}I", fh.read(4 * count)))
+            for base in offsets:
+                fh.seek(base + 4)
+                num_tables = struct.unpack(">H", fh.read(2))[0]
+                fh.seek(base + 12)
+                directory = fh.read(16 * num_tables)
+                for i in range(num_tables):
+                    tag, _, offset, length = struct.unpack(">4sIII", directory[16 * i : 16 * i + 16])
+                    if tag == b"name":
+                        fh.seek(offset)
+                        name = sfnt_family_name(fh.read(length))
+                        if name and name not in families:
+                            families.append(name)
+                        break
+    except (OSError, struct.error, ValueError):
+        pass
+    return families
+
+
+class FontIndex(QObject):
+    # Polices des dossiers utilisateur : font_index.json garde taille, date et familles de chaque
+    # fichier ; le scan tourne dans un thread et ne relit que les fichiers nouveaux ou modifiés.
+    # Les fichiers ne sont chargés dans Qt (addApplicationFont) qu'au premier affichage ou choix.
+    SUFFIXES = (".ttf", ".otf", ".ttc")
+    updated = Signal()
+    _scanned = Signal(object)
+
+    def __init__(self, index_path: Path, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self.index_path = index_path
+        self.files: dict[str, dict] = {}
+        self.families: dict[str, str] = {}
+        self.loaded: dict[str, list[str]] = {}
+        self.scanning = False
+        self.pending_dirs: list[Path] | None = None
+        self.files_parsed = 0
+        self.last_scan_ms = 0.0
+        self._scanned.connect(self.apply_scan)
+
+    def load(self, payload: object) -> None:
+        files = payload.get("files") if isinstance(payload, dict) and payload.get("v") == 1 else None
+        self.set_files(files if isinstance(files, dict) else {})
+
+    def set_files(self, files: dict[str, dict]) -> None:
+        self.files = files
+        families: dict[str, str] = {}
+        for path in sorted(files):
+            for family in files[path]["families"]:
+                families.setdefault(family, path)
+        self.families = families
+
+    def scan(self, dirs: list[Path]) -> None:
+        if self.scanning:
+            self.pending_dirs = list(dirs)
+            return
+        self.scanning = True
+        known = dict(self.files)
+        threading.Thread(target=lambda: self._scanned.emit(self.scan_files(dirs, known)), daemon=True).start()
+
+    def scan_files(self, dirs: list[Path], known: dict[str, dict]) -> tuple[dict[str, dict], int, float]:
+        start = time.perf_counter()
+        files: dict[str, dict] = {}
+        parsed = 0
+        for root in dirs:
+            for dirpath, _, names in os.walk(root):
+                for name in names:
+                    if not name.lower().endswith(self.SUFFIXES):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entry = known.get(path)
+                    if entry is None or entry["size"] != st.st_size or entry["mtime"] != st.st_mtime_ns:
+                        entry = {"size": st.st_size, "mtime": st.st_mtime_ns, "families": read_font_families(path)}
+                        parsed += 1
+                    files[path] = entry
+        if files != known:
+            atomic_write(self.index_path, json.dumps({"v": 1, "files": files}).encode("utf-8"))
+        return files, parsed, (time.perf_counter() - start) * 1000
+
+    def apply_scan(self, result: tuple[dict[str, dict], int, float]) -> None:
+        files, self.files_parsed, self.last_scan_ms = result
+        self.set_files(files)
+        self.scanning = False
+        if self.pending_dirs is not None:
+            dirs, self.pending_dirs = self.pending_dirs, None
+            self.scan(dirs)
+        self.updated.emit()
+
+    def ensure_loaded(self, family: str) -> str | None:
+        # -> nom de famille tel que Qt le connaît (peut différer de la table name)
+        path = self.families.get(family)
+        if path is None:
+            return None
+        if path not in self.loaded:
+            fid = QFontDatabase.addApplicationFont(path)
+            self.loaded[path] = QFontDatabase.applicationFontFamilies(fid) if fid != -1 else []
+        qt_families = self.loaded[path]
+        if not qt_families:
+            return None
+        return family if family in qt_families else qt_families[0]
+
+
+class FontPreviewDelegate(QStyledItemDelegate):
+    # Chaque nom est dessiné dans sa police ; les rendus sont gardés dans un LRU et le chargement
+    # des fichiers est limité par passe de peinture pour que le défilement reste fluide.
+    CACHE_SIZE = 256
+    LOAD_BUDGET_MS = 12
+
+    def __init__(self, resolve: Callable[[str], str], parent: QWidget) -> None:
+        super().__init__(parent)
+        self.resolve = resolve
+        self.cache: OrderedDict[tuple, QPixmap] = OrderedDict()
+        self.spent_ms = 0.0
+        self.budget_timer = QTimer(self)
+        self.budget_timer.setSingleShot(True)
+        self.budget_timer.setInterval(0)
+        self.budget_timer.timeout.connect(self.reset_budget)
+        self.hits = 0
+        self.misses = 0
+
+    def reset_budget(self) -> None:
+        over = self.spent_ms >= self.LOAD_BUDGET_MS
+        self.spent_ms = 0.0
+        if over:
+            self.parent().viewport().update()
+
+    def sizeHint(self, option, index) -> QSize:  # type: ignore[override]
+        return QSize(200, 28)
+
+    def paint(self, painter: QPainter, option, index) -> None:  # type: ignore[override]
+        family = index.data()
+        selected = bool(option.state & QStyle.State_Selected)
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter, option.widget)
+        key = (family, option.rect.width(), option.rect.height(), selected)
+        pixmap = self.cache.get(key)
+        if pixmap is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+        elif self.spent_ms >= self.LOAD_BUDGET_MS:
+            # budget épuisé : nom en police système, vrai rendu à la passe suivante
+            painter.drawText(option.rect.adjusted(8, 0, -8, 0), Qt.AlignVCenter | Qt.AlignLeft, family)
+            return
+        else:
+            start = time.perf_counter()
+            pixmap = self.render(family, option, selected)
+            self.spent_ms += (time.perf_counter() - start) * 1000
+            self.budget_timer.start()
+            self.misses += 1
+            self.cache[key] = pixmap
+            if len(self.cache) > self.CACHE_SIZE:
+                self.cache.popitem(last=False)
+        painter.drawPixmap(option.rect.topLeft(), pixmap)
+
+    def render(self, family: str, option, selected: bool) -> QPixmap:
+        ratio = option.widget.devicePixelRatioF() if option.widget else 1.0
+        pixmap = QPixmap(option.rect.size() * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        font = QFont(self.resolve(family))
+        font.setPixelSize(16)
+        painter.setFont(font)
+        role = QPalette.HighlightedText if selected else QPalette.Text
+        painter.setPen(option.palette.color(role))
+        rect = QRect(8, 0, option.rect.width() - 16, option.rect.height())
+        painter.drawText(rect, Qt.AlignVCenter | Qt.AlignLeft, painter.fontMetrics().elidedText(family, Qt.ElideRight, rect.width()))
+        painter.end()
+        return pixmap
+
+
+class FontPickerDialog(QDialog):
+    def __init__(self, window: StickyNoteWindow) -> None:
+        super().__init__(window)
+        self.note_window = window
+        self.setWindowTitle("Polices")
+        self.resize(360, 460)
+
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Rechercher une police…")
+        self.search.setClearButtonEnabled(True)
+        self.model = QStringListModel(self)
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.view = QListView()
+        self.view.setModel(self.proxy)
+        # hauteur de ligne fixe : la vue ne mesure que les lignes visibles, même avec des milliers de polices
+        self.view.setUniformItemSizes(True)
+        self.view.setEditTriggers(QListView.NoEditTriggers)
+        self.delegate = FontPreviewDelegate(window.resolve_font_family, self.view)
+        self.view.setItemDelegate(self.delegate)
+        self.status = QLabel()
+        add_dir = QPushButton("Ajouter un dossier…")
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+
+        self.search.textChanged.connect(self.apply_filter)
+        self.search.returnPressed.connect(self.accept)
+        self.view.activated.connect(lambda _: self.accept())
+        add_dir.clicked.connect(self.add_directory)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        window.font_index.updated.connect(self.refresh)
+
+        bottom = QHBoxLayout()
+        bottom.addWidget(add_dir)
+        bottom.addStretch(1)
+        bottom.addWidget(buttons)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.search)
+        layout.addWidget(self.view, 1)
+        layout.addWidget(self.status)
+        layout.addLayout(bottom)
+        self.refresh()
+
+    def refresh(self) -> None:
+        window = self.note_window
+        selected = self.view.currentIndex().data()
+        names = set(window.font_families) | set(window.font_index.families)
+        self.model.setStringList(["Défaut", *sorted(names, key=str.casefold)])
+        self.apply_filter(self.search.text(), selected)
+        count = len(names)
+        if window.font_index.scanning:
+            self.status.setText(f"{count} polices — analyse des dossiers…")
+        else:
+            self.status.setText(f"{count} polices")
+
+    def apply_filter(self, text: str, selected: str | None = None) -> None:
+        self.proxy.setFilterFixedString(text.strip())
+        if selected is None and not text.strip():
+            selected = self.note_window.current_font_name
+        rows = self.model.stringList()
+        row = rows.index(selected) if selected in rows else -1
+        if row >= 0 and not self.proxy.mapFromSource(self.model.index(row, 0)).isValid():
+            row = -1
+        index = self.proxy.mapFromSource(self.model.index(row, 0)) if row >= 0 else self.proxy.index(0, 0)
+        self.view.setCurrentIndex(index)
+        self.view.scrollTo(index, QListView.PositionAtCenter)
+
+    def add_directory(self) -> None:
+        path = QFileDialog.getExistingDirectory(self, "Dossier de polices")
+        if path:
+            self.note_window.add_font_directory(Path(path))
+            self.refresh()
+
+    def open_picker(self) -> None:
+        self.search.clear()
+        self.refresh()
+        self.search.setFocus()
+        if self.exec() == QDialog.Accepted:
+            index = self.view.currentIndex()
+            if index.isValid():
+                family = index.data()
+                self.note_window.select_font(None if family == "Défaut" else family)
+
+
+class SizeDialog(QDialog):
+    # Taille du texte (aperçu en direct) et alignement du paragraphe ; construit une fois par fenêtre
+    def __init__(self, window: StickyNoteWindow) -> None:
+        super().__init__(window)
+        self.note_window = window
+        self.setWindowTitle("Taille et alignement")
+        self.html_before: str | None = None
+        self.cursor_before: QTextCursor | None = None
+        self.dirty_before = False
+        self.label = QLabel()
+        self.slider = QSlider(Qt.Horizontal)
+        self.slider.setMinimum(8)
+        self.slider.setMaximum(48)
+        self.slider.valueChanged.connect(self.preview)
+
+        align_row = QHBoxLayout()
+        self.align_label = QLabel("Alignement :")
+        align_row.addWidget(self.align_label)
+        self.align_buttons: list[tuple[QPushButton, Qt.AlignmentFlag]] = []
+        for text, alignment in (("G", Qt.AlignLeft), ("C", Qt.AlignHCenter), ("D", Qt.AlignRight), ("J", Qt.AlignJustify)):
+            button = QPushButton(text)
+            button.setCheckable(True)
+            button.setFixedWidth(28)
+            button.clicked.connect(lambda _checked, a=alignment: self.set_alignment(a))
+            align_row.addWidget(button)
+            self.align_buttons.append((button, alignment))
+        align_row.addStretch(1)
+        self.whole_note = QCheckBox("Appliquer à toute la note")
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.label)
+        layout.addWidget(self.slider)
+        layout.addLayout(align_row)
+        layout.addWidget(self.whole_note)
+        layout.addWidget(buttons)
+
+    def open_dialog(self) -> None:
+        window = self.note_window
+        editor = window.editor
+        # l'instantané HTML (coûteux sur une grosse note) n'est pris qu'au premier changement d'alignement
+        self.html_before = None
+        self.cursor_before = editor.textCursor()
+        self.dirty_before = window.autosave.is_dirty()
+        self.slider.blockSignals(True)
+        self.slider.setValue(window.current_font_size)
+        self.slider.blockSignals(False)
+        self.label.setText(f"Taille : {window.current_font_size}")
+        current_align = editor.textCursor().blockFormat().alignment()
+        if current_align & Qt.AlignJustify:
+            current = Qt.AlignJustify
+        elif current_align & Qt.AlignRight:
+            current = Qt.AlignRight
+        elif current_align & Qt.AlignHCenter:
+            current = Qt.AlignHCenter
+        else:
+            current = Qt.AlignLeft
+        for button, alignment in self.align_buttons:
+            button.setChecked(alignment == current)
+            # texte brut : pas d'alignement par paragraphe
+            button.setVisible(not window.plain_mode)
+        self.align_label.setVisible(not window.plain_mode)
+        self.whole_note.setChecked(False)
+        self.whole_note.setVisible(not window.plain_mode)
+
+        if self.exec() == QDialog.Accepted:
+            size = self.slider.value()
+            window.apply_font_size(size, commit=True)
+            if self.whole_note.isChecked():
+                window.apply_size_to_note(size)
+        else:
+            if self.html_before is not None:
+                editor.setHtml(self.html_before)
+                # setHtml remet le document à "non modifié" : ne pas perdre un changement pas encore sauvé
+                editor.document().setModified(self.dirty_before)
+                editor.setTextCursor(self.cursor_before)
+            window.apply_current_font()
+            window.preview_font_size(window.current_font_size)
+        self.html_before = None
+        self.cursor_before = None
+
+    def preview(self, size: int) -> None:
+        self.label.setText(f"Taille : {size}")
+        self.note_window.preview_font_size(size)
+
+    def set_alignment(self, alignment: Qt.AlignmentFlag) -> None:
+        if self.html_before is None:
+            self.html_before = self.note_window.editor.toHtml()
+        for button, value in self.align_buttons:
+            button.setChecked(value == alignment)
+        self.note_window.apply_alignment(alignment)
+
+
+class ResizeDialog(QDialog):
+    # Largeur / hauteur de la note en % de la taille de base, appliquées en direct
+    def __init__(self, window: StickyNoteWindow) -> None:
+        super().__init__(window)
+        self.note_window = window
+        self.setWindowTitle("Redimensionner la note")
+        self.size_before = QSize()
+        self.label_w = QLabel()
+        self.slider_w = QSlider(Qt.Horizontal)
+        self.label_h = QLabel()
+        self.slider_h = QSlider(Qt.Horizontal)
+        for slider in (self.slider_w, self.slider_h):
+            slider.setMinimum(60)
+            slider.setMaximum(200)
+            slider.valueChanged.connect(self.preview)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.label_w)
+        layout.addWidget(self.slider_w)
+        layout.addWidget(self.label_h)
+        layout.addWidget(self.slider_h)
+        layout.addWidget(buttons)
+
+    def open_dialog(self) -> None:
+        window = self.note_window
+        base = window.base_size
+        self.size_before = window.size()
+        for slider, value, base_value in (
+            (self.slider_w, self.size_before.width(), base.width()),
+            (self.slider_h, self.size_before.height(), base.height()),
+        ):
+            slider.blockSignals(True)
+            slider.setValue(max(60, min(200, int(value / base_value * 100))))
+            slider.blockSignals(False)
+        self.update_labels()
+        if self.exec() != QDialog.Accepted:
+            window.resize(self.size_before)
+
+    def preview(self) -> None:
+        base = self.note_window.base_size
+        self.note_window.resize(int(base.width() * self.slider_w.value() / 100), int(base.height() * self.slider_h.value() / 100))
+        self.update_labels()
+
+    def update_labels(self) -> None:
+        self.label_w.setText(f"Largeur : {self.slider_w.value()}%")
+        self.label_h.setText(f"Hauteur : {self.slider_h.value()}%")
+
+
+class OpacityDialog(QDialog):
+    # Opacité de la fenêtre, appliquée en direct et enregistrée à la validation
+    def __init__(self, window: StickyNoteWindow) -> None:
+        super().__init__(window)
+        self.note_window = window
+        self.setWindowTitle("Opacité de la note")
+        self.previous = 1.0
+        self.label = QLabel()
+        self.slider = QSlider(Qt.Horizontal)
+        self.slider.setMinimum(30)
+        self.slider.setMaximum(100)
+        self.slider.valueChanged.connect(self.preview)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.label)
+        layout.addWidget(self.slider)
+        layout.addWidget(buttons)
+
+    def open_dialog(self) -> None:
+        window = self.note_window
+        self.previous = window.opacity_value
+        self.slider.blockSignals(True)
+        self.slider.setValue(int(self.previous * 100))
+        self.slider.blockSignals(False)
+        self.label.setText(f"Opacité : {int(self.previous * 100)}%")
+        if self.exec() == QDialog.Accepted:
+            window.save_opacity_config()
+        else:
+            window.opacity_value = self.previous
+            window.setWindowOpacity(window.opacity_value)
+
+    def preview(self, value: int) -> None:
+        self.note_window.opacity_value = value / 100.0
+        self.note_window.setWindowOpacity(self.note_window.opacity_value)
+        self.label.setText(f"Opacité : {value}%")
+
+
+class NoteSearch(QObject):
+    # Recherche (expression régulière Python, ^/$ par ligne) sur une copie texte du document, dans un
+    # thread : les positions arrivent par lots (numéro de recherche, débuts, fins) et une nouvelle
+    # recherche abandonne la précédente. La copie est découpée en morceaux d'environ 1 Mo coupés en fin
+    # de ligne, parcourus un à un pour rendre la main au thread GUI (re garde le GIL pendant un
+    # parcours) ; chaque morceau est cherché avec le précédent (regards en arrière) et le suivant
+    # (occurrences qui débordent), et sur tout le reste du texte pour une occurrence qui atteint la fin
+    # du suivant. La copie suit le document tant que le panneau est ouvert : ses modifications
+    # (contentsChange) sont réduites à une zone, relue seule et recollée dans le morceau concerné.
+    SLICE_CHARS = 1024 * 1024
+    BATCH_MATCHES = 4096
+    BATCH_MS = 30.0
+    ASTRAL_RE = re.compile("[\U00010000-\U0010FFFF]")
+    # selectedText -> toPlainText : séparateurs de paragraphe / ligne / cadre et espaces insécables
+    PLAIN_TEXT = str.maketrans({"\u2029": "\n", "\u2028": "\n", "\ufdd0": "\n", "\ufdd1": "\n", "\xa0": " "})
+    progressed = Signal()
+    finished = Signal()
+    replacements_ready = Signal(object)
+    _batch = Signal(int, object, object)
+    _done = Signal(int, float)
+    _replaced = Signal(int, object)
+    _split = Signal(int, object)
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self.generation = 0
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        self.document: QTextDocument | None = None
+        self.revision = -1
+        self.pattern: re.Pattern | None = None
+        # copie texte de tracked (version : numéro du contenu, pour le découpage fait par le thread) ;
+        # identique au document hors de sa zone [dirty_start, dirty_end), qui remplace [dirty_start, dirty_tail)
+        self.chunks: list[str] | None = None
+        self.version = 0
+        self.tracked: QTextDocument | None = None
+        self.text_revision = -1
+        self.dirty_start = self.dirty_end = self.dirty_tail = -1
+        self.running = False
+        self.error = ""
+        self.snapshot_ms = 0.0
+        self.first_batch_ms = 0.0
+        self.search_ms = 0.0
+        self.started_at = 0.0
+        self._batch.connect(self.on_batch)
+        self._done.connect(self.on_done)
+        self._replaced.connect(self.on_replaced)
+        self._split.connect(self.on_split)
+
+    @staticmethod
+    def compile(pattern: str, regex: bool, case_sensitive: bool) -> re.Pattern:
+        flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+        return re.compile(pattern if regex else re.escape(pattern), flags)
+
+    def start(self, document: QTextDocument, pattern: re.Pattern, template: str | None = None) -> None:
+        # template non None : calcule les remplacements de "Tout remplacer" au lieu des seules positions
+        self.cancel()
+        self.document = document
+        self.revision = document.revision()
+        start = time.perf_counter()
+        chunks = self.snapshot(document)
+        self.snapshot_ms = (time.perf_counter() - start) * 1000
+        self.started_at = time.perf_counter()
+        self.first_batch_ms = 0.0
+        if template is None:
+            self.starts, self.ends = [], []
+            self.pattern = pattern
+            self.running = True
+        generation = self.generation
+        args = (generation, self.version, chunks, pattern, template)
+        threading.Thread(target=self.run, args=args, daemon=True).start()
+
+    def cancel(self) -> None:
+        self.generation += 1
+        self.pattern = None
+        self.running = False
+
+    def snapshot(self, document: QTextDocument) -> list[str]:
+        # toPlainText garde une unité UTF-16 par position du document (images : U+FFFC) ; copie
+        # complète (~190 ms pour un million de lignes) seulement quand la copie suivie ne suffit pas
+        size = document.characterCount() - 1
+        if document is self.tracked and self.chunks is not None:
+            if self.dirty_start < 0:
+                # révision changée sans contentsChange (document sans mise en page) : copie complète
+                if document.revision() == self.text_revision:
+                    return self.chunks
+            elif self.patch(document, size):
+                return self.chunks
+        self.release()
+        text = document.toPlainText()
+        # un caractère hors BMP compte pour deux positions Qt : la copie ne se met alors pas à jour
+        if len(text) == size:
+            self.chunks = [text]
+            self.version += 1
+            self.text_revision = document.revision()
+            self.tracked = document
+            document.contentsChange.connect(self.on_contents_change)
+        return [text]
+
+    def patch(self, document: QTextDocument, size: int) -> bool:
+        start, tail = self.dirty_start, self.dirty_tail
+        end = min(self.dirty_end, size)
+        if end - start > 4 * self.SLICE_CHARS:
+            return False
+        # morceaux qui contiennent le début et la fin de la zone remplacée
+        chunks = self.chunks
+        offsets = [0]
+        for chunk in chunks:
+            offsets.append(offsets[-1] + len(chunk))
+        first = min(bisect_right(offsets, start) - 1, len(chunks) - 1)
+        last = max(first, min(bisect_left(offsets, tail) - 1, len(chunks) - 1))
+        cursor = QTextCursor(document)
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        changed = cursor.selectedText().translate(self.PLAIN_TEXT)
+        piece = chunks[first][: start - offsets[first]] + changed + chunks[last][tail - offsets[last] :]
+        patched = chunks[:first] + [piece] + chunks[last + 1 :]
+        if sum(map(len, patched)) != size:
+            return False
+        self.chunks = patched
+        self.version += 1
+        self.text_revision = document.revision()
+        self.dirty_start = self.dirty_end = self.dirty_tail = -1
+        return True
+
+    def release(self) -> None:
+        if self.tracked is not None:
+            try:
+                self.tracked.contentsChange.disconnect(self.on_contents_change)
+            except (RuntimeError, TypeError):
+                pass  # document déjà détruit
+        self.tracked = None
+        self.chunks = None
+        self.dirty_start = self.dirty_end = self.dirty_tail = -1
+
+    def on_contents_change(self, position: int, removed: int, added: int) -> None:
+        # réunion avec la zone déjà modifiée ; la fin retirée au-delà de celle-ci décale la fin dans la copie
+        if self.dirty_start < 0:
+            self.dirty_start, self.dirty_end, self.dirty_tail = position, position, position
+        self.dirty_start = min(self.dirty_start, position)
+        if position + removed > self.dirty_end:
+            self.dirty_tail += position + removed - self.dirty_end
+            self.dirty_end = position + removed
+        self.dirty_end += added - removed
+
+    def on_split(self, version: int, chunks: list[str]) -> None:
+        # même contenu, en morceaux : la zone modifiée depuis reste valable
+        if version == self.version and self.chunks is not None:
+            self.chunks = chunks
+
+    def run(self, generation: int, version: int, chunks: list[str], pattern: re.Pattern, template: str | None) -> None:
+        try:
+            if any(len(chunk) > 2 * self.SLICE_CHARS for chunk in chunks):
+                chunks = self.split(generation, chunks)
+                if chunks is None:
+                    return
+                self._split.emit(version, chunks)
+            self.scan(generation, chunks, pattern, template)
+        except RuntimeError:
+            # fenêtre fermée pendant la recherche : plus personne à qui envoyer les lots
+            pass
+
+    def split(self, generation: int, chunks: list[str]) -> list[str] | None:
+        pieces = []
+        for chunk in chunks:
+            position = 0
+            while position < len(chunk):
+                if generation != self.generation:
+                    return None
+                end = chunk.find("\n", position + self.SLICE_CHARS)
+                end = len(chunk) if end == -1 or len(chunk) - end < self.SLICE_CHARS else end + 1
+                pieces.append(chunk[position:end])
+                position = end
+                time.sleep(0)
+        return pieces
+
+    def scan(self, generation: int, chunks: list[str], pattern: re.Pattern, template: str | None) -> None:
+        # positions Python (points de code) -> positions Qt (UTF-16) : +1 par caractère hors BMP avant
+        astral: list[int] = []
+        covered = 0
+        offsets = [0]
+        for chunk in chunks:
+            offsets.append(offsets[-1] + len(chunk))
+        count = len(chunks)
+        starts: list[int] = []
+        ends: list[int] = []
+        edits: list[tuple[int, int, str]] = []
+        last_emit = time.perf_counter()
+        resume = 0
+        for index in range(count):
+            if generation != self.generation:
+                return
+            chunk_end = offsets[index + 1]
+            if resume >= chunk_end:
+                continue  # morceau couvert par une occurrence qui a débordé
+            previous = chunks[index - 1] if index else ""
+            following = chunks[index + 1] if index + 1 < count else ""
+            window = previous + chunks[index] + following
+            window_start = offsets[index] - len(previous)
+            search_from = resume
+            while generation == self.generation:
+                offset = window_start
+                match = pattern.search(window, search_from - offset, len(window))
+                if match is None or offset + match.start() >= chunk_end:
+                    break
+                if match.end() == len(window) and index + 2 < count:
+                    # l'occurrence atteint la fin du morceau suivant : résultat exact sur tout le reste
+                    offset = offsets[max(index - 1, 0)]
+                    match = pattern.search("".join(chunks[max(index - 1, 0) :]), search_from - offset)
+                    if match is None or offset + match.start() >= chunk_end:
+                        break
+                begin, finish = offset + match.start(), offset + match.end()
+                if finish == begin:
+                    # occurrences vides (^, $, x*) : rien à surligner ni à remplacer
+                    search_from = finish + 1
+                    continue
+                search_from = finish
+                while covered < count and offsets[covered] < finish:
+                    astral.extend(offsets[covered] + m.start() for m in self.ASTRAL_RE.finditer(chunks[covered]))
+                    covered += 1
+                if astral:
+                    begin += bisect_left(astral, begin)
+                    finish += bisect_left(astral, finish)
+                if template is not None:
+                    edits.append((begin, finish, match.expand(template)))
+                    continue
+                starts.append(begin)
+                ends.append(finish)
+                if len(starts) >= self.BATCH_MATCHES or (time.perf_counter() - last_emit) * 1000 >= self.BATCH_MS:
+                    self._batch.emit(generation, starts, ends)
+                    starts, ends = [], []
+                    last_emit = time.perf_counter()
+            resume = max(chunk_end, search_from)
+            time.sleep(0)
+        if generation != self.generation:
+            return
+        if template is not None:
+            self._replaced.emit(generation, edits)
+            return
+        if starts:
+            self._batch.emit(generation, starts, ends)
+        self._done.emit(generation, time.perf_counter())
+
+    def on_batch(self, generation: int, starts: list[int], ends: list[int]) -> None:
+        if generation != self.generation:
+            return
+        if not self.first_batch_ms:
+            self.first_batch_ms = (time.perf_counter() - self.started_at) * 1000
+        self.starts.extend(starts)
+        self.ends.extend(ends)
+        self.progressed.emit()
+
+    def on_done(self, generation: int, finished_at: float) -> None:
+        if generation != self.generation:
+            return
+        self.running = False
+        self.search_ms = (finished_at - self.started_at) * 1000
+        self.finished.emit()
+
+    def on_replaced(self, generation: int, edits: list[tuple[int, int, str]]) -> None:
+        if generation == self.generation:
+            self.replacements_ready.emit(edits)
+
+    def is_current(self, document: QTextDocument) -> bool:
+        return document is self.document and document.revision() == self.revision
+
+
+class FindPanel(QWidget):
+    # Barre rechercher / remplacer sous l'éditeur. Seules les occurrences visibles sont surlignées
+    # (sélections supplémentaires), recalculées au défilement et à chaque lot reçu.
+    MAX_HIGHLIGHTS = 1000
+
+    def __init__(self, window: StickyNoteWindow) -> None:
+        super().__init__(window)
+        self.note_window = window
+        self.setObjectName("FindPanel")
+        self.search = NoteSearch(self)
+        self.pattern: re.Pattern | None = None
+        self.current = -1
+        self.watched_bar: QScrollBar | None = None
+        self.find_field = QLineEdit()
+        self.find_field.setPlaceholderText("Rechercher…")
+        self.find_field.setClearButtonEnabled(True)
+        self.replace_field = QLineEdit()
+        self.replace_field.setPlaceholderText("Remplacer par…")
+        self.regex_box = QCheckBox(".*")
+        self.regex_box.setToolTip("Expression régulière (\\1 ou \\g<nom> dans le remplacement)")
+        self.case_box = QCheckBox("Aa")
+        self.case_box.setToolTip("Respecter la casse")
+        self.status = QLabel()
+        previous = QPushButton("▲")
+        previous.setToolTip("Précédent (Maj+Entrée)")
+        following = QPushButton("▼")
+        following.setToolTip("Suivant (Entrée)")
+        replace = QPushButton("Remplacer")
+        replace_all = QPushButton("Tout")
+        replace_all.setToolTip("Tout remplacer")
+        close = QPushButton("✕")
+        close.setFlat(True)
+        for button in (previous, following, close):
+            button.setFixedWidth(26)
+
+        # frappe : nouvelle recherche après une courte pause ; édition du document : relance plus tard
+        self.restart_timer = QTimer(self)
+        self.restart_timer.setSingleShot(True)
+        self.restart_timer.setInterval(150)
+        self.restart_timer.timeout.connect(self.restart)
+        self.highlight_timer = QTimer(self)
+        self.highlight_timer.setSingleShot(True)
+        self.highlight_timer.setInterval(16)
+        self.highlight_timer.timeout.connect(self.refresh_highlights)
+        self.find_field.textChanged.connect(lambda _: self.restart_timer.start())
+        self.regex_box.toggled.connect(lambda _: self.restart_timer.start())
+        self.case_box.toggled.connect(lambda _: self.restart_timer.start())
+        self.find_field.returnPressed.connect(self.on_return)
+        self.replace_field.returnPressed.connect(self.replace_current)
+        previous.clicked.connect(lambda: self.find_step(-1))
+        following.clicked.connect(lambda: self.find_step(1))
+        replace.clicked.connect(self.replace_current)
+        replace_all.clicked.connect(self.replace_all)
+        close.clicked.connect(self.close_panel)
+        self.search.progressed.connect(self.on_progress)
+        self.search.finished.connect(self.on_progress)
+        self.search.replacements_ready.connect(self.apply_replacements)
+
+        find_row = QHBoxLayout()
+        find_row.addWidget(self.find_field, 1)
+        find_row.addWidget(self.regex_box)
+        find_row.addWidget(self.case_box)
+        find_row.addWidget(previous)
+        find_row.addWidget(following)
+        find_row.addWidget(close)
+        replace_row = QHBoxLayout()
+        replace_row.addWidget(self.replace_field, 1)
+        replace_row.addWidget(replace)
+        replace_row.addWidget(replace_all)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 4, 0, 0)
+        layout.setSpacing(2)
+        layout.addLayout(find_row)
+        layout.addLayout(replace_row)
+        layout.addWidget(self.status)
+        for text, shortcut, slot in (
+            ("Suivant", "F3", lambda: self.find_step(1)),
+            ("Précédent", "Shift+F3", lambda: self.find_step(-1)),
+            ("Fermer", "Escape", self.close_panel),
+        ):
+            action = QAction(text, self)
+            action.setShortcut(shortcut)
+            action.setShortcutContext(Qt.WidgetWithChildrenShortcut)
+            action.triggered.connect(slot)
+            self.addAction(action)
+        self.hide()
+
+    @property
+    def editor(self) -> NoteEditor | PlainNoteEditor:
+        return self.note_window.editor
+
+    def open_panel(self) -> None:
+        selected = self.editor.textCursor().selectedText()
+        if selected and "\u2029" not in selected:
+            self.find_field.setText(selected)
+        self.show()
+        self.find_field.setFocus()
+        self.find_field.selectAll()
+        self.restart()
+
+    def close_panel(self) -> None:
+        self.search.cancel()
+        # plus de copie du texte à tenir à jour tant que le panneau est fermé
+        self.search.release()
+        self.restart_timer.stop()
+        self.hide()
+        self.editor.setExtraSelections([])
+        self.editor.setFocus()
+
+    def on_return(self) -> None:
+        if QApplication.keyboardModifiers() & Qt.ShiftModifier:
+            self.find_step(-1)
+        else:
+            self.find_step(1)
+
+    def on_document_changed(self) -> None:
+        # éditeur / document remplacé ou texte modifié : positions périmées
+        if not self.isHidden() and not self.search.is_current(self.editor.document()):
+            self.editor.setExtraSelections([])
+            self.restart_timer.start()
+
+    def restart(self) -> None:
+        text = self.find_field.text()
+        error = ""
+        try:
+            pattern = NoteSearch.compile(text, self.regex_box.isChecked(), self.case_box.isChecked()) if text else None
+        except re.error as exc:
+            pattern, error = None, exc.msg
+        if pattern is not None and pattern == self.search.pattern and self.search.is_current(self.editor.document()):
+            # même motif sur le même texte (frappe effacée, case recochée) : résultats toujours valables
+            return
+        self.current = -1
+        self.search.cancel()
+        self.search.starts, self.search.ends = [], []
+        self.editor.setExtraSelections([])
+        self.pattern = pattern
+        if pattern is None:
+            self.status.setText(f"Expression invalide : {error}" if error else "")
+            return
+        self.search.start(self.editor.document(), self.pattern)
+        self.status.setText("Recherche…")
+        bar = self.editor.verticalScrollBar()
+        if bar is not self.watched_bar:
+            # l'éditeur change avec le mode texte brut : suivre le défilement du nouveau
+            bar.valueChanged.connect(lambda _: self.highlight_timer.start())
+            self.watched_bar = bar
+
+    def on_progress(self) -> None:
+        count = len(self.search.starts)
+        if self.search.running:
+            self.status.setText(f"{count} occurrences… (recherche en cours)")
+        elif self.current >= 0:
+            self.status.setText(f"{self.current + 1} / {count}")
+        else:
+            self.status.setText(f"{count} occurrence{'s' if count > 1 else ''}")
+        if not self.highlight_timer.isActive():
+            self.highlight_timer.start()
+
+    def refresh_highlights(self) -> None:
+        editor = self.editor
+        starts, ends = self.search.starts, self.search.ends
+        if self.isHidden() or not starts or not self.search.is_current(editor.document()):
+            editor.setExtraSelections([])
+            return
+        viewport = editor.viewport()
+        first = editor.cursorForPosition(QPoint(0, 0)).position()
+        last = editor.cursorForPosition(QPoint(viewport.width(), viewport.height())).position()
+        # une occurrence commencée au-dessus de la vue peut encore y déborder
+        lo = max(0, bisect_left(starts, first) - 1)
+        hi = min(bisect_right(starts, last), lo + self.MAX_HIGHLIGHTS)
+        doc = editor.document()
+        selections = []
+        for index in range(lo, hi):
+            selection = QTextEdit.ExtraSelection()
+            selection.cursor = QTextCursor(doc)
+            selection.cursor.setPosition(starts[index])
+            selection.cursor.setPosition(ends[index], QTextCursor.KeepAnchor)
+            selection.format.setBackground(QColor(255, 170, 60) if index == self.current else QColor(255, 230, 120))
+            selections.append(selection)
+        editor.setExtraSelections(selections)
+
+    def find_step(self, step: int) -> None:
+        starts = self.search.starts
+        if not starts or not self.search.is_current(self.editor.document()):
+            return
+        cursor = self.editor.textCursor()
+        if step > 0:
+            index = bisect_left(starts, cursor.selectionEnd())
+            index = index if index < len(starts) else 0
+        else:
+            index = bisect_left(starts, cursor.selectionStart()) - 1
+            index = index if index >= 0 else len(starts) - 1
+        self.select_match(index)
+
+    def select_match(self, index: int) -> None:
+        self.current = index
+        cursor = self.editor.textCursor()
+        cursor.setPosition(self.search.starts[index])
+        cursor.setPosition(self.search.ends[index], QTextCursor.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.editor.ensureCursorVisible()
+        self.on_progress()
+
+    def replace_current(self) -> None:
+        if self.pattern is None or self.editor.isReadOnly():
+            return
+        cursor = self.editor.textCursor()
+        starts, ends = self.search.starts, self.search.ends
+        index = bisect_left(starts, cursor.selectionStart())
+        if not (index < len(starts) and starts[index] == cursor.selectionStart() and ends[index] == cursor.selectionEnd()):
+            self.find_step(1)
+            return
+        template = self.replace_field.text()
+        match = self.pattern.fullmatch(cursor.selectedText())
+        cursor.insertText(match.expand(template) if match and self.regex_box.isChecked() else template)
+        # la recherche repart sur le texte modifié ; l'occurrence suivante est choisie depuis le curseur
+        self.restart()
+        self.search.finished.connect(self.step_after_replace, Qt.SingleShotConnection)
+
+    def step_after_replace(self) -> None:
+        self.find_step(1)
+
+    def replace_all(self) -> None:
+        if self.pattern is None or self.editor.bulk_job is not None or self.editor.isReadOnly():
+            return
+        template = self.replace_field.text()
+        if not self.regex_box.isChecked():
+            # remplacement littéral : pas de \1 à interpréter
+            template = template.replace("\\", "\\\\")
+        self.status.setText("Remplacement…")
+        self.search.start(self.editor.document(), self.pattern, template)
+
+    def apply_replacements(self, edits: list[tuple[int, int, str]]) -> None:
+        editor = self.editor
+        if not self.search.is_current(editor.document()) or editor.bulk_job is not None:
+            # texte modifié pendant le calcul : positions périmées, rien n'est appliqué
+            self.restart()
+            return
+        if not edits:
+            self.status.setText("0 occurrence")
+            return
+        editor.bulk_job = ChunkedReplace(editor, edits)
+        editor.bulk_job.destroyed.connect(lambda: self.status.setText(f"{len(edits)} remplacements"))
+        editor.bulk_job.start()
+
+
 if __name__ == "__main__":
     raise SystemExit(main())